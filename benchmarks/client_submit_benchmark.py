@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Measures how long GearmanClient takes to submit a big batch of jobs and wait for all of them to complete,
+against an in-process server that accepts jobs as soon as it reads them and completes them a few at a time,
+the way results trickle in from real workers
+"""
+import socket
+import threading
+import time
+
+from gearman import protocol
+from gearman.client import GearmanClient
+from gearman.connection import GearmanConnection
+
+JOB_COUNTS = (10000, 50000, 100000)
+
+# Jobs we complete per write, every write costs our client another trip through its poll loop
+COMPLETE_BATCH_SIZE = 10
+
+def serve_jobs(server_socket):
+    """Answers every SUBMIT_JOB with a JOB_CREATED and later a WORK_COMPLETE echoing the job's data"""
+    incoming_buffer = b''
+    job_number = 0
+    while True:
+        received_data = server_socket.recv(1024 * 1024)
+        if not received_data:
+            break
+
+        incoming_buffer += received_data
+        buffer_offset = 0
+        created_responses = []
+        complete_responses = []
+        while True:
+            cmd_size = protocol.binary_command_size(incoming_buffer, buffer_offset)
+            if cmd_size is None or buffer_offset + cmd_size > len(incoming_buffer):
+                break
+
+            cmd_type, cmd_args, _ = protocol.parse_binary_command(incoming_buffer[buffer_offset:buffer_offset + cmd_size], is_response=False)
+            buffer_offset += cmd_size
+
+            job_number += 1
+            job_handle = b'H:benchmark:%d' % job_number
+            created_responses.append((protocol.GEARMAN_COMMAND_JOB_CREATED, dict(job_handle=job_handle)))
+            complete_responses.append((protocol.GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=job_handle, data=cmd_args['data'])))
+
+        incoming_buffer = incoming_buffer[buffer_offset:]
+        if created_responses:
+            server_socket.sendall(protocol.pack_binary_commands(created_responses, is_response=True))
+
+        for batch_start in range(0, len(complete_responses), COMPLETE_BATCH_SIZE):
+            server_socket.sendall(protocol.pack_binary_commands(complete_responses[batch_start:batch_start + COMPLETE_BATCH_SIZE], is_response=True))
+            time.sleep(0)
+
+class InProcessServerConnection(GearmanConnection):
+    """Talks to a thread playing gearmand on the other end of a socketpair"""
+    def _create_client_socket(self):
+        client_socket, server_socket = socket.socketpair()
+        threading.Thread(target=serve_jobs, args=(server_socket,), daemon=True).start()
+        self.set_socket(client_socket)
+
+class BenchmarkClient(GearmanClient):
+    connection_class = InProcessServerConnection
+
+def benchmark_submit(job_count):
+    gearman_client = BenchmarkClient(['localhost'])
+    jobs_to_submit = [dict(task=b'echo', data=b'job %d' % job_number, unique=b'%d' % job_number) for job_number in range(job_count)]
+
+    # Our server thread shares our process, only count the CPU time our client's thread spends
+    start_time = time.time()
+    start_cpu_time = time.thread_time()
+    job_requests = gearman_client.submit_multiple_jobs(jobs_to_submit, poll_timeout=600.0)
+    elapsed_cpu_time = time.thread_time() - start_cpu_time
+    elapsed_time = time.time() - start_time
+
+    assert all(current_request.result == current_job['data'] for current_request, current_job in zip(job_requests, jobs_to_submit))
+    print('submit_multiple_jobs %7d jobs: %8.3fs, %8.3fs client CPU (%10.0f jobs/sec)' % (job_count, elapsed_time, elapsed_cpu_time, job_count / elapsed_time))
+    gearman_client.shutdown()
+
+if __name__ == '__main__':
+    for job_count in JOB_COUNTS:
+        benchmark_submit(job_count)
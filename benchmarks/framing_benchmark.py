@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Measures how long GearmanConnection takes to frame a burst of commands that
+arrived in a single read, and a large command that trickles in over many reads
+"""
+import time
+
+from gearman import protocol
+from gearman.connection import GearmanConnection
+
+BURST_COMMANDS = 10000
+LARGE_PAYLOAD_SIZE = 1024 * 1024
+READ_SIZE = 4096
+
+def create_client_connection():
+    current_connection = GearmanConnection(host='__benchmark_host__')
+    current_connection._is_client_side = True
+    current_connection._is_server_side = False
+    return current_connection
+
+def feed_connection(current_connection, received_data):
+    # Bypass the socket but go through the same path as GearmanConnection.read_data_from_socket
+    current_connection._incoming_buffer += received_data
+
+def benchmark_burst():
+    status_command = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_WORK_STATUS, dict(job_handle=b'H:localhost:1', numerator=b'1', denominator=b'10'), is_response=True)
+    current_connection = create_client_connection()
+    feed_connection(current_connection, status_command * BURST_COMMANDS)
+
+    start_time = time.time()
+    received_commands = current_connection.read_commands_from_buffer()
+    elapsed_time = time.time() - start_time
+
+    assert received_commands == BURST_COMMANDS
+    print('%d command burst    : %.4f seconds' % (BURST_COMMANDS, elapsed_time))
+
+def benchmark_trickle():
+    complete_command = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=b'H:localhost:1', data=b'x' * LARGE_PAYLOAD_SIZE), is_response=True)
+    current_connection = create_client_connection()
+
+    start_time = time.time()
+    received_commands = 0
+    for chunk_start in range(0, len(complete_command), READ_SIZE):
+        feed_connection(current_connection, complete_command[chunk_start:chunk_start + READ_SIZE])
+        received_commands += current_connection.read_commands_from_buffer()
+    elapsed_time = time.time() - start_time
+
+    assert received_commands == 1
+    print('%d byte command in %d byte reads : %.4f seconds' % (LARGE_PAYLOAD_SIZE, READ_SIZE, elapsed_time))
+
+if __name__ == '__main__':
+    benchmark_burst()
+    benchmark_trickle()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Measures commands/sec for packing, parsing and dispatching JOB_ASSIGN_UNIQ and WORK_COMPLETE
+"""
+import time
+
+from gearman import protocol
+from gearman.command_handler import GearmanCommandHandler
+
+ITERATIONS = 100000
+
+class BenchmarkCommandHandler(GearmanCommandHandler):
+    def recv_job_assign_uniq(self, job_handle, task, unique, data):
+        return True
+
+    def recv_work_complete(self, job_handle, data):
+        return True
+
+def report(label, elapsed_time):
+    print('%-42s: %10.0f commands/sec' % (label, ITERATIONS / elapsed_time))
+
+def benchmark_command(cmd_type, cmd_args):
+    command_name = protocol.get_command_name(cmd_type)
+
+    start_time = time.time()
+    for _ in range(ITERATIONS):
+        packed_command = protocol.pack_binary_command(cmd_type, cmd_args, is_response=True)
+    report('%s pack' % command_name, time.time() - start_time)
+
+    start_time = time.time()
+    for _ in range(ITERATIONS):
+        parsed_type, parsed_args, parsed_len = protocol.parse_binary_command(packed_command, is_response=True)
+    report('%s parse' % command_name, time.time() - start_time)
+
+    command_handler = BenchmarkCommandHandler()
+    start_time = time.time()
+    for _ in range(ITERATIONS):
+        command_handler.recv_command(parsed_type, **parsed_args)
+    report('%s dispatch' % command_name, time.time() - start_time)
+
+if __name__ == '__main__':
+    benchmark_command(protocol.GEARMAN_COMMAND_JOB_ASSIGN_UNIQ, dict(job_handle=b'H:localhost:12345', task=b'resize_image', unique=b'0123456789abcdef', data=b'x' * 256))
+    benchmark_command(protocol.GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=b'H:localhost:12345', data=b'x' * 256))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Measures how long a worker takes per job with and without TCP_NODELAY, against a gearmand stand-in on localhost
+
+Every job sends a WORK_STATUS before completing.  The server has nothing to say back to a WORK_STATUS, so without
+TCP_NODELAY our WORK_COMPLETE waits for the server's delayed ACK of our WORK_STATUS before it goes out
+"""
+import socket
+import threading
+import time
+
+from gearman import protocol
+from gearman.connection import GearmanConnection
+from gearman.worker import GearmanWorker
+
+JOB_COUNT = 200
+
+def serve_jobs(listening_socket, job_count):
+    """Hands job_count jobs to the first worker that connects, one at a time"""
+    server_socket, _ = listening_socket.accept()
+    server_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send_response(cmd_type, **cmd_args):
+        server_socket.sendall(protocol.pack_binary_command(cmd_type, cmd_args, is_response=True))
+
+    incoming_buffer = b''
+    jobs_assigned = 0
+    while True:
+        received_data = server_socket.recv(64 * 1024)
+        if not received_data:
+            break
+
+        incoming_buffer += received_data
+        while True:
+            cmd_size = protocol.binary_command_size(incoming_buffer, 0)
+            if cmd_size is None or cmd_size > len(incoming_buffer):
+                break
+
+            cmd_type, cmd_args, _ = protocol.parse_binary_command(incoming_buffer[:cmd_size], is_response=False)
+            incoming_buffer = incoming_buffer[cmd_size:]
+
+            if cmd_type == protocol.GEARMAN_COMMAND_GRAB_JOB_UNIQ:
+                if jobs_assigned < job_count:
+                    jobs_assigned += 1
+                    send_response(protocol.GEARMAN_COMMAND_JOB_ASSIGN_UNIQ, job_handle=b'H:benchmark:%d' % jobs_assigned, task=b'status', unique=b'', data=b'job')
+                else:
+                    send_response(protocol.GEARMAN_COMMAND_NO_JOB)
+            elif cmd_type in (protocol.GEARMAN_COMMAND_PRE_SLEEP, protocol.GEARMAN_COMMAND_WORK_COMPLETE) and jobs_assigned < job_count:
+                send_response(protocol.GEARMAN_COMMAND_NOOP)
+
+    server_socket.close()
+
+def status_task(gearman_worker, gearman_job):
+    gearman_worker.send_job_status(gearman_job, b'1', b'2')
+    return gearman_job.data
+
+class BenchmarkWorker(GearmanWorker):
+    def __init__(self, host_list, job_count):
+        super(BenchmarkWorker, self).__init__(host_list)
+        self.jobs_left = job_count
+
+    def after_job(self):
+        self.jobs_left -= 1
+        return self.jobs_left > 0
+
+class NagleConnection(GearmanConnection):
+    tcp_nodelay = False
+
+class NagleBenchmarkWorker(BenchmarkWorker):
+    connection_class = NagleConnection
+
+def benchmark_jobs(worker_class):
+    listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening_socket.bind(('127.0.0.1', 0))
+    listening_socket.listen(1)
+    threading.Thread(target=serve_jobs, args=(listening_socket, JOB_COUNT), daemon=True).start()
+
+    gearman_worker = worker_class(['127.0.0.1:%d' % listening_socket.getsockname()[1]], JOB_COUNT)
+    gearman_worker.register_task(b'status', status_task)
+
+    start_time = time.time()
+    gearman_worker.work(poll_timeout=1.0)
+    elapsed_time = time.time() - start_time
+
+    print('tcp_nodelay=%-5s: %8.3fs, %8.3fms per job' % (worker_class.connection_class.tcp_nodelay, elapsed_time, elapsed_time * 1000.0 / JOB_COUNT))
+    gearman_worker.shutdown()
+    listening_socket.close()
+
+if __name__ == '__main__':
+    benchmark_jobs(BenchmarkWorker)
+    benchmark_jobs(NagleBenchmarkWorker)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Measures how long it takes to turn a fan-out of small background jobs into bytes on the wire
+"""
+import time
+
+from gearman import protocol
+from gearman.connection import GearmanConnection
+
+JOB_COUNT = 50000
+
+def build_commands():
+    return [(protocol.GEARMAN_COMMAND_SUBMIT_JOB_BG, dict(task=b'send_email', unique=b'%d' % job_number, data=b'{"user_id": %d}' % job_number)) for job_number in range(JOB_COUNT)]
+
+def report(label, elapsed_time):
+    print('%-42s: %8.3fs (%10.0f jobs/sec)' % (label, elapsed_time, JOB_COUNT / elapsed_time))
+
+def benchmark_pack(cmd_list):
+    start_time = time.time()
+    packed_commands = b''.join(protocol.pack_binary_command(cmd_type, cmd_args) for cmd_type, cmd_args in cmd_list)
+    report('pack_binary_command per job', time.time() - start_time)
+
+    start_time = time.time()
+    batch_packed_commands = protocol.pack_binary_commands(cmd_list)
+    report('pack_binary_commands', time.time() - start_time)
+
+    assert packed_commands == batch_packed_commands
+
+def benchmark_connection(cmd_list):
+    current_connection = GearmanConnection(host='localhost')
+
+    start_time = time.time()
+    for cmd_type, cmd_args in cmd_list:
+        current_connection.send_command(cmd_type, cmd_args)
+    current_connection.send_commands_to_buffer()
+    report('GearmanConnection.send_commands_to_buffer', time.time() - start_time)
+
+if __name__ == '__main__':
+    cmd_list = build_commands()
+    benchmark_pack(cmd_list)
+    benchmark_connection(cmd_list)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Measures how long a job takes to stream lots of small WORK_DATA updates, blocking on every update versus buffering them
+"""
+import socket
+import threading
+import time
+
+from gearman.connection import GearmanConnection
+from gearman.worker import GearmanWorker
+
+UPDATE_COUNT = 10000
+
+class SocketpairConnection(GearmanConnection):
+    """Talks to a thread that reads and throws away everything we send"""
+    def _create_client_socket(self):
+        local_socket, remote_socket = socket.socketpair()
+
+        def drain_socket():
+            while remote_socket.recv(1024 * 1024):
+                pass
+
+        threading.Thread(target=drain_socket, daemon=True).start()
+        self.set_socket(local_socket)
+
+class BenchmarkWorker(GearmanWorker):
+    connection_class = SocketpairConnection
+
+def streaming_task(gearman_worker, gearman_job):
+    for update_number in range(UPDATE_COUNT):
+        gearman_worker.send_job_data(gearman_job, b'chunk %d' % update_number)
+
+    return b'done'
+
+def benchmark_updates(label, buffer_job_updates):
+    gearman_worker = BenchmarkWorker(['localhost'])
+    gearman_worker.buffer_job_updates = buffer_job_updates
+    gearman_worker.register_task(b'stream', streaming_task)
+
+    current_connection = gearman_worker.establish_connection(gearman_worker.connection_list[0])
+    current_job = gearman_worker.job_class(current_connection, b'H:localhost:1', b'stream', None, b'')
+
+    start_time = time.time()
+    gearman_worker.on_job_execute(current_job)
+    elapsed_time = time.time() - start_time
+
+    print('%-36s: %8.3fs (%10.0f updates/sec)' % (label, elapsed_time, UPDATE_COUNT / elapsed_time))
+    gearman_worker.shutdown()
+
+if __name__ == '__main__':
+    benchmark_updates('wait_until_updates_sent per update', buffer_job_updates=False)
+    benchmark_updates('buffer_job_updates', buffer_job_updates=True)
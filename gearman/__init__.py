@@ -7,8 +7,12 @@ __version__ = '2.0.2'
 from gearman.admin_client import GearmanAdminClient
 from gearman.client import GearmanClient
 from gearman.worker import GearmanWorker
+from gearman.async_client import AsyncGearmanClient
+from gearman.async_worker import AsyncGearmanWorker
 
-from gearman.connection_manager import DataEncoder
+from gearman.connection_manager import DataEncoder, BufferEncoder
+from gearman.routing import GearmanRouter, RandomRouter, ConsistentHashRouter, EwmaRouter
+from gearman.circuit_breaker import CircuitBreaker
 from gearman.constants import PRIORITY_NONE, PRIORITY_LOW, PRIORITY_HIGH, JOB_PENDING, JOB_CREATED, JOB_FAILED, JOB_COMPLETE
 
 import logging
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+
+from gearman.async_connection_manager import AsyncGearmanConnectionManager
+from gearman.client import RANDOM_UNIQUE_BYTES, _GearmanClientRequests
+from gearman.client_handler import GearmanClientCommandHandler
+from gearman.constants import PRIORITY_NONE, JOB_UNKNOWN
+from gearman.errors import ConnectionError, ExceededConnectionAttempts, GearmanError
+from gearman.job import GearmanJobRequest
+
+gearman_logger = logging.getLogger(__name__)
+
+class AsyncGearmanJobRequest(GearmanJobRequest):
+    """A GearmanJobRequest that can be awaited
+
+    Awaiting a request returns the request itself once it's complete (WORK_COMPLETE / WORK_FAIL,
+    or JOB_CREATED for background jobs) or once the connection it was running on went away.
+    Like GearmanClient, you MUST check the state of the returned request.
+    """
+    def __init__(self, gearman_job, initial_priority=PRIORITY_NONE, background=False, max_attempts=1):
+        self._done_future = None
+        self._update_waiter = None
+
+        super(AsyncGearmanJobRequest, self).__init__(gearman_job, initial_priority=initial_priority, background=background, max_attempts=max_attempts)
+
+    def bind_loop(self, event_loop):
+        """Called by AsyncGearmanClient before this request is submitted"""
+        if self._done_future is None:
+            self._done_future = event_loop.create_future()
+
+    def done(self):
+        return bool(self._done_future is not None and self._done_future.done())
+
+    def set_done(self):
+        if not self.done():
+            self._done_future.set_result(self)
+
+        self.notify_updated()
+
+    def set_exception(self, exception):
+        if not self.done():
+            self._done_future.set_exception(exception)
+
+        self.notify_updated()
+
+    def notify_updated(self):
+        """Wake up anyone iterating over our updates"""
+        if self._update_waiter is not None and not self._update_waiter.done():
+            self._update_waiter.set_result(None)
+
+        self._update_waiter = None
+
+    async def _wait_for_update(self):
+        if self._update_waiter is None:
+            self._update_waiter = self._done_future.get_loop().create_future()
+
+        await self._update_waiter
+
+    async def iter_data_updates(self):
+        """Yields WORK_DATA payloads as they arrive, stops once this request is done"""
+        while True:
+            while self.data_updates:
+                yield self.data_updates.popleft()
+
+            if self.done():
+                break
+
+            await self._wait_for_update()
+
+    async def iter_status_updates(self):
+        """Yields our status dict every time a WORK_STATUS arrives, stops once this request is done
+
+        Only the latest status is kept, statuses arriving together may be coalesced into one
+        """
+        last_status = self.status
+        while True:
+            if self.status is not last_status:
+                last_status = self.status
+                yield last_status
+
+            if self.done():
+                break
+
+            await self._wait_for_update()
+
+    def __await__(self):
+        if self._done_future is None:
+            raise GearmanError('Request was never submitted: %r' % self)
+
+        return self._done_future.__await__()
+
+class AsyncGearmanClient(_GearmanClientRequests, AsyncGearmanConnectionManager):
+    """
+    AsyncGearmanClient :: asyncio interface to submit jobs to a Gearman server
+
+    Must be used from coroutines running on a single event loop
+    """
+    command_handler_class = GearmanClientCommandHandler
+    job_request_class = AsyncGearmanJobRequest
+
+    def __init__(self, host_list=None, random_unique_bytes=RANDOM_UNIQUE_BYTES, router=None):
+        super(AsyncGearmanClient, self).__init__(host_list=host_list, random_unique_bytes=random_unique_bytes, router=router)
+
+        # Tasks connecting and sending out requests whose connection wasn't up yet, the event loop only weakly holds onto them
+        self._connect_tasks = set()
+
+    def submit_job(self, task, data, unique=None, priority=PRIORITY_NONE, background=False, max_retries=0):
+        """Submit a single job to any gearman server, returns an awaitable AsyncGearmanJobRequest"""
+        job_info = dict(task=task, data=data, unique=unique, priority=priority)
+        return self.submit_multiple_jobs([job_info], background=background, max_retries=max_retries)[0]
+
+    def submit_multiple_jobs(self, jobs_to_submit, background=False, max_retries=0):
+        """Takes a list of jobs_to_submit with dicts of
+
+        {'task': task, 'data': data, 'unique': unique, 'priority': priority}
+
+        Returns a list of awaitable AsyncGearmanJobRequests, e.g. asyncio.gather(*requests)
+        """
+        assert type(jobs_to_submit) in (list, tuple, set), "Expected multiple jobs, received 1?"
+
+        requests_to_submit = [self._create_request_from_dictionary(job_info, background=background, max_retries=max_retries) for job_info in jobs_to_submit]
+        return self.submit_multiple_requests(requests_to_submit)
+
+    def submit_multiple_requests(self, job_requests):
+        """Take AsyncGearmanJobRequests, assign them connections, and request that they be done
+
+        Requests are written out together the next time we yield to the event loop
+        """
+        assert type(job_requests) in (list, tuple, set), "Expected multiple job requests, received 1?"
+        event_loop = asyncio.get_running_loop()
+        for current_request in job_requests:
+            current_request.bind_loop(event_loop)
+            self.send_job_request(current_request)
+
+        return job_requests
+
+    async def establish_request_connection(self, current_request):
+        """Return a live connection for the given request"""
+        rotating_connections = self._get_rotating_connections(current_request)
+
+        failed_connections = 0
+        chosen_connection = None
+        for possible_connection in rotating_connections:
+            try:
+                chosen_connection = await self.establish_connection(possible_connection)
+                break
+            except ConnectionError:
+                failed_connections += 1
+
+        return self._rotate_connections(rotating_connections, failed_connections, chosen_connection)
+
+    def send_job_request(self, current_request):
+        """Attempt to send out a job request, connecting first if we have to"""
+        if current_request.connection_attempts >= current_request.max_connection_attempts:
+            current_request.set_exception(ExceededConnectionAttempts('Exceeded %d connection attempt(s) :: %r' % (current_request.max_connection_attempts, current_request)))
+            return
+
+        # Skip a trip through the event loop if the connection we'd pick is already up
+        rotating_connections = self._get_rotating_connections(current_request)
+        if rotating_connections and rotating_connections[0].connected:
+            self._send_job_request_on_connection(current_request, rotating_connections[0])
+            return
+
+        connect_task = asyncio.ensure_future(self._connect_and_send_job_request(current_request))
+        self._connect_tasks.add(connect_task)
+        connect_task.add_done_callback(self._connect_tasks.discard)
+
+    async def _connect_and_send_job_request(self, current_request):
+        # Nobody awaits this task, whatever goes wrong has to reach whoever awaits our request
+        try:
+            chosen_connection = await self.establish_request_connection(current_request)
+            self._send_job_request_on_connection(current_request, chosen_connection)
+        except Exception as connect_exception:
+            current_request.set_exception(connect_exception)
+
+    def _send_job_request_on_connection(self, current_request, chosen_connection):
+        current_request.job.connection = chosen_connection
+        current_request.connection_attempts += 1
+        current_request.timed_out = False
+
+        self.router.request_sent(current_request, chosen_connection)
+
+        current_command_handler = self.connection_to_handler_map[chosen_connection]
+        current_command_handler.send_job_request(current_request)
+
+    def on_request_updated(self, current_request):
+        """Resolves awaiting requests as our command handlers move them along"""
+        self.router.request_updated(current_request)
+        if current_request.complete:
+            self.request_to_rotating_connection_queue.pop(current_request, None)
+            current_request.set_done()
+        elif current_request.state == JOB_UNKNOWN:
+            if current_request.job.handle is None:
+                # Our connection failed before the server accepted our job, automatically retry
+                # Wait for our failed connection to be torn down before picking a new one
+                asyncio.get_running_loop().call_soon(self.send_job_request, current_request)
+            else:
+                # Do NOT attempt to auto-retry connection failures as we have no idea how far a worker got
+                current_request.set_done()
+        else:
+            current_request.notify_updated()
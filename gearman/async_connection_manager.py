@@ -0,0 +1,292 @@
+import asyncio
+import logging
+
+import gearman.util
+from gearman.connection import GearmanConnection
+from gearman.connection_manager import NoopEncoder
+from gearman.errors import ConnectionError, GearmanError
+from gearman.job import GearmanJob, GearmanJobRequest
+
+gearman_logger = logging.getLogger(__name__)
+
+class AsyncGearmanConnection(GearmanConnection):
+    """A GearmanConnection driven by an asyncio transport instead of a socket we poll ourselves
+
+    Reuses all of GearmanConnection's command framing and buffering, the event loop
+    hands us received data and we hand it our packed outgoing commands
+    """
+    def _reset_connection(self):
+        super(AsyncGearmanConnection, self)._reset_connection()
+        self.transport = None
+
+    def connect(self):
+        raise NotImplementedError('AsyncGearmanConnections are connected by an AsyncGearmanConnectionManager')
+
+    def set_transport(self, transport):
+        """Called once our transport is up, we're only ever the client side of a connection"""
+        self._reset_connection()
+
+        # asyncio created our socket, tune it the way we tune our own
+        transport_socket = transport.get_extra_info('socket')
+        if transport_socket is not None:
+            self.set_socket_options(transport_socket)
+
+        self.transport = transport
+
+        self.connected = True
+        self._is_client_side = True
+        self._is_server_side = False
+
+    def feed_data(self, data):
+        """Reads data from transport --> buffer --> command queue
+
+        Returns the number of commands we were able to parse
+        """
+        if not self.connected:
+            self.throw_exception(message='disconnected')
+
+        self._add_incoming_data(data)
+        if not self.has_incoming_command():
+            return 0
+
+        return self.read_commands_from_buffer()
+
+    def send_data_to_transport(self):
+        """Send commands from command queue --> buffer --> transport
+
+        The transport buffers whatever the socket won't take right away, so we always flush everything
+        """
+        if not self.connected:
+            self.throw_exception(message='disconnected')
+
+        self.send_commands_to_buffer()
+        if not self._outgoing_buffer:
+            return 0
+
+        self.transport.writelines(self._outgoing_buffer)
+
+        sent_size = self._outgoing_buffer_size
+        self._outgoing_buffer.clear()
+        self._outgoing_buffer_size = 0
+        return sent_size
+
+    def close(self):
+        """Shutdown our existing transport and reset all of our connection data"""
+        if self.transport:
+            self.transport.close()
+
+        self._reset_connection()
+
+    def __repr__(self):
+        return ('<AsyncGearmanConnection %s connected=%s>' %
+            (gearman.util.format_server_parameter(self.gearman_host, self.gearman_port), self.connected))
+
+class GearmanProtocol(asyncio.Protocol):
+    """Forwards asyncio transport events for a single connection to its AsyncGearmanConnectionManager"""
+    def __init__(self, connection_manager, gearman_connection):
+        self.connection_manager = connection_manager
+        self.gearman_connection = gearman_connection
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.connection_manager.handle_connect(self.gearman_connection, transport)
+
+    def data_received(self, data):
+        self.connection_manager.handle_read(self.gearman_connection, data)
+
+    def connection_lost(self, exc):
+        # Our connection may have already been closed and re-established on a new transport
+        if self.gearman_connection.transport is self.transport:
+            self.connection_manager.handle_error(self.gearman_connection)
+
+class AsyncGearmanConnectionManager(object):
+    """Abstract base class for any asyncio Gearman-type client that needs to connect to multiple connections
+
+    The asyncio counterpart to GearmanConnectionManager - instead of polling our connections,
+    the event loop calls us back through GearmanProtocol whenever a connection has activity.
+    Forwards all communication between a connection and a command handler so the same
+    command handlers drive both the blocking and the asyncio interfaces
+
+    Automatically encodes all 'data' fields as specified in protocol.py
+    """
+    command_handler_class = None
+    connection_class = AsyncGearmanConnection
+    protocol_class = GearmanProtocol
+
+    job_class = GearmanJob
+    job_request_class = GearmanJobRequest
+
+    data_encoder = NoopEncoder
+
+    def __init__(self, host_list=None):
+        assert self.command_handler_class is not None, 'AsyncGearmanConnectionManager did not receive a command handler class'
+
+        self.connection_list = []
+
+        host_list = host_list or []
+        for hostport_tuple in host_list:
+            self.add_connection(hostport_tuple)
+
+        self.handler_to_connection_map = {}
+        self.connection_to_handler_map = {}
+
+        self.handler_initial_state = {}
+
+        # Connects in flight, shared by everyone waiting on the same connection
+        self._connection_to_connect_future = {}
+
+        # Connections with commands queued up since the last time we wrote to our transports
+        self._connections_to_flush = set()
+
+    def shutdown(self):
+        # Shutdown all our connections one by one
+        for gearman_connection in self.connection_list:
+            gearman_connection.close()
+
+    ###################################
+    # Connection management functions #
+    ###################################
+
+    def add_connection(self, hostport_tuple):
+        """Add a new connection to this connection manager"""
+        gearman_host, gearman_port = gearman.util.disambiguate_server_parameter(hostport_tuple)
+
+        client_connection = self.connection_class(host=gearman_host, port=gearman_port)
+        self.connection_list.append(client_connection)
+
+        return client_connection
+
+    async def establish_connection(self, current_connection):
+        """Attempt to connect... if not previously connected, create a new CommandHandler to manage this connection's state
+        !NOTE! This function can throw a ConnectionError which deriving ConnectionManagers should catch
+        """
+        assert current_connection in self.connection_list, "Unknown connection - %r" % current_connection
+        if current_connection.connected:
+            return current_connection
+
+        connect_future = self._connection_to_connect_future.get(current_connection)
+        if connect_future is None:
+            connect_future = asyncio.ensure_future(self._connect(current_connection))
+            connect_future.add_done_callback(lambda _: self._connection_to_connect_future.pop(current_connection, None))
+            self._connection_to_connect_future[current_connection] = connect_future
+
+        # Callers giving up on a connect should not cancel it for everyone else
+        await asyncio.shield(connect_future)
+        return current_connection
+
+    async def establish_connections(self, connection_list=None):
+        """Connect to every connection in connection_list (all our connections by default) at the same time
+
+        Waits at most one connect_timeout no matter how many servers are down, returns the connections that are alive
+        """
+        connection_list = self.connection_list if connection_list is None else connection_list
+        await asyncio.gather(*[self._try_establish_connection(current_connection) for current_connection in connection_list])
+        return [current_connection for current_connection in connection_list if current_connection.connected]
+
+    async def _try_establish_connection(self, current_connection):
+        try:
+            await self.establish_connection(current_connection)
+        except ConnectionError:
+            pass
+
+    async def _connect(self, current_connection):
+        # Don't pay for a connect we expect to fail
+        circuit_breaker = current_connection.circuit_breaker
+        if not circuit_breaker.allow_attempt():
+            current_connection.throw_exception(message='circuit open, not retrying before %.3f' % circuit_breaker.retry_time)
+
+        # Only hand out views into our receive buffers if our encoder knows how to handle them
+        current_connection.zero_copy_data = bool(self.data_encoder.decodes_buffers)
+
+        event_loop = asyncio.get_running_loop()
+        create_protocol = lambda: self.protocol_class(self, current_connection)
+        try:
+            if current_connection.unix_socket_path is not None:
+                create_connection = event_loop.create_unix_connection(create_protocol, current_connection.unix_socket_path)
+            else:
+                create_connection = event_loop.create_connection(create_protocol, current_connection.gearman_host, current_connection.gearman_port)
+            await asyncio.wait_for(create_connection, current_connection.connect_timeout)
+        except asyncio.TimeoutError:
+            circuit_breaker.record_failure()
+            current_connection.throw_exception(message='timed out connecting after %.3fs' % current_connection.connect_timeout)
+        except OSError as socket_exception:
+            circuit_breaker.record_failure()
+            current_connection.throw_exception(exception=socket_exception)
+
+        circuit_breaker.record_success()
+
+    def handle_connect(self, current_connection, transport):
+        """Called by our protocol once a transport is up, before we can receive any data"""
+        current_connection.set_transport(transport)
+
+        # Initiate a new command handler every time we start a new connection
+        current_handler = self.command_handler_class(connection_manager=self)
+
+        # Handler to connection map for CommandHandler -> Connection interactions
+        # Connection to handler map for Connection -> CommandHandler interactions
+        self.handler_to_connection_map[current_handler] = current_connection
+        self.connection_to_handler_map[current_connection] = current_handler
+
+        current_handler.initial_state(**self.handler_initial_state)
+
+    def handle_read(self, current_connection, data):
+        """Handle data our transport received"""
+        current_handler = self.connection_to_handler_map.get(current_connection)
+        if current_handler is None:
+            return
+
+        try:
+            # Transfer data from transport -> buffer -> command queue
+            if current_connection.feed_data(data):
+                # Notify the handler that we have commands to fetch
+                current_handler.fetch_commands()
+        except GearmanError as gearman_error:
+            # There's nobody above us to raise to, drop this connection and let our handler clean up
+            gearman_logger.error('%r - %r', current_connection, gearman_error)
+            self.handle_error(current_connection)
+
+    def handle_error(self, current_connection):
+        dead_handler = self.connection_to_handler_map.pop(current_connection, None)
+        if dead_handler:
+            dead_handler.on_io_error()
+
+        self.handler_to_connection_map.pop(dead_handler, None)
+        self._connections_to_flush.discard(current_connection)
+        current_connection.close()
+
+    def _flush_connections(self):
+        """Write out every command queued since the last time the event loop ran us"""
+        connections_to_flush = self._connections_to_flush
+        self._connections_to_flush = set()
+
+        for current_connection in connections_to_flush:
+            if current_connection.connected:
+                current_connection.send_data_to_transport()
+
+    ##################################
+    # Callbacks for Command Handlers #
+    ##################################
+
+    def read_command(self, command_handler):
+        """CommandHandlers call this function to fetch pending commands"""
+        gearman_connection = self.handler_to_connection_map[command_handler]
+        return gearman_connection.read_command()
+
+    def send_command(self, command_handler, cmd_type, cmd_args):
+        """CommandHandlers call this function to send pending commands
+
+        Commands are only queued here, every command queued during one pass of the event loop
+        gets packed and written together once we yield back to it
+        """
+        gearman_connection = self.handler_to_connection_map[command_handler]
+        gearman_connection.send_command(cmd_type, cmd_args)
+
+        if not self._connections_to_flush:
+            asyncio.get_running_loop().call_soon(self._flush_connections)
+
+        self._connections_to_flush.add(gearman_connection)
+
+    def on_gearman_error(self, error_code, error_text):
+        gearman_logger.error('Received error from server: %s: %s' % (error_code, error_text))
+        return False
@@ -0,0 +1,144 @@
+import asyncio
+import inspect
+import logging
+import random
+import sys
+
+from gearman.async_connection_manager import AsyncGearmanConnectionManager
+from gearman.errors import ServerUnavailable
+from gearman.worker import POLL_TIMEOUT_IN_SECONDS, _GearmanWorkerJobs
+from gearman.worker_handler import GearmanWorkerCommandHandler
+
+gearman_logger = logging.getLogger(__name__)
+
+class AsyncGearmanWorker(_GearmanWorkerJobs, AsyncGearmanConnectionManager):
+    """
+    AsyncGearmanWorker :: asyncio interface to accept jobs from a Gearman server
+
+    Runs up to max_concurrent_jobs jobs at once, each as its own asyncio task
+    """
+    command_handler_class = GearmanWorkerCommandHandler
+
+    def __init__(self, host_list=None, max_concurrent_jobs=1):
+        super(AsyncGearmanWorker, self).__init__(host_list=host_list, max_concurrent_jobs=max_concurrent_jobs)
+
+        self._stop_working = None
+
+        # Set every time a job slot frees up, lets work() wait for the jobs we've taken on while stopping
+        self._job_slot_freed = None
+
+    #############################################################
+    ##### Public methods for general AsyncGearmanWorker use #####
+    #############################################################
+    async def work(self, poll_timeout=POLL_TIMEOUT_IN_SECONDS):
+        """Work until stop() is called, reconnecting to dead connections every poll_timeout seconds"""
+        self._stop_working = asyncio.Event()
+        self._job_slot_freed = asyncio.Event()
+
+        while not self._stop_working.is_set():
+            worker_connections = await self.establish_worker_connections()
+            if not worker_connections:
+                raise ServerUnavailable('Found no valid connections in list: %r' % self.connection_list)
+
+            try:
+                await asyncio.wait_for(self._stop_working.wait(), poll_timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        # stop() already stopped us from handing out job slots.  Let our in-flight jobs finish and send out their results
+        # before we hang up, a handler still holding a job slot is waiting to hear back on its GRAB_JOB_UNIQ, if the server
+        # assigns it a job, we run that job like any other
+        while self.running_jobs or self.command_handlers_holding_job_lock:
+            self._job_slot_freed.clear()
+            await self._job_slot_freed.wait()
+
+        self._flush_connections()
+        self.shutdown()
+
+        self._draining = False
+
+    def stop(self):
+        """Stop picking up new jobs, work() returns once our in-flight jobs are done and no handler is waiting on a job"""
+        self._draining = True
+        if self._stop_working is not None:
+            self._stop_working.set()
+
+    ###############################################################
+    ## Methods to override when dealing with connection polling ##
+    ##############################################################
+    async def establish_worker_connections(self):
+        """Return a shuffled list of connections that are alive, and try to reconnect to dead connections if necessary."""
+        self.randomized_connections = list(self.connection_list)
+        random.shuffle(self.randomized_connections)
+
+        # Reconnect to all our dead connections at once
+        return await self.establish_connections(self.randomized_connections)
+
+    #############################################################
+    ## Public methods so Gearman jobs can send Gearman updates ##
+    #############################################################
+    def _send_job_updates(self, current_job, job_updates, poll_timeout=None):
+        """Sends [(handler function name, kwargs), ...] for a job, our transports write them out on their own so we never wait"""
+        current_handler = self.connection_to_handler_map.get(current_job.connection)
+        if current_handler is None:
+            # The server already gave this job to someone else when our connection died
+            gearman_logger.warning('Dropping update for job on a dead connection: %r', current_job)
+            return
+
+        for handler_function_name, update_kwargs in job_updates:
+            getattr(current_handler, handler_function_name)(current_job, **update_kwargs)
+
+    def _wake_handlers_awaiting_job_slot(self):
+        super(AsyncGearmanWorker, self)._wake_handlers_awaiting_job_slot()
+
+        if self._job_slot_freed is not None:
+            self._job_slot_freed.set()
+
+    #####################################################
+    ##### Callback methods for GearmanWorkerHandler #####
+    #####################################################
+    def on_job_execute(self, current_job):
+        """Start running our job, our handler still holds its job slot so we can hand it straight to this job"""
+        job_task = asyncio.ensure_future(self._run_job(current_job))
+        self.running_jobs[job_task] = current_job
+        return True
+
+    async def _run_job(self, current_job):
+        try:
+            function_callback = self.worker_abilities[current_job.task]
+            job_result = function_callback(self, current_job)
+
+            # Plain functions work too, only wait on what needs waiting on
+            if inspect.isawaitable(job_result):
+                job_result = await job_result
+            elif inspect.isasyncgen(job_result) or inspect.isgenerator(job_result):
+                job_result = await self._stream_job_data(current_job, job_result)
+        except Exception:
+            self.on_job_exception(current_job, sys.exc_info())
+        else:
+            self.on_job_complete(current_job, job_result)
+        finally:
+            self.running_jobs.pop(asyncio.current_task(), None)
+            self._wake_handlers_awaiting_job_slot()
+
+            if not self.after_job():
+                self.stop()
+
+    async def _stream_job_data(self, current_job, job_generator):
+        """Send every chunk a generator task yields as a JOB_DATA update
+
+        Sync generators complete our job with whatever they return (b'' if nothing), async generators can't return a value
+        """
+        if inspect.isasyncgen(job_generator):
+            async for job_data in job_generator:
+                self.send_job_data(current_job, job_data)
+
+            return b''
+
+        while True:
+            try:
+                job_data = next(job_generator)
+            except StopIteration as generator_exit:
+                return b'' if generator_exit.value is None else generator_exit.value
+
+            self.send_job_data(current_job, job_data)
@@ -0,0 +1,91 @@
+import collections
+import random
+import time
+
+from gearman.constants import CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+
+class CircuitBreaker(object):
+    """Keeps us from reconnecting to a server that keeps refusing us
+
+    CLOSED - we connect as usual and remember how our last window_size attempts went.  Once at least
+             minimum_attempts of them are in and failure_threshold of them failed, we open our circuit
+    OPEN - every attempt fails right away without touching the network until our backoff runs out
+    HALF_OPEN - our backoff ran out, we let a single probe through and turn everyone else away until it reports
+                back.  Success closes our circuit, failure opens it again for twice as long (up to max_backoff_seconds)
+
+    Backoffs are jittered so a fleet of clients doesn't reconnect to a recovering server in lockstep
+    """
+    window_size = 10
+    minimum_attempts = 3
+    failure_threshold = 0.5
+
+    base_backoff_seconds = 1.0
+    max_backoff_seconds = 60.0
+
+    # Fraction of every backoff we may randomly shave off
+    backoff_jitter = 0.5
+
+    # A probe that never reported back (its connect was abandoned) is replaced after this long
+    probe_timeout_seconds = 60.0
+
+    def __init__(self):
+        self.state = CIRCUIT_CLOSED
+        self.open_count = 0
+        self.retry_time = 0.0
+
+        # Set from the moment we let our probe through until it succeeds or fails
+        self.probe_in_flight = False
+        self.probe_deadline = 0.0
+
+        # True for every attempt that failed
+        self._attempt_failures = collections.deque(maxlen=self.window_size)
+
+    def allow_attempt(self, current_time=None):
+        """Returns True if we may try connecting right now, cheap enough to call on every pass"""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+
+        current_time = time.time() if current_time is None else current_time
+        if self.probe_in_flight:
+            if current_time < self.probe_deadline:
+                return False
+        elif current_time < self.retry_time:
+            return False
+
+        self.state = CIRCUIT_HALF_OPEN
+        self.probe_in_flight = True
+        self.probe_deadline = current_time + self.probe_timeout_seconds
+        return True
+
+    def record_success(self):
+        # A successful probe starts us off with a clean window
+        if self.state != CIRCUIT_CLOSED:
+            self._attempt_failures.clear()
+
+        self.state = CIRCUIT_CLOSED
+        self.open_count = 0
+        self.probe_in_flight = False
+        self._attempt_failures.append(False)
+
+    def record_failure(self, current_time=None):
+        if self.state == CIRCUIT_HALF_OPEN:
+            self._open(current_time)
+            return
+
+        self._attempt_failures.append(True)
+        failure_count = sum(self._attempt_failures)
+        if len(self._attempt_failures) >= self.minimum_attempts and failure_count >= self.failure_threshold * len(self._attempt_failures):
+            self._open(current_time)
+
+    def get_backoff(self):
+        """Returns how long we stay open for, before jitter"""
+        return min(self.base_backoff_seconds * (2 ** max(self.open_count - 1, 0)), self.max_backoff_seconds)
+
+    def _open(self, current_time=None):
+        current_time = time.time() if current_time is None else current_time
+
+        self.state = CIRCUIT_OPEN
+        self.open_count += 1
+        self.probe_in_flight = False
+        self.retry_time = current_time + self.get_backoff() * (1.0 - self.backoff_jitter * random.random())
+        self._attempt_failures.clear()
@@ -1,8 +1,8 @@
 import binascii
 import collections
+import concurrent.futures
 import logging
 import os
-import random
 import weakref
 
 import gearman.util
@@ -11,26 +11,144 @@ from gearman.connection_manager import GearmanConnectionManager
 from gearman.client_handler import GearmanClientCommandHandler
 from gearman.constants import PRIORITY_NONE, PRIORITY_LOW, PRIORITY_HIGH, JOB_UNKNOWN, JOB_PENDING
 from gearman.errors import ConnectionError, ExceededConnectionAttempts, ServerUnavailable
+from gearman.routing import RandomRouter
 
 gearman_logger = logging.getLogger(__name__)
 
 # This number must be <= GEARMAN_UNIQUE_SIZE in gearman/libgearman/constants.h
 RANDOM_UNIQUE_BYTES = 16
 
-class GearmanClient(GearmanConnectionManager):
+class _RequestTracker(object):
+    """Keeps track of which of our job_requests match is_request_tracked
+
+    GearmanClient.on_request_updated keeps us up to date as our command handlers move requests along,
+    so wait loops can check how many requests they're still waiting on without scanning all of them
     """
-    GearmanClient :: Interface to submit jobs to a Gearman server
+    def __init__(self, job_requests, is_request_tracked):
+        self.is_request_tracked = is_request_tracked
+        self.job_requests = set(job_requests)
+
+        # Dicts keep our requests in the order they started matching
+        self.tracked_requests = dict.fromkeys(current_request for current_request in job_requests if is_request_tracked(current_request))
+
+    def add_request(self, current_request):
+        self.job_requests.add(current_request)
+        self.update_request(current_request)
+
+    def update_request(self, current_request):
+        if current_request not in self.job_requests:
+            return
+
+        if self.is_request_tracked(current_request):
+            self.tracked_requests.setdefault(current_request)
+        else:
+            self.tracked_requests.pop(current_request, None)
+
+    def remove_requests(self, finished_requests):
+        """Stop keeping track of requests we're done with"""
+        for current_request in finished_requests:
+            self.job_requests.discard(current_request)
+            self.tracked_requests.pop(current_request, None)
+
+    def __len__(self):
+        return len(self.tracked_requests)
+
+class GearmanJobFuture(concurrent.futures.Future):
+    """Future for a job submitted with GearmanClient.submit_job_async, its result is the job request itself
+
+    The future resolves once our request is complete (WORK_COMPLETE / WORK_FAIL, or JOB_CREATED for background jobs)
+    or once the connection it was running on went away.  Like submit_multiple_requests, you MUST check the state
+    of the returned request.  Our client only reads from the server while it's polling, so result() and exception()
+    poll for us, as does GearmanClient.as_completed
     """
-    command_handler_class = GearmanClientCommandHandler
+    def __init__(self, gearman_client, job_request):
+        super(GearmanJobFuture, self).__init__()
+        self.gearman_client = gearman_client
+        self.job_request = job_request
+
+        # Jobs can't be taken back once they're submitted
+        self.set_running_or_notify_cancel()
+
+    def result(self, timeout=None):
+        self._wait_until_done(timeout)
+        return super(GearmanJobFuture, self).result(timeout=0)
+
+    def exception(self, timeout=None):
+        self._wait_until_done(timeout)
+        return super(GearmanJobFuture, self).exception(timeout=0)
 
-    def __init__(self, host_list=None, random_unique_bytes=RANDOM_UNIQUE_BYTES):
-        super(GearmanClient, self).__init__(host_list=host_list)
+    def _wait_until_done(self, timeout):
+        if not self.done():
+            for _ in self.gearman_client.as_completed([self.job_request], timeout=timeout):
+                pass
+
+class _GearmanClientRequests(object):
+    """Builds job requests and picks the servers they go to, mixed into GearmanClient and AsyncGearmanClient
+
+    Only connecting differs between our blocking and our asyncio clients, they share everything around it
+    """
+    router_class = RandomRouter
+
+    def __init__(self, host_list=None, random_unique_bytes=RANDOM_UNIQUE_BYTES, router=None):
+        super(_GearmanClientRequests, self).__init__(host_list=host_list)
 
         self.random_unique_bytes = random_unique_bytes
 
+        # Picks the servers our requests go to, see gearman.routing
+        self.router = router if router is not None else self.router_class()
+
         # The authoritative copy of all requests that this client knows about
         # Ignores the fact if a request has been bound to a connection or not
-        self.request_to_rotating_connection_queue = weakref.WeakKeyDictionary(collections.defaultdict(collections.deque))
+        self.request_to_rotating_connection_queue = weakref.WeakKeyDictionary()
+
+    def _create_request_from_dictionary(self, job_info, background=False, max_retries=0):
+        """Takes a dictionary with fields  {'task': task, 'unique': unique, 'data': data, 'priority': priority, 'background': background}"""
+        # Make sure we have a unique identifier for ALL our tasks
+        job_unique = job_info.get('unique')
+        if not job_unique:
+            job_unique = binascii.hexlify(os.urandom(self.random_unique_bytes))
+
+        current_job = self.job_class(connection=None, handle=None, task=job_info['task'], unique=job_unique, data=job_info['data'])
+
+        initial_priority = job_info.get('priority', PRIORITY_NONE)
+
+        max_attempts = max_retries + 1
+        current_request = self.job_request_class(current_job, initial_priority=initial_priority, background=background, max_attempts=max_attempts)
+        return current_request
+
+    def _get_rotating_connections(self, current_request):
+        # We'll keep track of the connections we're attempting to use so if we ever have to retry, we can use this history
+        rotating_connections = self.request_to_rotating_connection_queue.get(current_request, None)
+        if not rotating_connections:
+            rotating_connections = collections.deque(self.router.get_connection_order(current_request, self.connection_list))
+            self.request_to_rotating_connection_queue[current_request] = rotating_connections
+
+        return rotating_connections
+
+    def _rotate_connections(self, rotating_connections, failed_connections, chosen_connection):
+        """Called once we tried connecting down our rotating_connections, returns the connection we got"""
+        if not chosen_connection:
+            raise ServerUnavailable('Found no valid connections: %r' % self.connection_list)
+
+        # Rotate our server list so we'll skip all our broken servers
+        rotating_connections.rotate(-failed_connections)
+        return chosen_connection
+
+class GearmanClient(_GearmanClientRequests, GearmanConnectionManager):
+    """
+    GearmanClient :: Interface to submit jobs to a Gearman server
+    """
+    command_handler_class = GearmanClientCommandHandler
+    job_future_class = GearmanJobFuture
+
+    def __init__(self, host_list=None, random_unique_bytes=RANDOM_UNIQUE_BYTES, router=None):
+        super(GearmanClient, self).__init__(host_list=host_list, random_unique_bytes=random_unique_bytes, router=router)
+
+        # Futures handed out by submit_job_async, only weakly held so dropping a future doesn't keep its request around
+        self.request_to_future = weakref.WeakKeyDictionary()
+
+        # _RequestTrackers our wait loops are currently using
+        self._request_trackers = []
 
     def submit_job(self, task, data, unique=None, priority=PRIORITY_NONE, background=False, wait_until_complete=True, max_retries=0, poll_timeout=None):
         """Submit a single job to any gearman server"""
@@ -38,7 +156,77 @@ class GearmanClient(GearmanConnectionManager):
         completed_job_list = self.submit_multiple_jobs([job_info], background=background, wait_until_complete=wait_until_complete, max_retries=max_retries, poll_timeout=poll_timeout)
         return gearman.util.unlist(completed_job_list)
 
-    def submit_multiple_jobs(self, jobs_to_submit, background=False, wait_until_complete=True, max_retries=0, poll_timeout=None):
+    def submit_job_async(self, task, data, unique=None, priority=PRIORITY_NONE, background=False, max_retries=0):
+        """Submit a single job to any gearman server without waiting on it, returns a GearmanJobFuture
+
+        Call result() on the future or pass our requests to as_completed to poll until jobs finish
+        """
+        job_info = dict(task=task, data=data, unique=unique, priority=priority)
+        current_request = self._create_request_from_dictionary(job_info, background=background, max_retries=max_retries)
+
+        job_future = self.job_future_class(self, current_request)
+        self.request_to_future[current_request] = weakref.ref(job_future)
+
+        self.send_job_request(current_request)
+        return job_future
+
+    def as_completed(self, job_requests, timeout=None):
+        """Yields job_requests one at a time as soon as they complete, fail or lose their connection
+
+        Requests whose connection failed before the server accepted them are retried, up to their max_retries.
+        Requests still running after timeout seconds aren't yielded and get marked as timed_out
+        """
+        stopwatch = gearman.util.Stopwatch(timeout)
+
+        def is_request_done(current_request):
+            # Futures that ran out of connection attempts are done too
+            job_future = self._get_request_future(current_request)
+            return self._is_request_finished(current_request) or bool(job_future is not None and job_future.done())
+
+        def is_request_unaccepted(current_request):
+            return bool(current_request.state == JOB_UNKNOWN and current_request.job.handle is None and not is_request_done(current_request))
+
+        done_tracker = self._track_requests(job_requests, is_request_done)
+        unaccepted_tracker = self._track_requests(job_requests, is_request_unaccepted)
+
+        # If our connection fails before our job's been accepted, automatically retry right here
+        def continue_while_none_done(any_activity):
+            for current_request in list(unaccepted_tracker.tracked_requests):
+                self._resend_job_request(current_request)
+
+            return not done_tracker
+
+        try:
+            while done_tracker.job_requests:
+                if done_tracker:
+                    done_requests = list(done_tracker.tracked_requests)
+                    done_tracker.remove_requests(done_requests)
+                    unaccepted_tracker.remove_requests(done_requests)
+
+                    for current_request in done_requests:
+                        current_request.timed_out = False
+                        yield current_request
+
+                    continue
+
+                time_remaining = stopwatch.get_time_remaining()
+                if time_remaining == 0.0:
+                    break
+
+                self.poll_connections_until_stopped(self.connection_list, continue_while_none_done, timeout=time_remaining)
+
+            for current_request in done_tracker.job_requests:
+                current_request.timed_out = True
+        finally:
+            self._untrack_requests(done_tracker, unaccepted_tracker)
+
+    def _resend_job_request(self, current_request):
+        try:
+            self.send_job_request(current_request)
+        except ExceededConnectionAttempts as connection_error:
+            self._set_request_exception(current_request, connection_error)
+
+    def submit_multiple_jobs(self, jobs_to_submit, background=False, wait_until_complete=True, max_retries=0, poll_timeout=None, max_in_flight=None, max_bytes_in_flight=None):
         """Takes a list of jobs_to_submit with dicts of
 
         {'task': task, 'data': data, 'unique': unique, 'priority': priority}
@@ -48,17 +236,39 @@ class GearmanClient(GearmanConnectionManager):
         # Convert all job dicts to job request objects
         requests_to_submit = [self._create_request_from_dictionary(job_info, background=background, max_retries=max_retries) for job_info in jobs_to_submit]
 
-        return self.submit_multiple_requests(requests_to_submit, wait_until_complete=wait_until_complete, poll_timeout=poll_timeout)
+        return self.submit_multiple_requests(requests_to_submit, wait_until_complete=wait_until_complete, poll_timeout=poll_timeout, max_in_flight=max_in_flight, max_bytes_in_flight=max_bytes_in_flight)
 
-    def submit_multiple_requests(self, job_requests, wait_until_complete=True, poll_timeout=None):
+    def submit_iter(self, job_iterable, background=False, wait_until_complete=True, max_retries=0, poll_timeout=None, max_in_flight=1000, max_bytes_in_flight=None):
+        """Takes an iterable of job dicts (see submit_multiple_jobs) and yields their requests as they finish
+
+        Jobs are only pulled from job_iterable once there's room for them in our window of max_in_flight jobs
+        (and max_bytes_in_flight bytes of job data), so we never hold more than a window's worth of jobs no matter
+        how many job_iterable has.  A job leaves our window once it's complete, or once it's accepted if we're
+        not waiting for it to complete.  Jobs still in our window after poll_timeout seconds are yielded with timed_out set
+        """
+        job_requests = (self._create_request_from_dictionary(job_info, background=background, max_retries=max_retries) for job_info in job_iterable)
+        return self._submit_windowed(job_requests, wait_until_complete=wait_until_complete, poll_timeout=poll_timeout, max_in_flight=max_in_flight, max_bytes_in_flight=max_bytes_in_flight)
+
+    def submit_multiple_requests(self, job_requests, wait_until_complete=True, poll_timeout=None, max_in_flight=None, max_bytes_in_flight=None):
         """Take GearmanJobRequests, assign them connections, and request that they be done.
 
         * Blocks until our jobs are accepted (should be fast) OR times out
         * Optionally blocks until jobs are all complete
+        * Optionally keeps at most max_in_flight jobs (and max_bytes_in_flight bytes of job data) submitted at once, see submit_iter
 
         You MUST check the status of your requests after calling this function as "timed_out" or "state == JOB_UNKNOWN" maybe True
         """
         assert type(job_requests) in (list, tuple, set), "Expected multiple job requests, received 1?"
+        if max_in_flight is not None or max_bytes_in_flight is not None:
+            finished_requests = set(self._submit_windowed(job_requests, wait_until_complete=wait_until_complete, poll_timeout=poll_timeout, max_in_flight=max_in_flight, max_bytes_in_flight=max_bytes_in_flight))
+
+            # Requests we never got around to submitting timed out too
+            for current_request in job_requests:
+                if current_request not in finished_requests:
+                    current_request.timed_out = True
+
+            return job_requests
+
         stopwatch = gearman.util.Stopwatch(poll_timeout)
 
         # We should always wait until our job is accepted, this should be fast
@@ -72,6 +282,100 @@ class GearmanClient(GearmanConnectionManager):
 
         return processed_requests
 
+    def _submit_windowed(self, job_requests, wait_until_complete=True, poll_timeout=None, max_in_flight=None, max_bytes_in_flight=None):
+        """Yields job_requests as they finish, only pulling the next request from job_requests once our window has room for it"""
+        stopwatch = gearman.util.Stopwatch(poll_timeout)
+        request_iterator = iter(job_requests)
+
+        def is_request_finished(current_request):
+            if wait_until_complete:
+                return self._is_request_finished(current_request)
+
+            return bool(current_request.state != JOB_PENDING and not is_request_unaccepted(current_request))
+
+        def is_request_unaccepted(current_request):
+            return bool(current_request.state == JOB_UNKNOWN and current_request.job.handle is None)
+
+        # Every request in our window is in finished_tracker.job_requests
+        finished_tracker = self._track_requests([], is_request_finished)
+        unaccepted_tracker = self._track_requests([], is_request_unaccepted)
+        # Only count bytes when asked to, our data may not even have a size until our encoder's had a go at it
+        request_to_size = {}
+        in_flight_bytes = 0
+        next_request = None
+
+        # If our connection fails before our job's been accepted, automatically retry right here
+        def continue_while_none_finished(any_activity):
+            for current_request in list(unaccepted_tracker.tracked_requests):
+                self.send_job_request(current_request)
+
+            return not finished_tracker
+
+        try:
+            while True:
+                # Hand back whatever finished, freeing up its spot in our window
+                if finished_tracker:
+                    finished_requests = list(finished_tracker.tracked_requests)
+                    finished_tracker.remove_requests(finished_requests)
+                    unaccepted_tracker.remove_requests(finished_requests)
+
+                    for current_request in finished_requests:
+                        in_flight_bytes -= request_to_size.pop(current_request, 0)
+                        current_request.timed_out = False
+                        if current_request.complete:
+                            self.request_to_rotating_connection_queue.pop(current_request, None)
+
+                        yield current_request
+
+                    continue
+
+                # Top up our window, a window with nothing in flight always takes the next request however big it is
+                while True:
+                    if next_request is None:
+                        next_request = next(request_iterator, None)
+                        if next_request is None:
+                            break
+
+                    if max_bytes_in_flight is not None and next_request not in request_to_size:
+                        request_to_size[next_request] = self._get_request_size(next_request)
+
+                    in_flight_count = len(finished_tracker.job_requests)
+                    window_full = max_in_flight is not None and in_flight_count >= max_in_flight
+                    window_full = window_full or (max_bytes_in_flight is not None and in_flight_bytes + request_to_size[next_request] > max_bytes_in_flight)
+                    if in_flight_count and window_full:
+                        break
+
+                    finished_tracker.add_request(next_request)
+                    unaccepted_tracker.add_request(next_request)
+                    in_flight_bytes += request_to_size.get(next_request, 0)
+                    next_request = None
+
+                # Our iterator ran dry and everything we submitted finished
+                if not finished_tracker.job_requests:
+                    break
+
+                time_remaining = stopwatch.get_time_remaining()
+                if time_remaining == 0.0:
+                    break
+
+                self.poll_connections_until_stopped(self.connection_list, continue_while_none_finished, timeout=time_remaining)
+
+            # Whatever we're still holding on to timed out
+            timed_out_requests = list(finished_tracker.job_requests)
+        finally:
+            self._untrack_requests(finished_tracker, unaccepted_tracker)
+
+        if next_request is not None:
+            timed_out_requests.append(next_request)
+
+        for current_request in timed_out_requests:
+            current_request.timed_out = True
+            yield current_request
+
+    def _get_request_size(self, current_request):
+        """Returns how many bytes of job data a request puts on the wire"""
+        return len(self.data_encoder.encode(current_request.job.data))
+
     def wait_until_jobs_accepted(self, job_requests, poll_timeout=None):
         """Go into a select loop until all our jobs have moved to STATE_PENDING"""
         assert type(job_requests) in (list, tuple, set), "Expected multiple job requests, received 1?"
@@ -79,16 +383,24 @@ class GearmanClient(GearmanConnectionManager):
         def is_request_pending(current_request):
             return bool(current_request.state == JOB_PENDING)
 
+        def is_request_unknown(current_request):
+            return bool(current_request.state == JOB_UNKNOWN)
+
+        pending_tracker = self._track_requests(job_requests, is_request_pending)
+        unknown_tracker = self._track_requests(job_requests, is_request_unknown)
+
         # Poll until we know we've gotten acknowledgement that our job's been accepted
         # If our connection fails while we're waiting for it to be accepted, automatically retry right here
         def continue_while_jobs_pending(any_activity):
-            for current_request in job_requests:
-                if current_request.state == JOB_UNKNOWN:
-                    self.send_job_request(current_request)
+            for current_request in list(unknown_tracker.tracked_requests):
+                self.send_job_request(current_request)
 
-            return any(is_request_pending(current_request) for current_request in job_requests)
+            return bool(pending_tracker)
 
-        self.poll_connections_until_stopped(self.connection_list, continue_while_jobs_pending, timeout=poll_timeout)
+        try:
+            self.poll_connections_until_stopped(self.connection_list, continue_while_jobs_pending, timeout=poll_timeout)
+        finally:
+            self._untrack_requests(pending_tracker, unknown_tracker)
 
         # Mark any job still in the queued state to poll_timeout
         for current_request in job_requests:
@@ -103,16 +415,20 @@ class GearmanClient(GearmanConnectionManager):
         def is_request_incomplete(current_request):
             return not current_request.complete
 
-        # Poll until we get responses for all our functions
         # Do NOT attempt to auto-retry connection failures as we have no idea how for a worker got
-        def continue_while_jobs_incomplete(any_activity):
-            for current_request in job_requests:
-                if is_request_incomplete(current_request) and current_request.state != JOB_UNKNOWN:
-                    return True
+        def is_request_running(current_request):
+            return is_request_incomplete(current_request) and current_request.state != JOB_UNKNOWN
 
-            return False
+        running_tracker = self._track_requests(job_requests, is_request_running)
 
-        self.poll_connections_until_stopped(self.connection_list, continue_while_jobs_incomplete, timeout=poll_timeout)
+        # Poll until we get responses for all our functions
+        def continue_while_jobs_incomplete(any_activity):
+            return bool(running_tracker)
+
+        try:
+            self.poll_connections_until_stopped(self.connection_list, continue_while_jobs_incomplete, timeout=poll_timeout)
+        finally:
+            self._untrack_requests(running_tracker)
 
         # Mark any job still in the queued state to poll_timeout
         for current_request in job_requests:
@@ -123,6 +439,34 @@ class GearmanClient(GearmanConnectionManager):
 
         return job_requests
 
+    def stream_job_data(self, current_request, poll_timeout=None):
+        """Yields a request's WORK_DATA updates as they arrive, stops once it's complete or after poll_timeout seconds
+
+        Updates are popped off of current_request.data_updates as we yield them, so only the ones we haven't gotten to yet stay in memory
+        """
+        stopwatch = gearman.util.Stopwatch(poll_timeout)
+
+        def is_request_incomplete(current_request):
+            return not current_request.complete and current_request.state != JOB_UNKNOWN
+
+        # Poll until we get our next update, hand it off before we read any more
+        def continue_while_no_data_updates(any_activity):
+            return not current_request.data_updates and is_request_incomplete(current_request)
+
+        while True:
+            while current_request.data_updates:
+                yield current_request.data_updates.popleft()
+
+            time_remaining = stopwatch.get_time_remaining()
+            if not is_request_incomplete(current_request) or time_remaining == 0.0:
+                break
+
+            self.poll_connections_until_stopped(self.connection_list, continue_while_no_data_updates, timeout=time_remaining)
+
+        current_request.timed_out = not current_request.complete
+        if not current_request.timed_out:
+            self.request_to_rotating_connection_queue.pop(current_request, None)
+
     def get_job_status(self, current_request, poll_timeout=None):
         """Fetch the job status of a single request"""
         request_list = self.get_job_statuses([current_request], poll_timeout=poll_timeout)
@@ -148,15 +492,19 @@ class GearmanClient(GearmanConnectionManager):
             current_status = current_request.status
             return bool(current_status.get('time_received') == current_status.get('last_time_received'))
 
+        def is_status_outstanding(current_request):
+            return is_status_not_updated(current_request) and current_request.state != JOB_UNKNOWN
+
+        outstanding_tracker = self._track_requests(job_requests, is_status_outstanding)
+
         # Poll to make sure we send out our request for a status update
         def continue_while_status_not_updated(any_activity):
-            for current_request in job_requests:
-                if is_status_not_updated(current_request) and current_request.state != JOB_UNKNOWN:
-                    return True
-
-            return False
+            return bool(outstanding_tracker)
 
-        self.poll_connections_until_stopped(self.connection_list, continue_while_status_not_updated, timeout=poll_timeout)
+        try:
+            self.poll_connections_until_stopped(self.connection_list, continue_while_status_not_updated, timeout=poll_timeout)
+        finally:
+            self._untrack_requests(outstanding_tracker)
 
         for current_request in job_requests:
             current_request.status = current_request.status or {}
@@ -164,48 +512,94 @@ class GearmanClient(GearmanConnectionManager):
 
         return job_requests
 
-    def _create_request_from_dictionary(self, job_info, background=False, max_retries=0):
-        """Takes a dictionary with fields  {'task': task, 'unique': unique, 'data': data, 'priority': priority, 'background': background}"""
-        # Make sure we have a unique identifier for ALL our tasks
-        job_unique = job_info.get('unique')
-        if not job_unique:
-            job_unique = binascii.hexlify(os.urandom(self.random_unique_bytes))
+    def on_request_updated(self, current_request):
+        """Called by our command handlers whenever a request changes state or receives an update"""
+        self.router.request_updated(current_request)
+        self._update_request_trackers(current_request)
+        if self._is_request_finished(current_request):
+            self._set_request_done(current_request)
 
-        current_job = self.job_class(connection=None, handle=None, task=job_info['task'], unique=job_unique, data=job_info['data'])
+    def _track_requests(self, job_requests, is_request_tracked):
+        request_tracker = _RequestTracker(job_requests, is_request_tracked)
+        self._request_trackers.append(request_tracker)
+        return request_tracker
 
-        initial_priority = job_info.get('priority', PRIORITY_NONE)
+    def _untrack_requests(self, *request_trackers):
+        for request_tracker in request_trackers:
+            self._request_trackers.remove(request_tracker)
 
-        max_attempts = max_retries + 1
-        current_request = self.job_request_class(current_job, initial_priority=initial_priority, background=background, max_attempts=max_attempts)
-        return current_request
+    def _update_request_trackers(self, current_request):
+        for request_tracker in self._request_trackers:
+            request_tracker.update_request(current_request)
+
+    def _is_request_finished(self, current_request):
+        """Returns True once a request completed or lost the connection the server accepted it on"""
+        # Do NOT attempt to auto-retry connection failures as we have no idea how far a worker got
+        return current_request.complete or bool(current_request.state == JOB_UNKNOWN and current_request.job.handle is not None)
+
+    def _get_request_future(self, current_request):
+        future_ref = self.request_to_future.get(current_request)
+        return future_ref and future_ref()
+
+    def _set_request_done(self, current_request):
+        job_future = self._get_request_future(current_request)
+        if job_future is None or job_future.done():
+            return
+
+        if current_request.complete:
+            self.request_to_rotating_connection_queue.pop(current_request, None)
+
+        job_future.set_result(current_request)
+
+    def _set_request_exception(self, current_request, request_exception):
+        job_future = self._get_request_future(current_request)
+        if job_future is None:
+            raise request_exception
+
+        job_future.set_exception(request_exception)
+        self._update_request_trackers(current_request)
 
     def establish_request_connection(self, current_request):
-        """Return a live connection for the given hash"""
-        # We'll keep track of the connections we're attempting to use so if we ever have to retry, we can use this history
-        rotating_connections = self.request_to_rotating_connection_queue.get(current_request, None)
-        if not rotating_connections:
-            shuffled_connection_list = list(self.connection_list)
-            random.shuffle(shuffled_connection_list)
+        """Return a live connection for the given hash
 
-            rotating_connections = collections.deque(shuffled_connection_list)
-            self.request_to_rotating_connection_queue[current_request] = rotating_connections
+        We connect to every server down our rotation at once, up to the first one that's already up,
+        and take the first one that answers
+        """
+        rotating_connections = self._get_rotating_connections(current_request)
 
-        failed_connections = 0
-        chosen_connection = None
         for possible_connection in rotating_connections:
-            try:
-                chosen_connection = self.establish_connection(possible_connection)
+            if possible_connection.connected:
                 break
+
+            if possible_connection.connecting:
+                continue
+
+            try:
+                self._start_connect(possible_connection)
             except ConnectionError:
-                # Rotate our server list so we'll skip all our broken servers
-                failed_connections += 1
+                continue
 
-        if not chosen_connection:
-            raise ServerUnavailable('Found no valid connections: %r' % self.connection_list)
+            if possible_connection.connected:
+                break
 
-        # Rotate our server list so we'll skip all our broken servers
-        rotating_connections.rotate(-failed_connections)
-        return chosen_connection
+        # Our other connections keep getting serviced while we wait, connects still under way finish in the background
+        while not any(possible_connection.connected for possible_connection in rotating_connections):
+            if not any(possible_connection.connecting for possible_connection in rotating_connections):
+                break
+
+            self._poll_connecting_connections()
+
+        # Skip every server in front of the one we got
+        skipped_connections = 0
+        chosen_connection = None
+        for possible_connection in rotating_connections:
+            if possible_connection.connected:
+                chosen_connection = possible_connection
+                break
+
+            skipped_connections += 1
+
+        return self._rotate_connections(rotating_connections, skipped_connections, chosen_connection)
 
     def send_job_request(self, current_request):
         """Attempt to send out a job request"""
@@ -218,6 +612,8 @@ class GearmanClient(GearmanConnectionManager):
         current_request.connection_attempts += 1
         current_request.timed_out = False
 
+        self.router.request_sent(current_request, chosen_connection)
+
         current_command_handler = self.connection_to_handler_map[chosen_connection]
         current_command_handler.send_job_request(current_request)
         return current_request
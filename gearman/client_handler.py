@@ -38,6 +38,7 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         current_request.state = JOB_PENDING
 
         self.requests_awaiting_handles.append(current_request)
+        self._notify_request_updated(current_request)
 
     def send_get_status_of_job(self, current_request):
         """Forward the status of a job"""
@@ -45,11 +46,12 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         self.send_command(GEARMAN_COMMAND_GET_STATUS, job_handle=current_request.job.handle)
 
     def on_io_error(self):
-        for pending_request in self.requests_awaiting_handles:
-            pending_request.state = JOB_UNKNOWN
+        failed_requests = list(self.requests_awaiting_handles) + list(self.handle_to_request_map.values())
+        for failed_request in failed_requests:
+            failed_request.state = JOB_UNKNOWN
 
-        for inflight_request in self.handle_to_request_map.values():
-            inflight_request.state = JOB_UNKNOWN
+        for failed_request in failed_requests:
+            self._notify_request_updated(failed_request)
 
     def _register_request(self, current_request):
         self.handle_to_request_map[current_request.job.handle] = current_request
@@ -58,6 +60,10 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         # De-allocate this request for all jobs
         return self.handle_to_request_map.pop(current_request.job.handle, None)
 
+    def _notify_request_updated(self, current_request):
+        """Lets our connection manager know a request changed state or received an update"""
+        self.connection_manager.on_request_updated(current_request)
+
     ##################################################################
     ## Gearman command callbacks with kwargs defined by protocol.py ##
     ##################################################################
@@ -77,6 +83,7 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         current_request.job.handle = job_handle
         current_request.state = JOB_CREATED
         self._register_request(current_request)
+        self._notify_request_updated(current_request)
 
         return True
 
@@ -86,6 +93,7 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         self._assert_request_state(current_request, JOB_CREATED)
 
         current_request.data_updates.append(self.decode_data(data))
+        self._notify_request_updated(current_request)
 
         return True
 
@@ -95,6 +103,7 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         self._assert_request_state(current_request, JOB_CREATED)
 
         current_request.warning_updates.append(self.decode_data(data))
+        self._notify_request_updated(current_request)
 
         return True
 
@@ -113,6 +122,8 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
             'denominator': int(denominator),
             'time_received': time.time()
         }
+        self._notify_request_updated(current_request)
+
         return True
 
     def recv_work_complete(self, job_handle, data):
@@ -123,6 +134,7 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         current_request.result = self.decode_data(data)
         current_request.state = JOB_COMPLETE
         self._unregister_request(current_request)
+        self._notify_request_updated(current_request)
 
         return True
 
@@ -133,6 +145,7 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
 
         current_request.state = JOB_FAILED
         self._unregister_request(current_request)
+        self._notify_request_updated(current_request)
 
         return True
 
@@ -144,6 +157,7 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         self._assert_request_state(current_request, JOB_CREATED)
 
         current_request.exception = self.decode_data(data)
+        self._notify_request_updated(current_request)
 
         return True
 
@@ -166,4 +180,6 @@ class GearmanClientCommandHandler(GearmanCommandHandler):
         if not job_known:
             self._unregister_request(current_request)
 
+        self._notify_request_updated(current_request)
+
         return True
@@ -1,9 +1,12 @@
 import logging
 from gearman.errors import UnknownCommandError
-from gearman.protocol import get_command_name
+from gearman.protocol import GEARMAN_COMMAND_TO_NAME, get_command_name
 
 gearman_logger = logging.getLogger(__name__)
 
+# Maps cmd_type -> the name of the recv_* callback handling it, GEARMAN_COMMAND_JOB_CREATED -> recv_job_created
+RECV_FUNCTION_NAME_FOR_COMMAND = dict((cmd_type, gearman_command_name.lower().replace('gearman_command_', 'recv_')) for cmd_type, gearman_command_name in GEARMAN_COMMAND_TO_NAME.items())
+
 class GearmanCommandHandler(object):
     """A command handler manages the state which we should be in given a certain stream of commands
 
@@ -12,6 +15,13 @@ class GearmanCommandHandler(object):
     def __init__(self, connection_manager=None):
         self.connection_manager = connection_manager
 
+        # Bound per instance so subclass and instance level recv_* overrides are honoured
+        self._command_callbacks = {}
+        for cmd_type, recv_command_function_name in RECV_FUNCTION_NAME_FOR_COMMAND.items():
+            cmd_callback = getattr(self, recv_command_function_name, None)
+            if cmd_callback is not None:
+                self._command_callbacks[cmd_type] = cmd_callback
+
     def initial_state(self, *largs, **kwargs):
         """Called by a Connection Manager after we've been instantiated and we're ready to send off commands"""
         pass
@@ -46,17 +56,15 @@ class GearmanCommandHandler(object):
         """Maps any command to a recv_* callback function"""
         completed_work = None
 
-        gearman_command_name = get_command_name(cmd_type)
-        if bool(gearman_command_name == cmd_type) or not gearman_command_name.startswith('GEARMAN_COMMAND_'):
-            unknown_command_msg = 'Could not handle command: %r - %r' % (gearman_command_name, cmd_args)
-            gearman_logger.error(unknown_command_msg)
-            raise ValueError(unknown_command_msg)
-
-        recv_command_function_name = gearman_command_name.lower().replace('gearman_command_', 'recv_')
+        cmd_callback = self._command_callbacks.get(cmd_type)
+        if cmd_callback is None:
+            gearman_command_name = get_command_name(cmd_type)
+            if bool(gearman_command_name == cmd_type) or not gearman_command_name.startswith('GEARMAN_COMMAND_'):
+                unknown_command_msg = 'Could not handle command: %r - %r' % (gearman_command_name, cmd_args)
+                gearman_logger.error(unknown_command_msg)
+                raise ValueError(unknown_command_msg)
 
-        cmd_callback = getattr(self, recv_command_function_name, None)
-        if not cmd_callback:
-            missing_callback_msg = 'Could not handle command: %r - %r' % (get_command_name(cmd_type), cmd_args)
+            missing_callback_msg = 'Could not handle command: %r - %r' % (gearman_command_name, cmd_args)
             gearman_logger.error(missing_callback_msg)
             raise UnknownCommandError(missing_callback_msg)
 
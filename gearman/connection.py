@@ -1,19 +1,38 @@
 import collections
-import io
+import errno
 import logging
 import os
+import selectors
 import socket
 import struct
 import time
 
+import gearman.util
+from gearman.circuit_breaker import CircuitBreaker
 from gearman.errors import ConnectionError, ProtocolError, ServerUnavailable
-from gearman.constants import DEFAULT_GEARMAN_PORT, _DEBUG_MODE_
-from gearman.protocol import GEARMAN_PARAMS_FOR_COMMAND, GEARMAN_COMMAND_TEXT_COMMAND, NULL_CHAR, \
-    get_command_name, pack_binary_command, parse_binary_command, parse_text_command, pack_text_command, \
-    binary_command_size
+from gearman.constants import DEFAULT_GEARMAN_PORT, UNIX_SOCKET_PREFIX, _DEBUG_MODE_
+from gearman.protocol import GEARMAN_PARAMS_FOR_COMMAND, GEARMAN_COMMAND_TEXT_COMMAND, NULL_CHAR, COMMAND_HEADER_SIZE, \
+    get_command_name, pack_binary_command, pack_binary_commands, parse_binary_command, parse_binary_command_view, parse_text_command, \
+    pack_text_command, binary_command_size
 
 gearman_logger = logging.getLogger(__name__)
 
+# Scatter/gather writes are not available everywhere (Windows), fall back to
+# sending one command at a time
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+# Stay well under IOV_MAX for a single sendmsg call
+SEND_MAX_BUFFERS = 64
+
+# Keepalive tuning is named differently (or missing) depending on the platform
+_TCP_KEEPIDLE = getattr(socket, 'TCP_KEEPIDLE', getattr(socket, 'TCP_KEEPALIVE', None))
+_TCP_KEEPINTVL = getattr(socket, 'TCP_KEEPINTVL', None)
+_TCP_KEEPCNT = getattr(socket, 'TCP_KEEPCNT', None)
+_TCP_USER_TIMEOUT = getattr(socket, 'TCP_USER_TIMEOUT', None)
+
+# connect_ex results telling us a non-blocking connect is under way
+CONNECT_IN_PROGRESS_ERRNOS = set([errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK)])
+
 class GearmanConnection(object):
     """A connection between a client/worker and a server.  Can be used to reconnect (unlike a socket)
 
@@ -26,18 +45,62 @@ class GearmanConnection(object):
 
     All I/O and buffering should be done in this class
     """
-    connect_cooldown_seconds = 1.0
+    # Decides when we're allowed to reconnect to a server that keeps failing us
+    circuit_breaker_class = CircuitBreaker
+
+    # Seconds we give a server to accept our connection, a blackholed server would otherwise hold us up for minutes
+    connect_timeout = 5.0
+
+    # Options for every socket we connect, see get_socket_options.  None leaves the OS default in place
+    #
+    # Nagle's algorithm holds a small command (GRAB_JOB, WORK_STATUS, ...) back until the server ACKs our
+    # last write, a server that has nothing to say back delays its ACK by up to 40ms
+    tcp_nodelay = True
+
+    # Notice servers that vanished without closing our connection, after idle + interval * count seconds
+    tcp_keepalive = True
+    tcp_keepalive_idle = 60
+    tcp_keepalive_interval = 10
+    tcp_keepalive_count = 6
+
+    # Seconds our writes may go unacknowledged before the kernel drops our connection (Linux only)
+    tcp_user_timeout = None
+
+    # Kernel socket buffer sizes (SO_SNDBUF / SO_RCVBUF) in bytes
+    socket_send_buffer_size = None
+    socket_recv_buffer_size = None
 
     # Maximum amount of data sent through socket at one time
     send_buffer_size = 100000
 
+    # Smallest and largest amount of data received through socket at one time
+    # We read more than the minimum when a command header announces a larger payload
+    recv_buffer_size = 4096
+    max_recv_buffer_size = 1024 * 1024
+
+    # When zero_copy_data is set, commands at least this large hand out their 'data'
+    # argument as a memoryview into our receive buffer instead of a copy
+    zero_copy_threshold = 64 * 1024
+
     def __init__(self, host=None, port=DEFAULT_GEARMAN_PORT):
-        port = port or DEFAULT_GEARMAN_PORT
+        if host is None:
+            raise ServerUnavailable("No host specified")
+
+        # Unix domain sockets have a path instead of a port
+        self.unix_socket_path = None
+        if host.startswith(UNIX_SOCKET_PREFIX):
+            self.unix_socket_path = host[len(UNIX_SOCKET_PREFIX):]
+            port = None
+        else:
+            port = port or DEFAULT_GEARMAN_PORT
+
         self.gearman_host = host
         self.gearman_port = port
 
-        if host is None:
-            raise ServerUnavailable("No host specified")
+        self.zero_copy_data = False
+
+        # Outlives our sockets, so we remember how our server's been doing across reconnects
+        self.circuit_breaker = self.circuit_breaker_class()
 
         self._reset_connection()
 
@@ -46,16 +109,31 @@ class GearmanConnection(object):
         self.connected = False
         self.gearman_socket = None
 
-        self.allowed_connect_time = 0.0
+        # Set while a non-blocking connect is under way, until connect_deadline
+        self.connecting = False
+        self.connect_deadline = None
+
+        # Addresses of our server we fall back to if our current connect fails
+        self._connect_addresses = collections.deque()
 
         self._is_client_side = None
         self._is_server_side = None
 
-        # Reset all our raw data buffers -- outgoing buffer must store data in
-        # reverse to reduce the amount of manipulations for commands with
-        # a large payload
-        self._incoming_buffer = io.BytesIO()
-        self._outgoing_buffer = io.BytesIO()
+        # Reset all our raw data buffers
+        #
+        # The incoming buffer is only ever appended to, we keep a read offset
+        # into it and compact it once the consumed prefix gets large.  We receive
+        # straight into its free tail, everything past _incoming_size is spare room
+        #
+        # The outgoing buffer is a queue of packed commands that we hand to the
+        # socket as-is, partial sends only advance a view into the first command
+        self._incoming_buffer = bytearray()
+        self._incoming_offset = 0
+        self._incoming_size = 0
+        self._incoming_buffer_exported = False
+        self._incoming_command_size = None
+        self._outgoing_buffer = collections.deque()
+        self._outgoing_buffer_size = 0
 
         # Toss all commands we may have sent or received
         self._incoming_commands = collections.deque()
@@ -74,40 +152,196 @@ class GearmanConnection(object):
 
     def writable(self):
         """Returns True if we have data to write"""
-        return self.connected and bool(self._outgoing_commands or self._outgoing_buffer.tell())
+        return self.connected and bool(self._outgoing_commands or self._outgoing_buffer)
 
     def readable(self):
         """Returns True if we might have data to read"""
         return self.connected
 
     def connect(self):
-        """Connect to the server. Raise ConnectionError if connection fails."""
-        if self.connected:
+        """Connect to the server, waiting at most connect_timeout. Raise ConnectionError if connection fails."""
+        self.start_connect()
+
+        # We get a new socket every time we fall back to another address
+        while self.connecting:
+            with selectors.DefaultSelector() as connect_selector:
+                connect_selector.register(self.gearman_socket, selectors.EVENT_WRITE)
+                socket_ready = connect_selector.select(max(self.connect_deadline - time.time(), 0.0))
+
+            if socket_ready:
+                self.finish_connect()
+            else:
+                self.check_connect_timeout(self.connect_deadline)
+
+    def start_connect(self):
+        """Start connecting to the server without waiting for it to answer, we're either connected or connecting on return
+
+        Connections left connecting are ours to poll for writes, then to finish with finish_connect or give up on
+        with check_connect_timeout.  Both may leave us connecting to our server's next address on a new socket.
+        Raise ConnectionError if connection fails.
+        """
+        if self.connected or self.connecting:
             self.throw_exception(message='connection already established')
 
-        current_time = time.time()
-        if current_time < self.allowed_connect_time:
-            self.throw_exception(message='attempted to connect before required cooldown')
-
-        self.allowed_connect_time = current_time + self.connect_cooldown_seconds
+        # Don't pay for a connect we expect to fail
+        if not self.circuit_breaker.allow_attempt():
+            self.throw_exception(message='circuit open, not retrying before %.3f' % self.circuit_breaker.retry_time)
 
         self._reset_connection()
 
-        self._create_client_socket()
+        try:
+            self._create_client_socket()
+        except ConnectionError:
+            self.circuit_breaker.record_failure()
+            raise
+
+        self._connect_started()
+
+    def finish_connect(self):
+        """Called once our socket turns writable while connecting. Raise ConnectionError if connection failed."""
+        connect_errno = self.gearman_socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if connect_errno:
+            self._fail_connect(exception=socket.error(connect_errno, os.strerror(connect_errno)))
+        else:
+            self._set_connected()
+
+    def check_connect_timeout(self, current_time=None):
+        """Give up on a connect the server didn't answer by connect_deadline. Raise ConnectionError if we gave up."""
+        current_time = time.time() if current_time is None else current_time
+        if self.connecting and current_time >= self.connect_deadline:
+            self._fail_connect(message='timed out connecting after %.3fs' % self.connect_timeout)
+
+    def _connect_started(self):
+        if self.connecting:
+            self.connect_deadline = time.time() + self.connect_timeout
+        else:
+            self._set_connected()
+
+    def _set_connected(self):
+        self.circuit_breaker.record_success()
+
+        self.connecting = False
+        self.connect_deadline = None
 
         self.connected = True
         self._is_client_side = True
         self._is_server_side = False
 
+    def _fail_connect(self, message=None, exception=None):
+        # Don't leave half-open sockets behind
+        remaining_addresses = self._connect_addresses
+        self.close()
+
+        # Our server may still answer on one of its other addresses, every address gets its own connect_timeout
+        if remaining_addresses:
+            self._connect_addresses = remaining_addresses
+            try:
+                self._connect_next_address()
+            except ConnectionError:
+                self.circuit_breaker.record_failure()
+                raise
+
+            self._connect_started()
+            return
+
+        self.circuit_breaker.record_failure()
+        self.throw_exception(message=message, exception=exception)
+
+    def get_socket_options(self):
+        """Returns the (level, option, value) tuples we set on every socket we connect, options our platform lacks are skipped"""
+        # Unix domain sockets have no TCP options
+        socket_options = []
+        if self.unix_socket_path is None:
+            socket_options.extend(self._get_tcp_options())
+
+        # Receive buffers need to be sized before we connect for TCP to advertise a larger window
+        if self.socket_send_buffer_size is not None:
+            socket_options.append((socket.SOL_SOCKET, socket.SO_SNDBUF, self.socket_send_buffer_size))
+
+        if self.socket_recv_buffer_size is not None:
+            socket_options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, self.socket_recv_buffer_size))
+
+        return socket_options
+
+    def _get_tcp_options(self):
+        tcp_options = []
+        if self.tcp_nodelay is not None:
+            tcp_options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.tcp_nodelay)))
+
+        if self.tcp_keepalive is not None:
+            tcp_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, int(self.tcp_keepalive)))
+
+        if self.tcp_keepalive:
+            for tcp_option, option_value in ((_TCP_KEEPIDLE, self.tcp_keepalive_idle), (_TCP_KEEPINTVL, self.tcp_keepalive_interval), (_TCP_KEEPCNT, self.tcp_keepalive_count)):
+                if tcp_option is not None and option_value is not None:
+                    tcp_options.append((socket.IPPROTO_TCP, tcp_option, int(option_value)))
+
+        if _TCP_USER_TIMEOUT is not None and self.tcp_user_timeout is not None:
+            tcp_options.append((socket.IPPROTO_TCP, _TCP_USER_TIMEOUT, int(self.tcp_user_timeout * 1000)))
+
+        return tcp_options
+
+    def set_socket_options(self, current_socket):
+        for option_level, option_name, option_value in self.get_socket_options():
+            current_socket.setsockopt(option_level, option_name, option_value)
+
     def _create_client_socket(self):
-        """Creates a client side socket and subsequently binds/configures our socket options"""
+        """Creates a client side socket and starts connecting it, sets connecting if the server has yet to answer"""
         try:
-            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client_socket.connect((self.gearman_host, self.gearman_port))
+            self._connect_addresses = collections.deque(self._get_socket_addresses())
         except socket.error as socket_exception:
             self.throw_exception(exception=socket_exception)
 
-        self.set_socket(client_socket)
+        self._connect_next_address()
+
+    def _connect_next_address(self):
+        """Starts connecting to the first of our remaining addresses that doesn't refuse us outright"""
+        connect_exception = None
+        while self._connect_addresses:
+            socket_family, socket_address = self._connect_addresses.popleft()
+
+            client_socket = None
+            try:
+                client_socket = socket.socket(socket_family, socket.SOCK_STREAM)
+                self.set_socket_options(client_socket)
+                client_socket.setblocking(0)
+                connect_errno = client_socket.connect_ex(socket_address)
+            except socket.error as socket_exception:
+                if client_socket is not None:
+                    client_socket.close()
+
+                connect_exception = socket_exception
+                continue
+
+            # Unix domain sockets connect right away, EAGAIN means the server's backlog is full
+            connect_in_progress = socket_family != getattr(socket, 'AF_UNIX', None) and connect_errno in CONNECT_IN_PROGRESS_ERRNOS
+            if connect_errno and not connect_in_progress:
+                client_socket.close()
+                connect_exception = socket.error(connect_errno, os.strerror(connect_errno))
+                continue
+
+            self.set_socket(client_socket)
+            self.connecting = bool(connect_errno)
+            return
+
+        self.throw_exception(exception=connect_exception)
+
+    def _get_socket_addresses(self):
+        """Returns the (socket family, address) pairs of our server, in the order we try connecting to them
+
+        Literal IPv4 and IPv6 addresses are used as-is, only host names cost us a (blocking) DNS lookup.
+        A host name may resolve to several addresses ('localhost' to ::1 and 127.0.0.1), we fall back
+        to the next one whenever a connect fails
+        """
+        if self.unix_socket_path is not None:
+            return [(socket.AF_UNIX, self.unix_socket_path)]
+
+        try:
+            address_info = socket.getaddrinfo(self.gearman_host, self.gearman_port, socket.AF_UNSPEC, socket.SOCK_STREAM, 0, socket.AI_NUMERICHOST)
+        except socket.gaierror:
+            address_info = socket.getaddrinfo(self.gearman_host, self.gearman_port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+
+        return [(socket_family, socket_address) for socket_family, _, _, _, socket_address in address_info]
 
     def set_socket(self, current_socket):
         """Setup common options for all Gearman-related sockets"""
@@ -129,8 +363,7 @@ class GearmanConnection(object):
         """Reads data from buffer --> command_queue"""
         received_commands = 0
         while True:
-            incoming = self._incoming_buffer.getvalue()
-            cmd_type, cmd_args, cmd_len = self._unpack_command(incoming)
+            cmd_type, cmd_args, cmd_len = self._unpack_command(self._incoming_buffer, self._incoming_offset, self._incoming_size)
 
             if not cmd_len:
                 break
@@ -138,52 +371,182 @@ class GearmanConnection(object):
             received_commands += 1
 
             # Store our command on the command queue
-            # Move the self._incoming_buffer forward by the number of bytes we just read
+            # Move our read offset forward by the number of bytes we just read
             self._incoming_commands.append((cmd_type, cmd_args))
+            self._incoming_offset += cmd_len
 
-            substr = incoming[cmd_len:]
-            self._incoming_buffer.close()
-            self._incoming_buffer = io.BytesIO()
-            self._incoming_buffer.write(substr)
+        if self._incoming_buffer_exported:
+            self._release_incoming_buffer()
+        else:
+            self._compact_incoming_buffer()
 
+        # Remember how big the next command is so we don't blindly parse
+        # huge amounts of data every read
+        self._incoming_command_size = self.next_command_size()
         return received_commands
 
-    def read_data_from_socket(self, bytes_to_read=4096):
-        """Reads data from socket --> buffer"""
+    def has_incoming_command(self):
+        """Returns True if our incoming buffer may hold a complete command
+
+        Cheap to call after every read, we only know the size of the next command
+        once its header arrived and we tried parsing it
+        """
+        if self._incoming_command_size is None:
+            return True
+
+        return bool(self.incoming_buffer_size() >= self._incoming_command_size)
+
+    def incoming_buffer_size(self):
+        """Returns how many bytes we've received that we've yet to parse"""
+        return self._incoming_size - self._incoming_offset
+
+    def _compact_incoming_buffer(self):
+        """Drop already parsed bytes from the front of the incoming buffer
+
+        Only compacts once the parsed prefix makes up at least half of the buffer
+        so every byte we receive gets moved a bounded number of times
+        """
+        if not self._incoming_offset:
+            return
+
+        unparsed_size = self.incoming_buffer_size()
+        if not unparsed_size:
+            # Hold onto our buffer for our next read, unless a huge command made it grow past what we'd normally read
+            if len(self._incoming_buffer) > self.max_recv_buffer_size:
+                self._incoming_buffer = bytearray()
+        elif self._incoming_offset * 2 >= self._incoming_size:
+            self._incoming_buffer[:unparsed_size] = self._incoming_buffer[self._incoming_offset:self._incoming_size]
+        else:
+            return
+
+        self._incoming_offset = 0
+        self._incoming_size = unparsed_size
+
+    def _release_incoming_buffer(self):
+        """Hand our incoming buffer over to the memoryviews we gave out and start a new one
+
+        We can't resize a buffer with live views into it, so we move only the unparsed
+        bytes into a fresh buffer.  The old one lives on until all views are released
+        """
+        self._incoming_buffer = self._incoming_buffer[self._incoming_offset:self._incoming_size]
+        self._incoming_offset = 0
+        self._incoming_size = len(self._incoming_buffer)
+        self._incoming_buffer_exported = False
+
+    def _reserve_incoming_buffer(self, read_size):
+        """Make sure our incoming buffer has room for read_size more bytes, we only grow it once it's full"""
+        # We can't grow a buffer our zero copy views still point into
+        if self._incoming_buffer_exported:
+            self._release_incoming_buffer()
+
+        missing_room = self._incoming_size + read_size - len(self._incoming_buffer)
+        if missing_room > 0:
+            self._incoming_buffer += bytes(max(missing_room, len(self._incoming_buffer)))
+
+    def _add_incoming_data(self, data):
+        """Copies data we were handed into our incoming buffer"""
+        self._reserve_incoming_buffer(len(data))
+
+        data_end = self._incoming_size + len(data)
+        self._incoming_buffer[self._incoming_size:data_end] = data
+        self._incoming_size = data_end
+
+    def read_data_from_socket(self, bytes_to_read=None):
+        """Reads data from socket --> buffer
+
+        Keeps reading until the socket has nothing left for us or we've read
+        max_recv_buffer_size bytes, whichever comes first
+        """
         if not self.connected:
             self.throw_exception(message='disconnected')
 
-        recv_buffer = ''
-        try:
-            recv_buffer = self.gearman_socket.recv(bytes_to_read)
-        except socket.error as socket_exception:
-            self.throw_exception(exception=socket_exception)
+        received_bytes = 0
+        while received_bytes < self.max_recv_buffer_size:
+            read_size = bytes_to_read or self._next_read_size()
 
-        if len(recv_buffer) == 0:
-            self.throw_exception(message='remote disconnected')
+            # Receive straight into the free tail of our incoming buffer
+            self._reserve_incoming_buffer(read_size)
+
+            data_end = self._incoming_size
+            try:
+                with memoryview(self._incoming_buffer) as buffer_view, buffer_view[data_end:data_end + read_size] as recv_view:
+                    recv_size = self.gearman_socket.recv_into(recv_view)
+            except socket.error as socket_exception:
+                # We've drained the socket
+                if received_bytes and socket_exception.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+
+                self.throw_exception(exception=socket_exception)
+
+            self._incoming_size += recv_size
+
+            if recv_size == 0:
+                # Hold onto what we've already received, we'll see the disconnect on our next read
+                if received_bytes:
+                    break
+
+                self.throw_exception(message='remote disconnected')
+
+            received_bytes += recv_size
+
+            # A short read means the socket had nothing more for us at this time
+            if recv_size < read_size:
+                break
+
+        return self.incoming_buffer_size()
 
-        self._incoming_buffer.write(recv_buffer)
-        return self._incoming_buffer.tell()
+    def _next_read_size(self):
+        """Read at least recv_buffer_size bytes, or the rest of a larger command we've seen the header of"""
+        command_size = self.next_command_size()
+        if command_size is None:
+            return self.recv_buffer_size
+
+        missing_bytes = command_size - self.incoming_buffer_size()
+        return min(max(missing_bytes, self.recv_buffer_size), self.max_recv_buffer_size)
 
     def next_command_size(self):
         """Return the expected size of the next command in the incoming buffer.
+
+        Returns None if we haven't received a full binary command header yet
         """
-        return binary_command_size(self._incoming_buffer.getvalue())
+        if self.incoming_buffer_size() < COMMAND_HEADER_SIZE or self._incoming_buffer[self._incoming_offset] != 0:
+            return None
+
+        return binary_command_size(self._incoming_buffer, self._incoming_offset)
+
+    def _unpack_command(self, given_buffer, offset=0, buffer_end=None):
+        """Conditionally unpack a binary command or a text based server command
 
-    def _unpack_command(self, given_buffer):
-        """Conditionally unpack a binary command or a text based server command"""
+        Only hands complete commands to the protocol parsers so we never re-parse
+        a partially received command.  Anything past buffer_end is spare room, not data
+        """
         assert self._is_client_side is not None, "Ambiguous connection state"
 
-        if not given_buffer:
-            cmd_type = None
-            cmd_args = None
-            cmd_len = 0
-        elif given_buffer[0] == 0:
-            # We'll be expecting a response if we know we're a client side command
-            is_response = bool(self._is_client_side)
-            cmd_type, cmd_args, cmd_len = parse_binary_command(given_buffer, is_response=is_response)
+        buffer_end = len(given_buffer) if buffer_end is None else buffer_end
+
+        cmd_type = None
+        cmd_args = None
+        cmd_len = 0
+        if buffer_end <= offset:
+            pass
+        elif given_buffer[offset] == 0:
+            # Look at the header first so a large command trickling in is only parsed once
+            expected_size = binary_command_size(given_buffer, offset) if buffer_end - offset >= COMMAND_HEADER_SIZE else None
+            if expected_size is not None and buffer_end - offset >= expected_size:
+                # We'll be expecting a response if we know we're a client side command
+                is_response = bool(self._is_client_side)
+                if self.zero_copy_data and expected_size >= self.zero_copy_threshold:
+                    cmd_type, cmd_args, cmd_len = parse_binary_command_view(given_buffer, offset, is_response=is_response)
+                    self._incoming_buffer_exported = True
+                else:
+                    with memoryview(given_buffer) as buffer_view:
+                        command_buffer = buffer_view[offset:offset + expected_size].tobytes()
+
+                    cmd_type, cmd_args, cmd_len = parse_binary_command(command_buffer, is_response=is_response)
         else:
-            cmd_type, cmd_args, cmd_len = parse_text_command(given_buffer)
+            line_end = given_buffer.find(b'\n', offset, buffer_end)
+            if line_end != -1:
+                cmd_type, cmd_args, cmd_len = parse_text_command(bytes(given_buffer[offset:line_end + 1]))
 
         if _DEBUG_MODE_ and cmd_type is not None:
             gearman_logger.debug('%s - Recv - %s - %r', hex(id(self)), get_command_name(cmd_type), cmd_args)
@@ -195,22 +558,47 @@ class GearmanConnection(object):
         self._outgoing_commands.append((cmd_type, cmd_args))
 
     def send_commands_to_buffer(self):
-        """Sends and packs commands -> buffer"""
-        if not self._outgoing_commands:
-            return
-
-        # Need to add commands to front of buffer but BytesIO doesn't provide
-        # a way to do so.  Unreverse the buffer, then append the command, then
-        # reverse the buffer again.
-        out_buffer = self._outgoing_buffer.getvalue()[::-1]
+        """Sends and packs commands -> buffer
 
+        Runs of binary commands are packed together into one contiguous buffer
+        so fanning out thousands of jobs costs a single queued write
+        """
+        binary_commands = []
         while self._outgoing_commands:
             cmd_type, cmd_args = self._outgoing_commands.popleft()
-            packed_command = self._pack_command(cmd_type, cmd_args)
-            out_buffer += packed_command
+            if cmd_type == GEARMAN_COMMAND_TEXT_COMMAND:
+                self._queue_binary_commands(binary_commands)
+                binary_commands = []
 
-        self._outgoing_buffer = io.BytesIO()
-        self._outgoing_buffer.write(out_buffer[::-1])
+                self._queue_packed_data(self._pack_command(cmd_type, cmd_args))
+                continue
+
+            if cmd_type not in GEARMAN_PARAMS_FOR_COMMAND:
+                raise ProtocolError('Unknown command: %r' % get_command_name(cmd_type))
+
+            if _DEBUG_MODE_:
+                gearman_logger.debug('%s - Send - %s - %r', hex(id(self)), get_command_name(cmd_type), cmd_args)
+
+            binary_commands.append((cmd_type, cmd_args))
+
+        self._queue_binary_commands(binary_commands)
+
+    def _queue_binary_commands(self, binary_commands):
+        if not binary_commands:
+            return
+
+        # We'll be sending a response if we know we're a server side command
+        is_response = bool(self._is_server_side)
+        self._queue_packed_data(pack_binary_commands(binary_commands, is_response))
+
+    def _queue_packed_data(self, packed_data):
+        self._outgoing_buffer.append(memoryview(packed_data))
+        self._outgoing_buffer_size += len(packed_data)
+
+    def outgoing_buffer_size(self):
+        """Returns how many bytes we've yet to send, packing our queued commands first"""
+        self.send_commands_to_buffer()
+        return self._outgoing_buffer_size
 
     def send_data_to_socket(self):
         """Send data from buffer -> socket
@@ -220,26 +608,42 @@ class GearmanConnection(object):
         if not self.connected:
             self.throw_exception(message='disconnected')
 
-        if not self._outgoing_buffer.tell():
+        if not self._outgoing_buffer:
             return 0
 
-        self._outgoing_buffer.seek(-self.send_buffer_size, os.SEEK_END)
-        output = self._outgoing_buffer.read()[::-1]
+        # Gather as many queued commands as we're allowed to send in one go
+        output_views = []
+        output_size = 0
+        for command_view in self._outgoing_buffer:
+            if output_size >= self.send_buffer_size or len(output_views) >= SEND_MAX_BUFFERS:
+                break
+
+            output_views.append(command_view)
+            output_size += len(command_view)
 
         try:
-            bytes_sent = self.gearman_socket.send(output)
+            if _HAS_SENDMSG:
+                bytes_sent = self.gearman_socket.sendmsg(output_views)
+            else:
+                bytes_sent = self.gearman_socket.send(output_views[0])
         except socket.error as socket_exception:
             self.throw_exception(exception=socket_exception)
 
         if bytes_sent == 0:
             self.throw_exception(message='remote disconnected')
 
-        # Pop bytes sent off of buffer
-        new_size = self._outgoing_buffer.tell() - bytes_sent
-        self._outgoing_buffer.truncate(new_size)
-        self._outgoing_buffer.seek(new_size)
+        # Pop bytes sent off of buffer, only slicing a view on a partial send
+        self._outgoing_buffer_size -= bytes_sent
+        while bytes_sent:
+            command_view = self._outgoing_buffer[0]
+            if bytes_sent < len(command_view):
+                self._outgoing_buffer[0] = command_view[bytes_sent:]
+                break
+
+            bytes_sent -= len(command_view)
+            self._outgoing_buffer.popleft()
 
-        return new_size
+        return self._outgoing_buffer_size
 
     def _pack_command(self, cmd_type, cmd_args):
         """Converts a command to its raw binary format"""
@@ -274,9 +678,9 @@ class GearmanConnection(object):
         if exception:
             message = repr(exception)
 
-        rewritten_message = "<%s:%d> %s" % (self.gearman_host, self.gearman_port, message)
+        rewritten_message = "<%s> %s" % (gearman.util.format_server_parameter(self.gearman_host, self.gearman_port), message)
         raise ConnectionError(rewritten_message)
 
     def __repr__(self):
-        return ('<GearmanConnection %s:%d connected=%s>' %
-            (self.gearman_host, self.gearman_port, self.connected))
+        return ('<GearmanConnection %s connected=%s>' %
+            (gearman.util.format_server_parameter(self.gearman_host, self.gearman_port), self.connected))
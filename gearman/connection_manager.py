@@ -1,5 +1,6 @@
 import logging
 import select as select_lib
+import time
 
 import gearman.util
 from gearman.connection import GearmanConnection
@@ -10,6 +11,11 @@ from gearman.job import GearmanJob, GearmanJobRequest
 gearman_logger = logging.getLogger(__name__)
 
 class DataEncoder(object):
+    # Encoders that can decode straight from a memoryview should set this to True
+    # Large 'data' arguments are then handed to decode() as a view into our receive buffer
+    # instead of a copy, see BufferEncoder
+    decodes_buffers = False
+
     @classmethod
     def encode(cls, encodable_object):
         raise NotImplementedError
@@ -35,6 +41,28 @@ class NoopEncoder(DataEncoder):
         cls._enforce_byte_string(decodable_string)
         return decodable_string
 
+class BufferEncoder(NoopEncoder):
+    """Hands out large payloads as memoryviews into the receive buffer, avoiding a copy
+
+    Decoded data is either a byte string or a memoryview.  A memoryview keeps its receive
+    buffer alive until it's released, see GearmanJob.release_data and GearmanJobRequest.release_result
+    """
+    decodes_buffers = True
+
+    @classmethod
+    def encode(cls, encodable_object):
+        if type(encodable_object) == memoryview:
+            return encodable_object.tobytes()
+
+        return super(BufferEncoder, cls).encode(encodable_object)
+
+    @classmethod
+    def decode(cls, decodable_string):
+        if type(decodable_string) == memoryview:
+            return decodable_string
+
+        return super(BufferEncoder, cls).decode(decodable_string)
+
 class GearmanConnectionManager(object):
     """Abstract base class for any Gearman-type client that needs to connect/listen to multiple connections
 
@@ -46,6 +74,7 @@ class GearmanConnectionManager(object):
     """
     command_handler_class = None
     connection_class = GearmanConnection
+    poller_class = gearman.util.GearmanPoller
 
     job_class = GearmanJob
     job_request_class = GearmanJobRequest
@@ -66,11 +95,16 @@ class GearmanConnectionManager(object):
 
         self.handler_initial_state = {}
 
-        self.next_command_size = None
+        # Long-lived poller that knows about every connection we've established
+        self.poller = self.poller_class()
+
+        # Connections our poller watches for their connect to finish, see handle_write
+        self._connecting_connections = set()
 
     def shutdown(self):
         # Shutdown all our connections one by one
         for gearman_connection in self.connection_list:
+            self.poller.unregister(gearman_connection)
             gearman_connection.close()
 
     ###################################
@@ -94,9 +128,83 @@ class GearmanConnectionManager(object):
         if current_connection.connected:
             return current_connection
 
+        # Only hand out views into our receive buffers if our encoder knows how to handle them
+        current_connection.zero_copy_data = bool(self.data_encoder.decodes_buffers)
+
         # !NOTE! May throw a ConnectionError
         current_connection.connect()
 
+        self._register_connection(current_connection)
+        return current_connection
+
+    def establish_connections(self, connection_list=None):
+        """Connect to every connection in connection_list (all our connections by default) at the same time
+
+        Waits at most one connect_timeout no matter how many servers are down, returns the connections that are alive.
+        We keep servicing our live connections while we wait
+        """
+        connection_list = self.connection_list if connection_list is None else connection_list
+
+        pending_connections = []
+        for current_connection in connection_list:
+            assert current_connection in self.connection_list, "Unknown connection - %r" % current_connection
+            if current_connection.connected:
+                continue
+
+            try:
+                self._start_connect(current_connection)
+            except ConnectionError:
+                continue
+
+            if current_connection.connecting:
+                pending_connections.append(current_connection)
+
+        while any(current_connection.connecting for current_connection in pending_connections):
+            self._poll_connecting_connections()
+
+        return [current_connection for current_connection in connection_list if current_connection.connected]
+
+    def _start_connect(self, current_connection):
+        """Starts connecting without waiting on the server, see handle_write for how we finish
+        !NOTE! This function can throw a ConnectionError
+        """
+        current_connection.zero_copy_data = bool(self.data_encoder.decodes_buffers)
+        current_connection.start_connect()
+
+        if current_connection.connecting:
+            # A connect completes (or fails) once its socket turns writable
+            self._connecting_connections.add(current_connection)
+            self.poller.register(current_connection, writable=True)
+        else:
+            self._register_connection(current_connection)
+
+    def _poll_connecting_connections(self):
+        """Polls every connection we know about once, poll_connections_once wakes us up in time to give up on connects that take too long"""
+        rd_connections, wr_connections, ex_connections = self.poll_connections_once(self.poller.connections)
+        return self.handle_connection_activity(rd_connections, wr_connections, ex_connections)
+
+    def _check_connect_timeouts(self, connecting_connections):
+        """Gives up on connects the server didn't answer in time, returns the connections we gave up on"""
+        current_time = time.time()
+
+        failed_connections = set()
+        for current_connection in connecting_connections:
+            if current_time < current_connection.connect_deadline:
+                continue
+
+            try:
+                current_connection.check_connect_timeout(current_time)
+            except ConnectionError:
+                failed_connections.add(current_connection)
+                continue
+
+            # We moved on to our server's next address, on a new socket
+            self.poller.register(current_connection, writable=True)
+
+        return failed_connections
+
+    def _register_connection(self, current_connection):
+        """Called once a connection is up"""
         # Initiate a new command handler every time we start a new connection
         current_handler = self.command_handler_class(connection_manager=self)
 
@@ -106,11 +214,13 @@ class GearmanConnectionManager(object):
         self.connection_to_handler_map[current_connection] = current_handler
 
         current_handler.initial_state(**self.handler_initial_state)
-        return current_connection
+
+        # Poll this connection from now on until we see it fail
+        self.poller.register(current_connection, writable=current_connection.writable())
 
     def poll_connections_once(self, submitted_connections, timeout=None):
-        """Does a single robust select, catching socket errors"""
-        select_connections = set(current_connection for current_connection in submitted_connections if current_connection.connected)
+        """Does a single robust poll, catching socket errors"""
+        submitted_connections = set(submitted_connections)
 
         rd_connections = set()
         wr_connections = set()
@@ -119,6 +229,45 @@ class GearmanConnectionManager(object):
         if timeout is not None and timeout < 0.0:
             return rd_connections, wr_connections, ex_connections
 
+        # Our poller watches every connection we've established.  When asked about a few of them we drop
+        # whatever happened on the others, our poller is level-triggered so a readable connection stays
+        # readable until our next full poll.  Until then, their readiness may cut our wait short
+        polled_connections = submitted_connections.intersection(self.poller.connections)
+        if not polled_connections and not self._connecting_connections:
+            return rd_connections, wr_connections, ex_connections
+
+        # Connects finish no matter which connections we were asked about, wake up in time to give up on them
+        connecting_connections = set(self._connecting_connections)
+        if connecting_connections:
+            connect_timeout = max(min(current_connection.connect_deadline for current_connection in connecting_connections) - time.time(), 0.0)
+            if timeout is None or connect_timeout < timeout:
+                timeout = connect_timeout
+
+        try:
+            rd_list, wr_list = self.poller.poll(timeout)
+        except (select_lib.error, ConnectionError):
+            # One of our registered connections went bad underneath us, go fish for it
+            return self._select_connections(polled_connections, timeout=0)
+
+        rd_connections = set(current_connection for current_connection in rd_list if current_connection in polled_connections and current_connection.connected)
+        wr_connections = set(current_connection for current_connection in wr_list if current_connection in polled_connections and current_connection.connected)
+        wr_connections |= connecting_connections.intersection(set(rd_list) | set(wr_list))
+        ex_connections = self._check_connect_timeouts(connecting_connections - wr_connections)
+
+        if _DEBUG_MODE_:
+            gearman_logger.debug('poll :: Poll - %d :: Read - %d :: Write - %d :: Error - %d', \
+                len(polled_connections), len(rd_connections), len(wr_connections), len(ex_connections))
+
+        return rd_connections, wr_connections, ex_connections
+
+    def _select_connections(self, submitted_connections, timeout=None):
+        """Does a single robust select on an arbitrary group of connections, catching socket errors"""
+        select_connections = set(current_connection for current_connection in submitted_connections if current_connection.connected)
+
+        rd_connections = set()
+        wr_connections = set()
+        ex_connections = set()
+
         successful_select = False
         while not successful_select and select_connections:
             select_connections -= ex_connections
@@ -216,32 +365,51 @@ class GearmanConnectionManager(object):
         current_handler = self.connection_to_handler_map[current_connection]
 
         # Transfer data from socket -> buffer
-        length = current_connection.read_data_from_socket()
+        current_connection.read_data_from_socket()
 
-        if self.next_command_size is None or length >= self.next_command_size:
+        # Each connection keeps track of how large its own next command is
+        if current_connection.has_incoming_command():
             # Transfer command from buffer -> command queue
             current_connection.read_commands_from_buffer()
 
             # Notify the handler that we have commands to fetch
             current_handler.fetch_commands()
 
-            # Remember how big the next command is so we don't blindly parse
-            # huge amounts of data every read
-            self.next_command_size = current_connection.next_command_size()
-
     def handle_write(self, current_connection):
+        if current_connection.connecting:
+            return self._finish_connect(current_connection)
+
         # Transfer command from command queue -> buffer
         current_connection.send_commands_to_buffer()
 
         # Transfer data from buffer -> socket
         current_connection.send_data_to_socket()
 
+        # Stop polling for writes once we've flushed everything
+        self.poller.modify(current_connection, writable=current_connection.writable())
+
+    def _finish_connect(self, current_connection):
+        """Our connecting socket turned writable, our connect either went through or failed
+        !NOTE! This function can throw a ConnectionError, handle_connection_activity hands those to handle_error
+        """
+        current_connection.finish_connect()
+
+        if current_connection.connecting:
+            # We moved on to our server's next address, on a new socket
+            self.poller.register(current_connection, writable=True)
+        else:
+            self._connecting_connections.discard(current_connection)
+            self._register_connection(current_connection)
+
     def handle_error(self, current_connection):
+        self._connecting_connections.discard(current_connection)
+
         dead_handler = self.connection_to_handler_map.pop(current_connection, None)
         if dead_handler:
             dead_handler.on_io_error()
 
         self.handler_to_connection_map.pop(dead_handler, None)
+        self.poller.unregister(current_connection)
         current_connection.close()
 
     ##################################
@@ -271,6 +439,9 @@ class GearmanConnectionManager(object):
         gearman_connection = self.handler_to_connection_map[command_handler]
         gearman_connection.send_command(cmd_type, cmd_args)
 
+        # We have something to write, make sure we're polling for it
+        self.poller.modify(gearman_connection, writable=True)
+
     def on_gearman_error(self, error_code, error_text):
         gearman_logger.error('Received error from server: %s: %s' % (error_code, error_text))
         return False
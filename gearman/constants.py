@@ -1,6 +1,9 @@
 _DEBUG_MODE_ = False
 DEFAULT_GEARMAN_PORT = 4730
 
+# Servers listed as unix:///path/to/gearmand.sock are reached over a unix domain socket
+UNIX_SOCKET_PREFIX = 'unix://'
+
 PRIORITY_NONE = None
 PRIORITY_LOW  = 'LOW'
 PRIORITY_HIGH = 'HIGH'
@@ -10,3 +13,7 @@ JOB_PENDING  = 'PENDING'  # Request has been submitted, pending handle
 JOB_CREATED  = 'CREATED'  # Request has been accepted
 JOB_FAILED   = 'FAILED'   # Request received an explicit fail
 JOB_COMPLETE = 'COMPLETE' # Request received an explicit complete
+
+CIRCUIT_CLOSED    = 'CLOSED'    # Server looks healthy, connect as usual
+CIRCUIT_OPEN      = 'OPEN'      # Server keeps failing, skip it until our backoff runs out
+CIRCUIT_HALF_OPEN = 'HALF_OPEN' # Backoff ran out, the next connect decides whether we close or open again
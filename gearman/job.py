@@ -14,6 +14,13 @@ class GearmanJob(object):
     def to_dict(self):
         return dict(task=self.task, job_handle=self.handle, unique=self.unique, data=self.data)
 
+    def release_data(self):
+        """Drop our data, releasing the receive buffer it may be a view into (see BufferEncoder)"""
+        if type(self.data) == memoryview:
+            self.data.release()
+
+        self.data = None
+
     def __repr__(self):
         return '<GearmanJob connection/handle=(%r, %r), task=%s, unique=%s, data=%r>' % (self.connection, self.handle, self.task, self.unique, self.data)
 
@@ -47,6 +54,15 @@ class GearmanJobRequest(object):
         self.state = JOB_UNKNOWN
         self.timed_out = False
 
+    def release_result(self):
+        """Drop our result and data updates, releasing any receive buffers they may be views into (see BufferEncoder)"""
+        for current_data in [self.result] + list(self.data_updates):
+            if type(current_data) == memoryview:
+                current_data.release()
+
+        self.result = None
+        self.data_updates.clear()
+
     def reset(self):
         self.initialize_request()
         self.connection = None
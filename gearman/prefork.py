@@ -0,0 +1,293 @@
+import gc
+import logging
+import os
+import resource
+import select as select_lib
+import signal
+import socket
+import sys
+import time
+
+from gearman.worker import GearmanWorker, POLL_TIMEOUT_IN_SECONDS
+
+gearman_logger = logging.getLogger(__name__)
+
+# Signals our supervisor and children handle themselves, blocked while we fork so a child never runs our supervisor's handlers
+SUPERVISOR_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD)
+
+def get_rss_bytes():
+    """Returns the resident set size of our process in bytes"""
+    try:
+        with open('/proc/self/statm', 'rb') as statm_file:
+            return int(statm_file.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+
+    # Without procfs, settle for our peak resident set size, Linux reports it in kilobytes and OS X in bytes
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss
+
+    return max_rss * 1024
+
+class PreforkChildWorker(GearmanWorker):
+    """GearmanWorker running inside of a PreforkWorker child
+
+    Stops (finishing the jobs it took on) once it completed max_jobs jobs or grew past max_rss bytes, our supervisor replaces it
+    """
+    def __init__(self, host_list=None, max_jobs=None, max_rss=None, **worker_kwargs):
+        super(PreforkChildWorker, self).__init__(host_list=host_list, **worker_kwargs)
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+
+        self.completed_jobs = 0
+
+    def after_job(self):
+        self.completed_jobs += 1
+        if self.max_jobs is not None and self.completed_jobs >= self.max_jobs:
+            gearman_logger.info('Worker %d completed %d jobs, stopping', os.getpid(), self.completed_jobs)
+            self.stop()
+        elif self.max_rss is not None and get_rss_bytes() > self.max_rss:
+            gearman_logger.info('Worker %d grew past %d bytes, stopping', os.getpid(), self.max_rss)
+            self.stop()
+
+        return super(PreforkChildWorker, self).after_job()
+
+class PreforkWorker(object):
+    """
+    PreforkWorker :: Supervises num_workers GearmanWorkers, each running in its own forked child process
+
+    Import whatever your tasks need and register them before calling work(), our children share
+    those pages with us copy-on-write.  Children that crash, or stop after max_jobs jobs or growing past
+    max_rss bytes, are replaced.  stop(), SIGTERM or SIGINT stop our supervisor, our children finish
+    the jobs they took on before exiting
+    """
+    worker_class = PreforkChildWorker
+
+    # Seconds to wait before replacing a child that exited abnormally, keeps a child that can't start from fork-looping
+    respawn_delay = 1.0
+
+    def __init__(self, host_list=None, num_workers=None, max_jobs=None, max_rss=None, worker_kwargs=None):
+        self.host_list = host_list
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.worker_kwargs = dict(worker_kwargs or {})
+
+        self.worker_abilities = {}
+        self.worker_client_id = None
+
+        # Maps a child's pid to the worker slot it fills
+        self.children = {}
+        self._respawn_times = {}
+
+        self._stopping = False
+        self._wakeup_reader = None
+        self._wakeup_writer = None
+
+    #########################################################
+    ##### Public methods for general PreforkWorker use #####
+    #########################################################
+    def register_task(self, task, callback_function):
+        """Register a function with the workers we fork, see GearmanWorker.register_task"""
+        self.worker_abilities[task] = callback_function
+        return task
+
+    def unregister_task(self, task):
+        """Unregister a function with the workers we fork from here on"""
+        self.worker_abilities.pop(task, None)
+        return task
+
+    def set_client_id(self, client_id):
+        """Identify the workers we fork as this client ID"""
+        self.worker_client_id = client_id
+        return client_id
+
+    def work(self, poll_timeout=POLL_TIMEOUT_IN_SECONDS, graceful_timeout=None):
+        """Keep num_workers children working until we're stopped
+
+        Once stopped, our children get graceful_timeout seconds (forever if None) to finish their jobs before we SIGKILL them
+        """
+        self._stopping = False
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(0)
+        self._wakeup_writer.setblocking(0)
+
+        previous_signal_handlers = dict((signum, signal.signal(signum, self._handle_signal)) for signum in SUPERVISOR_SIGNALS)
+        previous_wakeup_fd = signal.set_wakeup_fd(self._wakeup_writer.fileno())
+
+        # Move everything we've loaded so far out of the garbage collector's reach, otherwise
+        # a collection in a child touches (and copies) every page it shares with us
+        gc.collect()
+        gc.freeze()
+
+        try:
+            while not self._stopping:
+                self._reap_children()
+                self._spawn_children(poll_timeout)
+                self._wait_for_signal(self._get_respawn_timeout())
+
+            self._stop_children(graceful_timeout)
+        finally:
+            gc.unfreeze()
+
+            signal.set_wakeup_fd(previous_wakeup_fd)
+            for signum, previous_handler in previous_signal_handlers.items():
+                signal.signal(signum, previous_handler)
+
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
+            self._wakeup_reader = None
+            self._wakeup_writer = None
+
+    def stop(self):
+        """Stop our children and return from work(), safe to call from another thread"""
+        self._stopping = True
+        if self._wakeup_writer is not None:
+            try:
+                self._wakeup_writer.send(b'\0')
+            except socket.error:
+                pass
+
+    ###############################################################
+    ## Methods to override when dealing with our child processes ##
+    ###############################################################
+    def create_worker(self):
+        """Create the GearmanWorker a child runs, called in the child right after we fork"""
+        gearman_worker = self.worker_class(self.host_list, max_jobs=self.max_jobs, max_rss=self.max_rss, **self.worker_kwargs)
+        for task, callback_function in self.worker_abilities.items():
+            gearman_worker.register_task(task, callback_function)
+
+        if self.worker_client_id is not None:
+            gearman_worker.set_client_id(self.worker_client_id)
+
+        return gearman_worker
+
+    def after_child_exit(self, child_pid, exit_code):
+        """Callback to notify any outside listeners that one of our children exited
+
+        exit_code is negative if our child was killed by a signal
+        """
+        pass
+
+    def _handle_signal(self, signum, frame):
+        # SIGCHLD only needs to wake us up through our wakeup fd
+        if signum != signal.SIGCHLD:
+            self._stopping = True
+
+    def _wait_for_signal(self, timeout):
+        select_lib.select([self._wakeup_reader], [], [], timeout)
+
+        try:
+            while self._wakeup_reader.recv(4096):
+                pass
+        except socket.error:
+            pass
+
+    def _get_respawn_timeout(self):
+        """Returns how long until we can replace a child that exited abnormally, None if there's nothing to replace"""
+        if not self._respawn_times:
+            return None
+
+        return max(min(self._respawn_times.values()) - time.time(), 0.0)
+
+    def _spawn_children(self, poll_timeout):
+        current_time = time.time()
+        running_slots = set(self.children.values())
+        for child_slot in range(self.num_workers):
+            if child_slot in running_slots or self._respawn_times.get(child_slot, current_time) > current_time:
+                continue
+
+            self._respawn_times.pop(child_slot, None)
+            self._spawn_child(child_slot, poll_timeout)
+
+    def _spawn_child(self, child_slot, poll_timeout):
+        previous_signal_mask = signal.pthread_sigmask(signal.SIG_BLOCK, SUPERVISOR_SIGNALS)
+        try:
+            child_pid = os.fork()
+            if child_pid == 0:
+                self._run_child(poll_timeout, previous_signal_mask)
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, previous_signal_mask)
+
+        self.children[child_pid] = child_slot
+        gearman_logger.debug('Forked worker %d for slot %d', child_pid, child_slot)
+        return child_pid
+
+    def _run_child(self, poll_timeout, signal_mask):
+        """Runs in our child, never returns"""
+        exit_code = 1
+        try:
+            # Nothing our supervisor polls or handles carries over, our worker opens its own connections and poller
+            signal.set_wakeup_fd(-1)
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
+
+            gearman_worker = self.create_worker()
+
+            def stop_worker(signum, frame):
+                gearman_worker.stop()
+
+            signal.signal(signal.SIGTERM, stop_worker)
+            signal.signal(signal.SIGINT, stop_worker)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.pthread_sigmask(signal.SIG_SETMASK, signal_mask)
+
+            gearman_worker.work(poll_timeout=poll_timeout)
+            gearman_worker.shutdown()
+            exit_code = 0
+        except BaseException:
+            gearman_logger.exception('Worker %d crashed', os.getpid())
+        finally:
+            for output_stream in (sys.stdout, sys.stderr):
+                try:
+                    output_stream.flush()
+                except Exception:
+                    pass
+
+            os._exit(exit_code)
+
+    def _reap_children(self):
+        for child_pid in list(self.children.keys()):
+            try:
+                exited_pid, exit_status = os.waitpid(child_pid, os.WNOHANG)
+            except ChildProcessError:
+                exited_pid, exit_status = child_pid, 0
+
+            if exited_pid == 0:
+                continue
+
+            child_slot = self.children.pop(child_pid)
+            exit_code = os.waitstatus_to_exitcode(exit_status)
+            if exit_code != 0:
+                gearman_logger.error('Worker %d exited with %d, replacing it in %.1f seconds', child_pid, exit_code, self.respawn_delay)
+                self._respawn_times[child_slot] = time.time() + self.respawn_delay
+
+            self.after_child_exit(child_pid, exit_code)
+
+    def _stop_children(self, graceful_timeout):
+        self._signal_children(signal.SIGTERM)
+
+        stop_time = None if graceful_timeout is None else time.time() + graceful_timeout
+        while True:
+            self._reap_children()
+            if not self.children:
+                break
+
+            if stop_time is None:
+                self._wait_for_signal(None)
+            elif time.time() < stop_time:
+                self._wait_for_signal(stop_time - time.time())
+            else:
+                gearman_logger.warning('Workers %r still running after %.1f seconds, killing them', list(self.children.keys()), graceful_timeout)
+                self._signal_children(signal.SIGKILL)
+                stop_time = None
+
+        self._respawn_times.clear()
+
+    def _signal_children(self, signum):
+        for child_pid in self.children.keys():
+            try:
+                os.kill(child_pid, signum)
+            except ProcessLookupError:
+                pass
@@ -7,7 +7,9 @@ NULL_CHAR = b'\x00'
 MAGIC_RES_STRING = NULL_CHAR + b'RES'
 MAGIC_REQ_STRING = NULL_CHAR + b'REQ'
 
-COMMAND_HEADER_SIZE = 12
+# Every binary command starts with a header of: magic, command type, payload size
+COMMAND_HEADER = struct.Struct('!4sII')
+COMMAND_HEADER_SIZE = COMMAND_HEADER.size
 
 # Gearman commands 1-9
 GEARMAN_COMMAND_CAN_DO = 1
@@ -55,50 +57,53 @@ GEARMAN_COMMAND_TEXT_COMMAND = 9999
 
 GEARMAN_PARAMS_FOR_COMMAND = {
     # Gearman commands 1-9
-    GEARMAN_COMMAND_CAN_DO: ['task'],
-    GEARMAN_COMMAND_CANT_DO: ['task'],
-    GEARMAN_COMMAND_RESET_ABILITIES: [],
-    GEARMAN_COMMAND_PRE_SLEEP: [],
-    GEARMAN_COMMAND_NOOP: [],
-    GEARMAN_COMMAND_SUBMIT_JOB: ['task', 'unique', 'data'],
-    GEARMAN_COMMAND_JOB_CREATED: ['job_handle'],
-    GEARMAN_COMMAND_GRAB_JOB: [],
+    GEARMAN_COMMAND_CAN_DO: ('task', ),
+    GEARMAN_COMMAND_CANT_DO: ('task', ),
+    GEARMAN_COMMAND_RESET_ABILITIES: (),
+    GEARMAN_COMMAND_PRE_SLEEP: (),
+    GEARMAN_COMMAND_NOOP: (),
+    GEARMAN_COMMAND_SUBMIT_JOB: ('task', 'unique', 'data'),
+    GEARMAN_COMMAND_JOB_CREATED: ('job_handle', ),
+    GEARMAN_COMMAND_GRAB_JOB: (),
 
     # Gearman commands 10-19
-    GEARMAN_COMMAND_NO_JOB: [],
-    GEARMAN_COMMAND_JOB_ASSIGN: ['job_handle', 'task', 'data'],
-    GEARMAN_COMMAND_WORK_STATUS: ['job_handle', 'numerator', 'denominator'],
-    GEARMAN_COMMAND_WORK_COMPLETE: ['job_handle', 'data'],
-    GEARMAN_COMMAND_WORK_FAIL: ['job_handle'],
-    GEARMAN_COMMAND_GET_STATUS: ['job_handle'],
-    GEARMAN_COMMAND_ECHO_REQ: ['data'],
-    GEARMAN_COMMAND_ECHO_RES: ['data'],
-    GEARMAN_COMMAND_SUBMIT_JOB_BG: ['task', 'unique', 'data'],
-    GEARMAN_COMMAND_ERROR: ['error_code', 'error_text'],
+    GEARMAN_COMMAND_NO_JOB: (),
+    GEARMAN_COMMAND_JOB_ASSIGN: ('job_handle', 'task', 'data'),
+    GEARMAN_COMMAND_WORK_STATUS: ('job_handle', 'numerator', 'denominator'),
+    GEARMAN_COMMAND_WORK_COMPLETE: ('job_handle', 'data'),
+    GEARMAN_COMMAND_WORK_FAIL: ('job_handle', ),
+    GEARMAN_COMMAND_GET_STATUS: ('job_handle', ),
+    GEARMAN_COMMAND_ECHO_REQ: ('data', ),
+    GEARMAN_COMMAND_ECHO_RES: ('data', ),
+    GEARMAN_COMMAND_SUBMIT_JOB_BG: ('task', 'unique', 'data'),
+    GEARMAN_COMMAND_ERROR: ('error_code', 'error_text'),
 
     # Gearman commands 20-29
-    GEARMAN_COMMAND_STATUS_RES: ['job_handle', 'known', 'running', 'numerator', 'denominator'],
-    GEARMAN_COMMAND_SUBMIT_JOB_HIGH: ['task', 'unique', 'data'],
-    GEARMAN_COMMAND_SET_CLIENT_ID: ['client_id'],
-    GEARMAN_COMMAND_CAN_DO_TIMEOUT: ['task', 'timeout'],
-    GEARMAN_COMMAND_ALL_YOURS: [],
-    GEARMAN_COMMAND_WORK_EXCEPTION: ['job_handle', 'data'],
-    GEARMAN_COMMAND_OPTION_REQ: ['option_name'],
-    GEARMAN_COMMAND_OPTION_RES: ['option_name'],
-    GEARMAN_COMMAND_WORK_DATA: ['job_handle', 'data'],
-    GEARMAN_COMMAND_WORK_WARNING: ['job_handle', 'data'],
+    GEARMAN_COMMAND_STATUS_RES: ('job_handle', 'known', 'running', 'numerator', 'denominator'),
+    GEARMAN_COMMAND_SUBMIT_JOB_HIGH: ('task', 'unique', 'data'),
+    GEARMAN_COMMAND_SET_CLIENT_ID: ('client_id', ),
+    GEARMAN_COMMAND_CAN_DO_TIMEOUT: ('task', 'timeout'),
+    GEARMAN_COMMAND_ALL_YOURS: (),
+    GEARMAN_COMMAND_WORK_EXCEPTION: ('job_handle', 'data'),
+    GEARMAN_COMMAND_OPTION_REQ: ('option_name', ),
+    GEARMAN_COMMAND_OPTION_RES: ('option_name', ),
+    GEARMAN_COMMAND_WORK_DATA: ('job_handle', 'data'),
+    GEARMAN_COMMAND_WORK_WARNING: ('job_handle', 'data'),
 
     # Gearman commands 30-39
-    GEARMAN_COMMAND_GRAB_JOB_UNIQ: [],
-    GEARMAN_COMMAND_JOB_ASSIGN_UNIQ: ['job_handle', 'task', 'unique', 'data'],
-    GEARMAN_COMMAND_SUBMIT_JOB_HIGH_BG: ['task', 'unique', 'data'],
-    GEARMAN_COMMAND_SUBMIT_JOB_LOW: ['task', 'unique', 'data'],
-    GEARMAN_COMMAND_SUBMIT_JOB_LOW_BG: ['task', 'unique', 'data'],
+    GEARMAN_COMMAND_GRAB_JOB_UNIQ: (),
+    GEARMAN_COMMAND_JOB_ASSIGN_UNIQ: ('job_handle', 'task', 'unique', 'data'),
+    GEARMAN_COMMAND_SUBMIT_JOB_HIGH_BG: ('task', 'unique', 'data'),
+    GEARMAN_COMMAND_SUBMIT_JOB_LOW: ('task', 'unique', 'data'),
+    GEARMAN_COMMAND_SUBMIT_JOB_LOW_BG: ('task', 'unique', 'data'),
 
     # Fake gearman command
-    GEARMAN_COMMAND_TEXT_COMMAND: ['raw_text']
+    GEARMAN_COMMAND_TEXT_COMMAND: ('raw_text', )
 }
 
+# Precomputed for validating packed commands
+GEARMAN_PARAM_SET_FOR_COMMAND = dict((cmd_type, frozenset(cmd_params)) for cmd_type, cmd_params in GEARMAN_PARAMS_FOR_COMMAND.items())
+
 GEARMAN_COMMAND_TO_NAME = {
     GEARMAN_COMMAND_CAN_DO: 'GEARMAN_COMMAND_CAN_DO',
     GEARMAN_COMMAND_CANT_DO: 'GEARMAN_COMMAND_CANT_DO',
@@ -165,14 +170,14 @@ def submit_cmd_for_background_priority(background, priority):
     cmd_type = cmd_type_lookup[lookup_tuple]
     return cmd_type
 
-def binary_command_size(in_buffer):
-    """Return the length of a binary command or None if the command's header is
-    incomplete.
+def binary_command_size(in_buffer, offset=0):
+    """Return the length of a binary command starting at offset or None if the
+    command's header is incomplete.
     """
-    if len(in_buffer) < COMMAND_HEADER_SIZE:
+    if len(in_buffer) - offset < COMMAND_HEADER_SIZE:
         return None
     else:
-        length = struct.unpack('!4sII', in_buffer[:COMMAND_HEADER_SIZE])[2]
+        length = COMMAND_HEADER.unpack_from(in_buffer, offset)[2]
         return length + COMMAND_HEADER_SIZE
 
 def parse_binary_command(in_buffer, is_response=True):
@@ -191,7 +196,7 @@ def parse_binary_command(in_buffer, is_response=True):
         return cmd_type, cmd_args, cmd_len
 
     # By default, we'll assume we're dealing with a gearman command
-    magic, cmd_type, cmd_len = struct.unpack('!4sII', in_buffer[:COMMAND_HEADER_SIZE])
+    magic, cmd_type, cmd_len = COMMAND_HEADER.unpack_from(in_buffer)
 
     received_bad_response = is_response and bool(magic != MAGIC_RES_STRING)
     received_bad_request = not is_response and bool(magic != MAGIC_REQ_STRING)
@@ -223,22 +228,83 @@ def parse_binary_command(in_buffer, is_response=True):
         raise ProtocolError('Received %d argument(s), expecting %d argument(s): %s' % (len(split_arguments), len(expected_cmd_params), get_command_name(cmd_type)))
 
     # Iterate through the split arguments and assign them labels based on their order
-    cmd_args = dict((param_label, param_value) for param_label, param_value in zip(expected_cmd_params, split_arguments))
+    cmd_args = dict(zip(expected_cmd_params, split_arguments))
     return cmd_type, cmd_args, expected_packet_size
 
+def parse_binary_command_view(in_buffer, offset=0, is_response=True):
+    """Parse the complete binary command found at offset and return (command type, command arguments dict, command size)
 
-def pack_binary_command(cmd_type, cmd_args, is_response=False):
-    """Packs the given command using the parameter ordering specified in GEARMAN_PARAMS_FOR_COMMAND.
-    *NOTE* Expects that all arguments in cmd_args are already bytes.
+    Unlike parse_binary_command, the 'data' argument is returned as a memoryview into in_buffer
+    instead of a copy.  *NOTE* in_buffer can not be resized for as long as that view is alive.
     """
+    magic, cmd_type, cmd_len = COMMAND_HEADER.unpack_from(in_buffer, offset)
+
+    received_bad_response = is_response and bool(magic != MAGIC_RES_STRING)
+    received_bad_request = not is_response and bool(magic != MAGIC_REQ_STRING)
+    if received_bad_response or received_bad_request:
+        raise ProtocolError('Malformed Magic')
+
+    expected_cmd_params = GEARMAN_PARAMS_FOR_COMMAND.get(cmd_type, None)
+    if expected_cmd_params is None or cmd_type == GEARMAN_COMMAND_TEXT_COMMAND:
+        raise ProtocolError('Received unknown binary command: %s' % cmd_type)
+
+    expected_packet_size = COMMAND_HEADER_SIZE + cmd_len
+    if len(in_buffer) - offset < expected_packet_size:
+        raise ProtocolError('Received an incomplete command: %s' % get_command_name(cmd_type))
+
+    if not expected_cmd_params:
+        if cmd_len:
+            raise ProtocolError('Expected no binary payload: %s' % get_command_name(cmd_type))
+        return cmd_type, dict(), expected_packet_size
+
+    # Every argument but the last is NULL_CHAR terminated
+    cmd_args = dict()
+    argument_start = offset + COMMAND_HEADER_SIZE
+    payload_end = offset + expected_packet_size
+    for argument_index, param_label in enumerate(expected_cmd_params[:-1]):
+        argument_end = in_buffer.find(NULL_CHAR, argument_start, payload_end)
+        if argument_end == -1:
+            raise ProtocolError('Received %d argument(s), expecting %d argument(s): %s' % (argument_index + 1, len(expected_cmd_params), get_command_name(cmd_type)))
+
+        cmd_args[param_label] = bytes(in_buffer[argument_start:argument_end])
+        argument_start = argument_end + 1
+
+    param_label = expected_cmd_params[-1]
+    if param_label == 'data':
+        cmd_args[param_label] = memoryview(in_buffer)[argument_start:payload_end]
+    else:
+        cmd_args[param_label] = bytes(in_buffer[argument_start:payload_end])
+
+    return cmd_type, cmd_args, expected_packet_size
+
+def _pack_binary_payload(cmd_type, cmd_args):
+    """Validates the given command and joins its arguments in GEARMAN_PARAMS_FOR_COMMAND order"""
     expected_cmd_params = GEARMAN_PARAMS_FOR_COMMAND.get(cmd_type, None)
     if expected_cmd_params is None or cmd_type == GEARMAN_COMMAND_TEXT_COMMAND:
         raise ProtocolError('Received unknown binary command: %s' % get_command_name(cmd_type))
 
-    expected_parameter_set = set(expected_cmd_params)
-    received_parameter_set = set(cmd_args.keys())
-    if expected_parameter_set != received_parameter_set:
-        raise ProtocolError('Received arguments did not match expected arguments: %r != %r' % (expected_parameter_set, received_parameter_set))
+    expected_parameter_set = GEARMAN_PARAM_SET_FOR_COMMAND[cmd_type]
+    if cmd_args.keys() != expected_parameter_set:
+        raise ProtocolError('Received arguments did not match expected arguments: %r != %r' % (set(expected_parameter_set), set(cmd_args.keys())))
+
+    data_items = [cmd_args[param] for param in expected_cmd_params]
+    for param_value in data_items:
+        if not isinstance(param_value, bytes):
+            raise ProtocolError('Received un-encodable arguments: %r' % cmd_args)
+
+    # The binary protocol is null byte delimited, so let's make sure the only null bytes
+    # in our payload are the delimiters we just put there
+    binary_payload = NULL_CHAR.join(data_items)
+    if data_items and binary_payload.count(NULL_CHAR) != len(data_items) - 1:
+        raise ProtocolError('Received un-encodable arguments: %r' % cmd_args)
+
+    return binary_payload
+
+def pack_binary_command(cmd_type, cmd_args, is_response=False):
+    """Packs the given command using the parameter ordering specified in GEARMAN_PARAMS_FOR_COMMAND.
+    *NOTE* Expects that all arguments in cmd_args are already bytes.
+    """
+    binary_payload = _pack_binary_payload(cmd_type, cmd_args)
 
     # Select the right expected magic
     if is_response:
@@ -246,18 +312,29 @@ def pack_binary_command(cmd_type, cmd_args, is_response=False):
     else:
         magic = MAGIC_REQ_STRING
 
-    # The binary protocol is null byte delimited, so let's make sure we don't
-    # have null bytes in our values and we're dealing with strings we can probably encode.
-    if any(not isinstance(param_value, bytes) or NULL_CHAR in param_value for param_value in cmd_args.values()):
-        raise ProtocolError('Received un-encodable arguments: %r' % cmd_args)
+    # Pack the header in the !4sII format then append the binary payload
+    return COMMAND_HEADER.pack(magic, cmd_type, len(binary_payload)) + binary_payload
 
-    data_items = [cmd_args[param] for param in expected_cmd_params]
-    binary_payload = NULL_CHAR.join(data_items)
+def pack_binary_commands(cmd_list, is_response=False):
+    """Packs a sequence of (cmd_type, cmd_args) into one contiguous buffer
 
-    # Pack the header in the !4sII format then append the binary payload
-    payload_size = len(binary_payload)
-    packing_format = '!4sII%ds' % payload_size
-    return struct.pack(packing_format, magic, cmd_type, payload_size, binary_payload)
+    Equivalent to joining pack_binary_command for every command, but skips building
+    an intermediate header + payload object per command and copies everything exactly once.
+    """
+    if is_response:
+        magic = MAGIC_RES_STRING
+    else:
+        magic = MAGIC_REQ_STRING
+
+    pack_header = COMMAND_HEADER.pack
+    packed_pieces = []
+    for cmd_type, cmd_args in cmd_list:
+        binary_payload = _pack_binary_payload(cmd_type, cmd_args)
+        packed_pieces.append(pack_header(magic, cmd_type, len(binary_payload)))
+        packed_pieces.append(binary_payload)
+
+    # bytes.join sizes the output once up front, then fills it in a single pass
+    return b''.join(packed_pieces)
 
 def parse_text_command(in_buffer):
     """Parse a text command and return a single line at a time"""
@@ -0,0 +1,226 @@
+import bisect
+import hashlib
+import math
+import random
+import time
+import weakref
+
+import gearman.util
+from gearman.constants import JOB_PENDING, JOB_CREATED, JOB_UNKNOWN
+
+def _to_bytes(key_part):
+    if isinstance(key_part, bytes):
+        return key_part
+
+    return str(key_part).encode('utf-8')
+
+def hash_key(key):
+    """Hashes key onto our ring, the same way in every process no matter what PYTHONHASHSEED says"""
+    return int.from_bytes(hashlib.md5(key).digest()[:8], 'big')
+
+class GearmanRouter(object):
+    """Decides which of our servers a job request goes to
+
+    get_connection_order returns the connections out of connection_list in the order a request should try them,
+    GearmanClient moves on to the next one whenever a server is down
+    """
+    def get_connection_order(self, current_request, connection_list):
+        raise NotImplementedError
+
+    def request_sent(self, current_request, current_connection):
+        """Called by our client right before it submits a request on current_connection"""
+        pass
+
+    def request_updated(self, current_request):
+        """Called by our client whenever a request changes state or receives an update"""
+        pass
+
+class RandomRouter(GearmanRouter):
+    """Spreads job requests over our servers at random"""
+    def get_connection_order(self, current_request, connection_list):
+        shuffled_connection_list = list(connection_list)
+        random.shuffle(shuffled_connection_list)
+        return shuffled_connection_list
+
+class ConsistentHashRouter(GearmanRouter):
+    """Sends every job with the same (task, unique) to the same server, so gearmand can coalesce duplicate jobs
+
+    Every server gets virtual_nodes points on a hash ring keyed on its address.  A job goes to the first server
+    at or after its key's point on our ring and fails over to the servers after it, so adding or removing one of
+    N servers only moves about 1/N of our keys.  Every client needs the same virtual_nodes to agree on a server
+    """
+    virtual_nodes = 160
+
+    def __init__(self, virtual_nodes=None):
+        if virtual_nodes is not None:
+            self.virtual_nodes = virtual_nodes
+
+        # Our ring is rebuilt whenever we're handed a different connection_list
+        self._ring_connection_list = None
+        self._ring_points = []
+        self._ring_connections = []
+
+    def get_connection_order(self, current_request, connection_list):
+        self._update_ring(connection_list)
+        if not self._ring_points:
+            return []
+
+        key_point = hash_key(self.get_request_key(current_request))
+        ring_size = len(self._ring_points)
+        ring_index = bisect.bisect_left(self._ring_points, key_point)
+
+        # Walk the ring from our key, every server shows up in the order we first run into it
+        ordered_connections = []
+        seen_connections = set()
+        server_count = len(set(self._ring_connections))
+        for step in range(ring_size):
+            current_connection = self._ring_connections[(ring_index + step) % ring_size]
+            if current_connection in seen_connections:
+                continue
+
+            seen_connections.add(current_connection)
+            ordered_connections.append(current_connection)
+            if len(ordered_connections) == server_count:
+                break
+
+        return ordered_connections
+
+    def get_request_key(self, current_request):
+        """Returns the key we hash a request on, override to route on something other than (task, unique)"""
+        current_job = current_request.job
+
+        # gearmand uses a job's data as its unique when we send a unique of '-'
+        job_unique = _to_bytes(current_job.unique)
+        if job_unique == b'-':
+            job_unique = _to_bytes(current_job.data)
+
+        return _to_bytes(current_job.task) + b'\0' + job_unique
+
+    def get_server_key(self, current_connection, virtual_node):
+        server_address = gearman.util.format_server_parameter(*current_connection.get_address())
+        return b'%s-%d' % (_to_bytes(server_address), virtual_node)
+
+    def _update_ring(self, connection_list):
+        if self._ring_connection_list == connection_list:
+            return
+
+        ring_nodes = []
+        for current_connection in connection_list:
+            for virtual_node in range(self.virtual_nodes):
+                ring_nodes.append((hash_key(self.get_server_key(current_connection, virtual_node)), current_connection.get_address(), current_connection))
+
+        # Ties between points go to the same server in every client
+        ring_nodes.sort(key=lambda ring_node: ring_node[:2])
+
+        self._ring_connection_list = list(connection_list)
+        self._ring_points = [ring_node[0] for ring_node in ring_nodes]
+        self._ring_connections = [ring_node[2] for ring_node in ring_nodes]
+
+class _ServerLatency(object):
+    """Latency samples for a single server"""
+    def __init__(self):
+        self.created_ewma = 0.0
+        self.completed_ewma = 0.0
+        self.last_sample_time = None
+
+        # Requests we sent that have yet to finish, they drop out on their own if our caller lets go of them
+        self.outstanding_requests = weakref.WeakSet()
+
+class EwmaRouter(GearmanRouter):
+    """Sends job requests to whichever of two randomly picked servers looks least loaded (power of two choices)
+
+    We keep an EWMA of how long each server takes to answer a submit with JOB_CREATED and how long its jobs take
+    to complete.  A server's cost is the sum of both, decaying towards 0 over decay_time seconds without new
+    samples so a server that was slow gets another look, plus the cost of every request it still owes us an
+    answer for.  Outstanding requests never decay, a server that stops answering only gets more expensive
+    """
+    # Weight of every new sample in our averages
+    smoothing = 0.3
+
+    # Seconds for an idle server's latency to decay by a factor of e
+    decay_time = 10.0
+
+    # Seconds every outstanding request adds to a server's cost, or its latency if that's higher
+    outstanding_request_cost = 0.1
+
+    def __init__(self):
+        self.server_latencies = weakref.WeakKeyDictionary()
+
+        # Maps requests to the connection and time we sent them at, plus when they were created once we know
+        self._request_to_send_info = weakref.WeakKeyDictionary()
+
+    def get_connection_order(self, current_request, connection_list):
+        current_time = time.time()
+        connection_costs = dict((current_connection, self.get_cost(current_connection, current_time)) for current_connection in connection_list)
+
+        # Our pick goes first, everyone else is tried from cheapest to most expensive
+        ordered_connections = sorted(connection_list, key=connection_costs.__getitem__)
+        if len(connection_list) > 1:
+            first_choice, second_choice = random.sample(connection_list, 2)
+            chosen_connection = min((first_choice, second_choice), key=connection_costs.__getitem__)
+
+            ordered_connections.remove(chosen_connection)
+            ordered_connections.insert(0, chosen_connection)
+
+        return ordered_connections
+
+    def get_cost(self, current_connection, current_time=None):
+        server_latency = self.server_latencies.get(current_connection)
+        if server_latency is None:
+            return 0.0
+
+        latency_ewma = server_latency.created_ewma + server_latency.completed_ewma
+        outstanding_cost = len(server_latency.outstanding_requests) * max(latency_ewma, self.outstanding_request_cost)
+        if server_latency.last_sample_time is None:
+            return outstanding_cost
+
+        current_time = time.time() if current_time is None else current_time
+        decay = math.exp(-max(current_time - server_latency.last_sample_time, 0.0) / self.decay_time)
+        return latency_ewma * decay + outstanding_cost
+
+    def request_sent(self, current_request, current_connection):
+        self._finish_request(current_request)
+
+        server_latency = self.server_latencies.get(current_connection)
+        if server_latency is None:
+            server_latency = self.server_latencies[current_connection] = _ServerLatency()
+
+        server_latency.outstanding_requests.add(current_request)
+        self._request_to_send_info[current_request] = (current_connection, time.time())
+
+    def request_updated(self, current_request):
+        send_info = self._request_to_send_info.get(current_request)
+        if send_info is None or current_request.state == JOB_PENDING:
+            return
+
+        current_connection, sent_time = send_info[:2]
+        server_latency = self.server_latencies[current_connection]
+        current_time = time.time()
+
+        if current_request.state == JOB_UNKNOWN:
+            # Our connection died, that's not a latency sample
+            self._finish_request(current_request)
+            return
+
+        if current_request.state == JOB_CREATED and len(send_info) == 2:
+            server_latency.created_ewma = self._add_sample(server_latency, server_latency.created_ewma, current_time - sent_time)
+            server_latency.last_sample_time = current_time
+            self._request_to_send_info[current_request] = send_info + (current_time,)
+
+        if current_request.complete:
+            if not current_request.background:
+                server_latency.completed_ewma = self._add_sample(server_latency, server_latency.completed_ewma, current_time - sent_time)
+                server_latency.last_sample_time = current_time
+
+            self._finish_request(current_request)
+
+    def _add_sample(self, server_latency, current_ewma, latency_sample):
+        if server_latency.last_sample_time is None:
+            return latency_sample
+
+        return current_ewma + self.smoothing * (latency_sample - current_ewma)
+
+    def _finish_request(self, current_request):
+        send_info = self._request_to_send_info.pop(current_request, None)
+        if send_info is not None:
+            self.server_latencies[send_info[0]].outstanding_requests.discard(current_request)
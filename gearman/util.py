@@ -4,9 +4,11 @@ Gearman Client Utils
 """
 import errno
 import select as select_lib
+import selectors
+import socket
 import time
 
-from gearman.constants import DEFAULT_GEARMAN_PORT
+from gearman.constants import DEFAULT_GEARMAN_PORT, UNIX_SOCKET_PREFIX
 
 class Stopwatch(object):
     """Timer class that keeps track of time remaining"""
@@ -35,18 +37,41 @@ class Stopwatch(object):
         return bool(time_comparison < self.stop_time)
 
 def disambiguate_server_parameter(hostport_tuple):
-    """Takes either a tuple of (address, port) or a string of 'address:port' and disambiguates them for us"""
+    """Takes either a tuple of (address, port) or a string of 'address:port' and disambiguates them for us
+
+    IPv6 addresses go in brackets when they come with a port ('[::1]:4730'), unix domain sockets are
+    given as 'unix:///path/to/gearmand.sock' and come back with a port of None
+    """
     if type(hostport_tuple) is tuple:
         gearman_host, gearman_port = hostport_tuple
-    elif ':' in hostport_tuple:
+    elif hostport_tuple.startswith(UNIX_SOCKET_PREFIX):
+        gearman_host = hostport_tuple
+        gearman_port = None
+    elif hostport_tuple.startswith('['):
+        gearman_host, bracket_char, gearman_possible_port = hostport_tuple[1:].partition(']')
+        if not bracket_char or (gearman_possible_port and not gearman_possible_port.startswith(':')):
+            raise ValueError('Invalid server address: %r' % hostport_tuple)
+
+        gearman_port = int(gearman_possible_port[1:]) if gearman_possible_port else DEFAULT_GEARMAN_PORT
+    elif hostport_tuple.count(':') == 1:
         gearman_host, gearman_possible_port = hostport_tuple.split(':')
         gearman_port = int(gearman_possible_port)
     else:
+        # Either a bare hostname or a bare IPv6 address
         gearman_host = hostport_tuple
         gearman_port = DEFAULT_GEARMAN_PORT
 
     return gearman_host, gearman_port
 
+def format_server_parameter(gearman_host, gearman_port):
+    """Turns an (address, port) back into the 'address:port' string disambiguate_server_parameter takes"""
+    if gearman_port is None:
+        return gearman_host
+    elif ':' in gearman_host:
+        return '[%s]:%s' % (gearman_host, gearman_port)
+    else:
+        return '%s:%s' % (gearman_host, gearman_port)
+
 def select(rlist, wlist, xlist, timeout=None):
     """Behave similar to select.select, except ignoring certain types of exceptions"""
     rd_list = []
@@ -94,6 +119,135 @@ def select(rlist, wlist, xlist, timeout=None):
 
     return rd_list, wr_list, ex_list
 
+class GearmanPoller(object):
+    """Long-lived poller for a group of connections, built on the selectors module (epoll, kqueue, ...)
+
+    Connections are registered once and we only touch the underlying selector when
+    a connection starts or stops having data to write, so a single poll costs time
+    proportional to the number of active connections instead of all connections
+    """
+    def __init__(self, selector_class=None):
+        selector_class = selector_class or selectors.DefaultSelector
+        self._selector = selector_class()
+
+        self.connection_to_fd = {}
+        self.connection_to_events = {}
+
+        self._wakeup_reader = None
+        self._wakeup_writer = None
+
+    def __contains__(self, current_connection):
+        return current_connection in self.connection_to_fd
+
+    def __len__(self):
+        return len(self.connection_to_fd)
+
+    @property
+    def connections(self):
+        return self.connection_to_fd.keys()
+
+    def register(self, current_connection, writable=False):
+        """Start polling a connection, always for reads and optionally for writes"""
+        self.unregister(current_connection)
+
+        connection_fd = current_connection.fileno()
+
+        # A connection that was closed without being unregistered may have left its file descriptor behind
+        stale_key = self._selector.get_map().get(connection_fd)
+        if stale_key is not None:
+            self.unregister(stale_key.data)
+
+        connection_events = self._events_for(writable)
+        self._selector.register(connection_fd, connection_events, current_connection)
+
+        self.connection_to_fd[current_connection] = connection_fd
+        self.connection_to_events[current_connection] = connection_events
+
+    def modify(self, current_connection, writable):
+        """Update whether we poll a connection for writes, a no-op for unknown connections or unchanged interest"""
+        current_events = self.connection_to_events.get(current_connection)
+        connection_events = self._events_for(writable)
+        if current_events is None or current_events == connection_events:
+            return
+
+        self._selector.modify(self.connection_to_fd[current_connection], connection_events, current_connection)
+        self.connection_to_events[current_connection] = connection_events
+
+    def unregister(self, current_connection):
+        """Stop polling a connection, safe to call on connections we don't know about"""
+        connection_fd = self.connection_to_fd.pop(current_connection, None)
+        self.connection_to_events.pop(current_connection, None)
+        if connection_fd is None:
+            return
+
+        try:
+            self._selector.unregister(connection_fd)
+        except (KeyError, ValueError):
+            pass
+
+    def enable_wakeup(self):
+        """Allow other threads to interrupt a poll() in progress through wakeup()"""
+        if self._wakeup_reader is not None:
+            return
+
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(0)
+        self._wakeup_writer.setblocking(0)
+
+        # Our wakeup socket is the only thing we register without a connection attached
+        self._selector.register(self._wakeup_reader, selectors.EVENT_READ, None)
+
+    def wakeup(self):
+        """Make a poll() in progress return right away, safe to call from any thread"""
+        if self._wakeup_writer is None:
+            return
+
+        try:
+            self._wakeup_writer.send(b'\0')
+        except socket.error:
+            # Our socket buffer is full of wakeups that have yet to be read, poll() will return anyways
+            pass
+
+    def _drain_wakeups(self):
+        try:
+            while self._wakeup_reader.recv(4096):
+                pass
+        except socket.error:
+            pass
+
+    def poll(self, timeout=None):
+        """Returns a list of readable connections and a list of writable connections"""
+        rd_list = []
+        wr_list = []
+        for selector_key, connection_events in self._selector.select(timeout):
+            if selector_key.data is None:
+                self._drain_wakeups()
+                continue
+
+            if connection_events & selectors.EVENT_READ:
+                rd_list.append(selector_key.data)
+            if connection_events & selectors.EVENT_WRITE:
+                wr_list.append(selector_key.data)
+
+        return rd_list, wr_list
+
+    def close(self):
+        self.connection_to_fd.clear()
+        self.connection_to_events.clear()
+        self._selector.close()
+
+        if self._wakeup_reader is not None:
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
+            self._wakeup_reader = None
+            self._wakeup_writer = None
+
+    def _events_for(self, writable):
+        if writable:
+            return selectors.EVENT_READ | selectors.EVENT_WRITE
+        else:
+            return selectors.EVENT_READ
+
 def unlist(given_list):
     """Convert the (possibly) single item list into a single item"""
     list_size = len(given_list)
@@ -1,44 +1,83 @@
+import collections
+import concurrent.futures
+import functools
+import inspect
 import logging
 import random
 import sys
+import threading
+import time
 
 from gearman.connection_manager import GearmanConnectionManager
 from gearman.worker_handler import GearmanWorkerCommandHandler
-from gearman.errors import ConnectionError
+from gearman.errors import ServerUnavailable
 
 gearman_logger = logging.getLogger(__name__)
 
 POLL_TIMEOUT_IN_SECONDS = 60.0
 
-class GearmanWorker(GearmanConnectionManager):
-    """
-    GearmanWorker :: Interface to accept jobs from a Gearman server
+class _GearmanWorkerJobs(object):
+    """Hands out job slots and sends job updates, mixed into GearmanWorker and AsyncGearmanWorker
+
+    Only running jobs and sending out their updates differ between our blocking and our asyncio workers,
+    they share how jobs get grabbed and how their updates get to the server
     """
-    command_handler_class = GearmanWorkerCommandHandler
+    # Pipelining grabs, we ask for our next job as soon as we're handed one instead of going back to sleep
+    # and waiting on a NOOP, sending our job's result and our next GRAB_JOB_UNIQ in a single write.
+    # We only go back to sleep once the server tells us it's out of jobs
+    pipeline_grab_job = False
 
-    def __init__(self, host_list=None):
-        super(GearmanWorker, self).__init__(host_list=host_list)
+    def __init__(self, host_list=None, max_concurrent_jobs=1):
+        super(_GearmanWorkerJobs, self).__init__(host_list=host_list)
+
+        assert max_concurrent_jobs >= 1, '%s needs at least one job slot' % type(self).__name__
+        self.max_concurrent_jobs = max_concurrent_jobs
 
         self.randomized_connections = None
 
         self.worker_abilities = {}
         self.worker_client_id = None
-        self.command_handler_holding_job_lock = None
+
+        # Every job slot is either held by a handler waiting on a JOB_ASSIGN or by a running job
+        self.command_handlers_holding_job_lock = set()
+        self.running_jobs = {}
+
+        # Handlers that were woken up while we were out of job slots, in the order they were woken up
+        self._handlers_awaiting_job_slot = {}
+
+        # Set once we're asked to stop, we stop handing out job slots so we stop grabbing jobs
+        self._draining = False
 
         self._update_initial_state()
 
+    @property
+    def command_handler_holding_job_lock(self):
+        """The handler holding our job lock, only meaningful with a single job slot"""
+        for command_handler in self.command_handlers_holding_job_lock:
+            return command_handler
+
+        return None
+
+    @command_handler_holding_job_lock.setter
+    def command_handler_holding_job_lock(self, command_handler):
+        self.command_handlers_holding_job_lock.clear()
+        if command_handler is not None:
+            self.command_handlers_holding_job_lock.add(command_handler)
+
     def _update_initial_state(self):
         self.handler_initial_state['abilities'] = list(self.worker_abilities.keys())
         self.handler_initial_state['client_id'] = self.worker_client_id
+        self.handler_initial_state['pipeline_grab_job'] = self.pipeline_grab_job
 
-    ########################################################
-    ##### Public methods for general GearmanWorker use #####
-    ########################################################
     def register_task(self, task, callback_function):
         """Register a function with this worker
 
         def function_callback(calling_gearman_worker, current_job):
             return current_job.data
+
+        Generator callbacks stream their results, every chunk they yield goes out as a JOB_DATA update
+        and whatever they return (b'' if nothing) completes the job.  AsyncGearmanWorker also takes
+        coroutine functions and async generators
         """
         self.worker_abilities[task] = callback_function
         self._update_initial_state()
@@ -68,42 +107,289 @@ class GearmanWorker(GearmanConnectionManager):
 
         return client_id
 
+    def shutdown(self):
+        self.command_handlers_holding_job_lock.clear()
+        self._handlers_awaiting_job_slot.clear()
+        super(_GearmanWorkerJobs, self).shutdown()
+
+    def after_job(self):
+        """Callback to notify any outside listeners that a worker has completed the current job.
+
+        This is useful for accomplishing work or stopping the worker in between jobs.
+
+        Return True to continue working, False to stop the worker
+        """
+        return True
+
+    def handle_error(self, current_connection):
+        """If we discover that a connection has a problem, we better release the job lock"""
+        current_handler = self.connection_to_handler_map.get(current_connection)
+        if current_handler:
+            self._handlers_awaiting_job_slot.pop(current_handler, None)
+            self.set_job_lock(current_handler, lock=False)
+
+        super(_GearmanWorkerJobs, self).handle_error(current_connection)
+
+    #############################################################
+    ## Public methods so Gearman jobs can send Gearman updates ##
+    #############################################################
+    def _send_job_updates(self, current_job, job_updates, poll_timeout=None):
+        """Sends [(handler function name, kwargs), ...] for a job"""
+        raise NotImplementedError
+
+    def send_job_status(self, current_job, numerator, denominator, poll_timeout=None):
+        """Send a Gearman JOB_STATUS update for an inflight job"""
+        self._send_job_updates(current_job, [('send_job_status', dict(numerator=numerator, denominator=denominator))], poll_timeout=poll_timeout)
+
+    def send_job_complete(self, current_job, data, poll_timeout=None):
+        self._send_job_updates(current_job, [('send_job_complete', dict(data=data))], poll_timeout=poll_timeout)
+
+    def send_job_failure(self, current_job, poll_timeout=None):
+        """Removes a job from the queue if its backgrounded"""
+        self._send_job_updates(current_job, [('send_job_failure', dict())], poll_timeout=poll_timeout)
+
+    def send_job_exception(self, current_job, data, poll_timeout=None):
+        """Removes a job from the queue if its backgrounded"""
+        # Using GEARMAND_COMMAND_WORK_EXCEPTION is not recommended at time of this writing [2010-02-24]
+        # http://groups.google.com/group/gearman/browse_thread/thread/5c91acc31bd10688/529e586405ed37fe
+        #
+        self._send_job_updates(current_job, [('send_job_exception', dict(data=data)), ('send_job_failure', dict())], poll_timeout=poll_timeout)
+
+    def send_job_data(self, current_job, data, poll_timeout=None):
+        """Send a Gearman JOB_DATA update for an inflight job"""
+        self._send_job_updates(current_job, [('send_job_data', dict(data=data))], poll_timeout=poll_timeout)
+
+    def send_job_warning(self, current_job, data, poll_timeout=None):
+        """Send a Gearman JOB_WARNING update for an inflight job"""
+        self._send_job_updates(current_job, [('send_job_warning', dict(data=data))], poll_timeout=poll_timeout)
+
+    #####################################################
+    ##### Callback methods for GearmanWorkerHandler #####
+    #####################################################
+    def create_job(self, command_handler, job_handle, task, unique, data):
+        """Create a new job using our self.job_class"""
+        current_connection = self.handler_to_connection_map[command_handler]
+        return self.job_class(current_connection, job_handle, task, unique, data)
+
+    def on_job_exception(self, current_job, exc_info):
+        self.send_job_failure(current_job)
+        return False
+
+    def on_job_complete(self, current_job, job_result):
+        self.send_job_complete(current_job, job_result)
+        return True
+
+    def wait_for_job_slot(self, command_handler):
+        """Called by a handler that was woken up while all our job slots were taken
+
+        Keep it awake, going back to sleep would only get it another NOOP if the server has jobs queued up.
+        We'll wake it back up as soon as a job slot frees up
+        """
+        self._handlers_awaiting_job_slot[command_handler] = True
+        return True
+
+    def _wake_handlers_awaiting_job_slot(self):
+        while self._handlers_awaiting_job_slot and self._has_free_job_slot():
+            command_handler = next(iter(self._handlers_awaiting_job_slot))
+            del self._handlers_awaiting_job_slot[command_handler]
+
+            if command_handler in self.handler_to_connection_map:
+                command_handler.recv_noop()
+
+    def _has_free_job_slot(self):
+        if self._draining:
+            return False
+
+        used_job_slots = len(self.command_handlers_holding_job_lock) + len(self.running_jobs)
+        return bool(used_job_slots < self.max_concurrent_jobs)
+
+    def set_job_lock(self, command_handler, lock):
+        """Hand out one of our job slots to a handler that is about to grab a job, with a single job slot we hold onto 1 job at anytime"""
+        if command_handler not in self.handler_to_connection_map:
+            return False
+
+        failed_lock = bool(lock and (command_handler in self.command_handlers_holding_job_lock or not self._has_free_job_slot()))
+        failed_unlock = bool(not lock and command_handler not in self.command_handlers_holding_job_lock)
+
+        # If we've already been locked, we should say the lock failed
+        # If we're attempting to unlock something when we don't have a lock, we're in a bad state
+        if failed_lock or failed_unlock:
+            return False
+
+        if lock:
+            self.command_handlers_holding_job_lock.add(command_handler)
+        else:
+            self.command_handlers_holding_job_lock.discard(command_handler)
+            self._wake_handlers_awaiting_job_slot()
+
+        return True
+
+    def has_job_lock(self):
+        return bool(self.command_handlers_holding_job_lock or self.running_jobs)
+
+    def check_job_lock(self, command_handler):
+        """Check to see if we hold the job lock"""
+        return bool(command_handler in self.command_handlers_holding_job_lock)
+
+class GearmanWorker(_GearmanWorkerJobs, GearmanConnectionManager):
+    """
+    GearmanWorker :: Interface to accept jobs from a Gearman server
+
+    By default, jobs run one at a time inside of our poll loop.  Give us an executor
+    (e.g. concurrent.futures.ThreadPoolExecutor) and/or max_concurrent_jobs > 1 to run up to
+    max_concurrent_jobs jobs at once on a thread pool, our poll loop keeps grabbing jobs while
+    we have free job slots and sends out results as jobs finish
+
+    Tasks registered with register_batch_task get their jobs handed over a batch at a time,
+    a running batch takes up a single job slot
+    """
+    command_handler_class = GearmanWorkerCommandHandler
+
+    # Running jobs inside of our poll loop, send_job_* calls block until their update is written out.
+    # Buffering job updates, they only queue their update, we write our queued updates out (without blocking)
+    # once we've queued update_flush_bytes or update_flush_interval seconds passed since our last write.
+    # We only block once update_high_water_mark bytes pile up, and at the end of every job
+    buffer_job_updates = False
+    update_flush_bytes = 64 * 1024
+    update_flush_interval = 0.05
+    update_high_water_mark = 4 * 1024 * 1024
+
+    def __init__(self, host_list=None, max_concurrent_jobs=1, executor=None):
+        super(GearmanWorker, self).__init__(host_list=host_list, max_concurrent_jobs=max_concurrent_jobs)
+
+        self.worker_batch_abilities = {}
+
+        # Jobs for batch tasks wait here, by task, until we have max_batch of them or the first one waited max_wait_ms
+        self._pending_batches = {}
+        self._batch_deadlines = {}
+
+        # Jobs we ran inside our poll loop that we've yet to call after_job for
+        self._finished_job_count = 0
+
+        # Maps the connections we've queued updates on to a job with updates on that connection
+        self._deferred_update_jobs = None
+        self._next_update_flush_time = 0.0
+
+        self._stop_requested = False
+
+        # Accept either an executor class or an executor instance
+        if executor is None and max_concurrent_jobs > 1:
+            executor = concurrent.futures.ThreadPoolExecutor
+
+        self._owns_executor = isinstance(executor, type)
+        if self._owns_executor:
+            executor = executor(max_workers=max_concurrent_jobs)
+
+        self.executor = executor
+
+        # Only the thread that polls our connections gets to touch them, our jobs
+        # hand their updates and results to that thread through this queue
+        self._poll_thread_ident = threading.get_ident()
+        self._job_events = collections.deque()
+
+        # Lets our jobs and stop() interrupt a poll in progress
+        self.poller.enable_wakeup()
+
+    ########################################################
+    ##### Public methods for general GearmanWorker use #####
+    ########################################################
+    def register_task(self, task, callback_function):
+        """Register a function with this worker, replacing it if it was registered as a batch task"""
+        self.worker_batch_abilities.pop(task, None)
+        return super(GearmanWorker, self).register_task(task, callback_function)
+
+    def register_batch_task(self, task, callback_function, max_batch=64, max_wait_ms=5):
+        """Register a function with this worker that gets handed up to max_batch jobs at once
+
+        We wait at most max_wait_ms for a batch to fill up.  Return one result per job, in order
+
+        def function_callback(calling_gearman_worker, current_jobs):
+            return [current_job.data for current_job in current_jobs]
+        """
+        assert max_batch >= 1, 'Batches need room for at least one job'
+        self.register_task(task, callback_function)
+        self.worker_batch_abilities[task] = (max_batch, max_wait_ms / 1000.0)
+
+        return task
+
+    def unregister_task(self, task):
+        """Unregister a function with worker"""
+        self.worker_batch_abilities.pop(task, None)
+        return super(GearmanWorker, self).unregister_task(task)
+
     def work(self, poll_timeout=POLL_TIMEOUT_IN_SECONDS):
         """Loop indefinitely, complete tasks from all connections."""
         continue_working = True
         worker_connections = []
 
-        # We're going to track whether a previous call to our closure indicated
-        # we were processing a job. This is just a list of possibly a single
-        # element indicating we had a job. It's a list so that through the
-        # magic of closures we can reference and write to it each call.
-        # This is all so that we can determine when we've finished processing a job
-        # correctly.
-        had_job = []
-
         def continue_while_connections_alive(any_activity):
-            if had_job and not self.has_job_lock():
-                return self.after_poll(any_activity) and self.after_job()
+            if self._stop_requested:
+                return False
+
+            # Run (or hand our executor) every batch of jobs that's waited long enough
+            self._flush_batches()
 
-            del had_job[:]
-            if self.has_job_lock():
-                had_job.append(True)
+            if self.executor is not None:
+                return self._process_job_events() and self.after_poll(any_activity)
 
-            return self.after_poll(any_activity)
+            return self.after_poll(any_activity) and self._after_finished_jobs()
+
+        self._poll_thread_ident = threading.get_ident()
 
         # Shuffle our connections after the poll timeout
         while continue_working:
             worker_connections = self.establish_worker_connections()
             continue_working = self.poll_connections_until_stopped(worker_connections, continue_while_connections_alive, timeout=poll_timeout)
 
+        # Let jobs we've taken on finish and send out their results before we hang up
+        if self.running_jobs or self._job_events or self.command_handlers_holding_job_lock or self._pending_batches or \
+                any(current_connection.writable() for current_connection in worker_connections):
+            self._drain_running_jobs(worker_connections)
+
+        self._draining = False
+        self._stop_requested = False
+
         # If we were kicked out of the worker loop, we should shutdown all our connections
         for current_connection in worker_connections:
+            self.poller.unregister(current_connection)
             current_connection.close()
 
+    def _drain_running_jobs(self, worker_connections):
+        # Stop handing out job slots so we stop grabbing jobs
+        self._draining = True
+
+        # A handler holding a job slot is still waiting to hear back on its GRAB_JOB_UNIQ, if the server
+        # assigns it a job, we run that job like any other
+        def continue_while_jobs_running(any_activity):
+            self._flush_batches(flush_all=True)
+            self._process_job_events()
+            self._after_finished_jobs()
+            return bool(self.running_jobs or self.command_handlers_holding_job_lock) or any(current_connection.writable() for current_connection in worker_connections)
+
+        try:
+            self.poll_connections_until_stopped(worker_connections, continue_while_jobs_running)
+        except ServerUnavailable:
+            pass
+        finally:
+            self._draining = False
+
+    def stop(self):
+        """Stop grabbing new jobs, work() returns once the jobs we've taken on are done and their results are sent out
+
+        Safe to call from a signal handler or from another thread
+        """
+        self._draining = True
+        self._stop_requested = True
+        self.poller.wakeup()
+
     def shutdown(self):
-        self.command_handler_holding_job_lock = None
+        self._pending_batches.clear()
+        self._batch_deadlines.clear()
         super(GearmanWorker, self).shutdown()
 
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
     ###############################################################
     ## Methods to override when dealing with connection polling ##
     ##############################################################
@@ -112,15 +398,8 @@ class GearmanWorker(GearmanConnectionManager):
         self.randomized_connections = list(self.connection_list)
         random.shuffle(self.randomized_connections)
 
-        output_connections = []
-        for current_connection in self.randomized_connections:
-            try:
-                valid_connection = self.establish_connection(current_connection)
-                output_connections.append(valid_connection)
-            except ConnectionError:
-                pass
-
-        return output_connections
+        # Reconnect to all our dead connections at once
+        return self.establish_connections(self.randomized_connections)
 
     def after_poll(self, any_activity):
         """Polling callback to notify any outside listeners whats going on with the GearmanWorker.
@@ -128,23 +407,25 @@ class GearmanWorker(GearmanConnectionManager):
         Return True to continue polling, False to exit the work loop"""
         return True
 
-    def after_job(self):
-        """Callback to notify any outside listeners that a GearmanWorker has completed the current job.
-
-        This is useful for accomplishing work or stopping the GearmanWorker in between jobs.
-
-        Return True to continue polling, False to exit the work loop
-        """
-        return True
-
     def handle_error(self, current_connection):
-        """If we discover that a connection has a problem, we better release the job lock"""
-        current_handler = self.connection_to_handler_map.get(current_connection)
-        if current_handler:
-            self.set_job_lock(current_handler, lock=False)
+        # The server hands the jobs we've yet to run on this connection to someone else
+        for task, batch_jobs in list(self._pending_batches.items()):
+            batch_jobs[:] = [current_job for current_job in batch_jobs if current_job.connection is not current_connection]
+            if not batch_jobs:
+                self._pending_batches.pop(task)
+                self._batch_deadlines.pop(task)
 
         super(GearmanWorker, self).handle_error(current_connection)
 
+    def poll_connections_once(self, submitted_connections, timeout=None):
+        """Does a single robust poll, waking up in time to run our oldest pending batch"""
+        if self._batch_deadlines:
+            batch_timeout = max(min(self._batch_deadlines.values()) - time.time(), 0.0)
+            if timeout is None or batch_timeout < timeout:
+                timeout = batch_timeout
+
+        return super(GearmanWorker, self).poll_connections_once(submitted_connections, timeout=timeout)
+
     #############################################################
     ## Public methods so Gearman jobs can send Gearman updates ##
     #############################################################
@@ -158,99 +439,233 @@ class GearmanWorker(GearmanConnectionManager):
 
         self.poll_connections_until_stopped(connection_set, continue_while_updates_pending, timeout=poll_timeout)
 
-    def send_job_status(self, current_job, numerator, denominator, poll_timeout=None):
-        """Send a Gearman JOB_STATUS update for an inflight job"""
-        current_handler = self._get_handler_for_job(current_job)
-        current_handler.send_job_status(current_job, numerator=numerator, denominator=denominator)
+    def _send_job_updates(self, current_job, job_updates, poll_timeout=None):
+        """Sends [(handler function name, kwargs), ...] for a job, blocking until they're written if we run jobs in our poll loop"""
+        if threading.get_ident() != self._poll_thread_ident:
+            # Our connections belong to our poll thread, hand these updates over and wake it up
+            self._job_events.append((current_job, job_updates, None))
+            self.poller.wakeup()
+            return
 
-        self.wait_until_updates_sent([current_job], poll_timeout=poll_timeout)
+        if self.executor is not None and current_job.connection not in self.connection_to_handler_map:
+            # The server already gave this job to someone else when our connection died
+            gearman_logger.warning('Dropping update for job on a dead connection: %r', current_job)
+            return
 
-    def send_job_complete(self, current_job, data, poll_timeout=None):
         current_handler = self._get_handler_for_job(current_job)
-        current_handler.send_job_complete(current_job, data=data)
+        for handler_function_name, update_kwargs in job_updates:
+            getattr(current_handler, handler_function_name)(current_job, **update_kwargs)
 
-        self.wait_until_updates_sent([current_job], poll_timeout=poll_timeout)
+        # Our poll loop is busy running jobs on our executor and will send these out on its own
+        if self.executor is not None:
+            return
 
-    def send_job_failure(self, current_job, poll_timeout=None):
-        """Removes a job from the queue if its backgrounded"""
-        current_handler = self._get_handler_for_job(current_job)
-        current_handler.send_job_failure(current_job)
+        # Finishing a batch or buffering job updates, we'll wait on all of our updates at once
+        if self._deferred_update_jobs is None:
+            self.wait_until_updates_sent([current_job], poll_timeout=poll_timeout)
+            return
 
-        self.wait_until_updates_sent([current_job], poll_timeout=poll_timeout)
+        self._deferred_update_jobs[current_job.connection] = current_job
+        if self.buffer_job_updates:
+            self._flush_buffered_updates(current_job, poll_timeout=poll_timeout)
 
-    def send_job_exception(self, current_job, data, poll_timeout=None):
-        """Removes a job from the queue if its backgrounded"""
-        # Using GEARMAND_COMMAND_WORK_EXCEPTION is not recommended at time of this writing [2010-02-24]
-        # http://groups.google.com/group/gearman/browse_thread/thread/5c91acc31bd10688/529e586405ed37fe
-        #
-        current_handler = self._get_handler_for_job(current_job)
-        current_handler.send_job_exception(current_job, data=data)
-        current_handler.send_job_failure(current_job)
+    def _flush_buffered_updates(self, current_job, poll_timeout=None):
+        current_connection = current_job.connection
+        buffered_size = current_connection.outgoing_buffer_size()
 
-        self.wait_until_updates_sent([current_job], poll_timeout=poll_timeout)
+        # Write out whatever our socket takes right now
+        current_time = time.time()
+        if buffered_size >= self.update_flush_bytes or current_time >= self._next_update_flush_time:
+            self._next_update_flush_time = current_time + self.update_flush_interval
 
-    def send_job_data(self, current_job, data, poll_timeout=None):
-        """Send a Gearman JOB_DATA update for an inflight job"""
-        current_handler = self._get_handler_for_job(current_job)
-        current_handler.send_job_data(current_job, data=data)
+            rd_connections, wr_connections, ex_connections = self.poll_connections_once([current_connection], timeout=0.0)
+            self.handle_connection_activity(rd_connections, wr_connections, ex_connections)
+            buffered_size = current_connection.outgoing_buffer_size()
 
-        self.wait_until_updates_sent([current_job], poll_timeout=poll_timeout)
+        # Only block on our socket once the server falls too far behind
+        if buffered_size > self.update_high_water_mark:
+            self.wait_until_updates_sent([current_job], poll_timeout=poll_timeout)
 
-    def send_job_warning(self, current_job, data, poll_timeout=None):
-        """Send a Gearman JOB_WARNING update for an inflight job"""
-        current_handler = self._get_handler_for_job(current_job)
-        current_handler.send_job_warning(current_job, data=data)
+    def _defer_job_updates(self, job_function, *largs):
+        """Calls job_function, queueing every update it sends and waiting on all of them at once when it returns
+
+        Pipelining grabs, we don't wait at all, our poll loop writes our updates out along with our next GRAB_JOB_UNIQ
+        """
+        if self._deferred_update_jobs is not None:
+            return job_function(*largs)
 
-        self.wait_until_updates_sent([current_job], poll_timeout=poll_timeout)
+        self._deferred_update_jobs = {}
+        try:
+            function_result = job_function(*largs)
+            deferred_update_jobs = [current_job for current_job in self._deferred_update_jobs.values() if current_job.connection.connected]
+        finally:
+            self._deferred_update_jobs = None
+
+        if deferred_update_jobs and not self.pipeline_grab_job:
+            self.wait_until_updates_sent(deferred_update_jobs)
+
+        return function_result
 
     #####################################################
     ##### Callback methods for GearmanWorkerHandler #####
     #####################################################
-    def create_job(self, command_handler, job_handle, task, unique, data):
-        """Create a new job using our self.job_class"""
-        current_connection = self.handler_to_connection_map[command_handler]
-        return self.job_class(current_connection, job_handle, task, unique, data)
-
     def on_job_execute(self, current_job):
+        if current_job.task in self.worker_batch_abilities:
+            return self._add_job_to_batch(current_job)
+
+        if self.executor is not None:
+            return self._submit_job(current_job)
+
+        self._finished_job_count += 1
+        if self.buffer_job_updates:
+            return self._defer_job_updates(self._run_job, current_job)
+
+        return self._run_job(current_job)
+
+    def _run_job(self, current_job):
         try:
             function_callback = self.worker_abilities[current_job.task]
-            job_result = function_callback(self, current_job)
+            job_result = self._call_task(function_callback, self, current_job)
         except Exception:
-            return self.on_job_exception(current_job, sys.exc_info())
+            return self._defer_job_updates(self.on_job_exception, current_job, sys.exc_info())
 
-        return self.on_job_complete(current_job, job_result)
+        return self._defer_job_updates(self.on_job_complete, current_job, job_result)
 
-    def on_job_exception(self, current_job, exc_info):
-        self.send_job_failure(current_job)
-        return False
+    def _call_task(self, function_callback, gearman_worker, current_job):
+        job_result = function_callback(gearman_worker, current_job)
+        if inspect.isgenerator(job_result):
+            return self._stream_job_data(current_job, job_result)
+
+        return job_result
+
+    def _stream_job_data(self, current_job, job_generator):
+        """Send every chunk a generator task yields as a JOB_DATA update, whatever it returns becomes our job's result"""
+        while True:
+            try:
+                job_data = next(job_generator)
+            except StopIteration as generator_exit:
+                return b'' if generator_exit.value is None else generator_exit.value
+
+            self.send_job_data(current_job, job_data)
+
+    def _add_job_to_batch(self, current_job):
+        max_batch, max_wait = self.worker_batch_abilities[current_job.task]
+
+        batch_jobs = self._pending_batches.setdefault(current_job.task, [])
+        if not batch_jobs:
+            self._batch_deadlines[current_job.task] = time.time() + max_wait
+
+        batch_jobs.append(current_job)
+        if len(batch_jobs) >= max_batch or self._draining:
+            self._run_batch(current_job.task)
 
-    def on_job_complete(self, current_job, job_result):
-        self.send_job_complete(current_job, job_result)
         return True
 
-    def set_job_lock(self, command_handler, lock):
-        """Set a worker level job lock so we don't try to hold onto 2 jobs at anytime"""
-        if command_handler not in self.handler_to_connection_map:
-            return False
+    def _flush_batches(self, flush_all=False):
+        current_time = time.time()
+        for task, batch_deadline in list(self._batch_deadlines.items()):
+            if flush_all or batch_deadline <= current_time:
+                self._run_batch(task)
 
-        failed_lock = bool(lock and self.command_handler_holding_job_lock is not None)
-        failed_unlock = bool(not lock and self.command_handler_holding_job_lock != command_handler)
+    def _run_batch(self, task):
+        batch_jobs = self._pending_batches.pop(task)
+        self._batch_deadlines.pop(task)
 
-        # If we've already been locked, we should say the lock failed
-        # If we're attempting to unlock something when we don't have a lock, we're in a bad state
-        if failed_lock or failed_unlock:
-            return False
+        function_callback = self.worker_abilities[task]
+        if self.executor is not None:
+            return self._submit_job(batch_jobs, functools.partial(self._call_batch_task, function_callback))
 
-        if lock:
-            self.command_handler_holding_job_lock = command_handler
+        # Running jobs inside of our poll loop, we hand ourselves an already finished future
+        batch_future = concurrent.futures.Future()
+        try:
+            batch_future.set_result(self._call_batch_task(function_callback, self, batch_jobs))
+        except Exception as batch_exception:
+            batch_future.set_exception(batch_exception)
+
+        self._finished_job_count += len(batch_jobs)
+        self._defer_job_updates(self._finish_batch, batch_jobs, batch_future)
+        return True
+
+    def _call_batch_task(self, function_callback, gearman_worker, batch_jobs):
+        batch_results = list(function_callback(gearman_worker, batch_jobs))
+        if len(batch_results) != len(batch_jobs):
+            raise ValueError('Batch task %r returned %d results for %d jobs' % (batch_jobs[0].task, len(batch_results), len(batch_jobs)))
+
+        return batch_results
+
+    def _finish_batch(self, batch_jobs, batch_future):
+        """Send out the results of a batch of jobs"""
+        try:
+            batch_results = batch_future.result()
+        except Exception:
+            exc_info = sys.exc_info()
+            for current_job in batch_jobs:
+                self.on_job_exception(current_job, exc_info)
         else:
-            self.command_handler_holding_job_lock = None
+            for current_job, job_result in zip(batch_jobs, batch_results):
+                self.on_job_complete(current_job, job_result)
 
+    def _after_finished_jobs(self):
+        """Call after_job once for every job we've finished inside our poll loop"""
+        continue_working = True
+        while self._finished_job_count:
+            self._finished_job_count -= 1
+            continue_working = self.after_job() and continue_working
+
+        return continue_working
+
+    def _submit_job(self, current_job, function_callback=None):
+        """Run our job (or batch of jobs) on our executor, our handler still holds its job slot so we can hand it straight to this job"""
+        if function_callback is None:
+            function_callback = functools.partial(self._call_task, self.worker_abilities[current_job.task])
+
+        job_future = self.executor.submit(function_callback, self, current_job)
+        self.running_jobs[job_future] = current_job
+
+        # Runs on the executor's thread (or right here if our job is already done)
+        def on_job_future_done(finished_future):
+            self._job_events.append((current_job, None, finished_future))
+            self.poller.wakeup()
+
+        job_future.add_done_callback(on_job_future_done)
         return True
 
-    def has_job_lock(self):
-        return bool(self.command_handler_holding_job_lock is not None)
+    def _process_job_events(self):
+        """Send out the updates and results our jobs handed to our poll thread, in the order they happened
 
-    def check_job_lock(self, command_handler):
-        """Check to see if we hold the job lock"""
-        return bool(self.command_handler_holding_job_lock == command_handler)
+        Return True to continue polling, False if after_job asked us to stop
+        """
+        continue_working = True
+        while self._job_events:
+            current_job, job_updates, finished_future = self._job_events.popleft()
+            if job_updates is not None:
+                self._send_job_updates(current_job, job_updates)
+                continue
+
+            self.running_jobs.pop(finished_future, None)
+            if type(current_job) is list:
+                finished_jobs = current_job
+                self._finish_batch(finished_jobs, finished_future)
+            else:
+                finished_jobs = [current_job]
+                try:
+                    job_result = finished_future.result()
+                except Exception:
+                    self.on_job_exception(current_job, sys.exc_info())
+                else:
+                    self.on_job_complete(current_job, job_result)
+
+            self._wake_handlers_awaiting_job_slot()
+            for _ in finished_jobs:
+                continue_working = self.after_job() and continue_working
+
+        return continue_working
+
+    def wait_for_job_slot(self, command_handler):
+        """Running jobs inside our poll loop, we'll never see a job slot held by a running job, so send the handler back to sleep.
+        Running jobs on our executor, keep the handler awake and wake it back up as soon as a job slot frees up
+        """
+        if self.executor is None:
+            return False
+
+        return super(GearmanWorker, self).wait_for_job_slot(command_handler)
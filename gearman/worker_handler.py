@@ -15,14 +15,19 @@ class GearmanWorkerCommandHandler(GearmanCommandHandler):
         AWAKE         -> Transitional state (for NOOP)
         AWAITING_JOB  -> Holding worker level job lock and awaiting a server response
         EXECUTING_JOB -> Transitional state (for ASSIGN_JOB)
+
+    Pipelining grabs, we go from EXECUTING_JOB straight back to AWAITING_JOB and only SLEEP once the server runs out of jobs
     """
     def __init__(self, connection_manager=None):
         super(GearmanWorkerCommandHandler, self).__init__(connection_manager=connection_manager)
 
         self._handler_abilities = []
         self._client_id = None
+        self._pipeline_grab_job = False
+
+    def initial_state(self, abilities=None, client_id=None, pipeline_grab_job=False):
+        self._pipeline_grab_job = pipeline_grab_job
 
-    def initial_state(self, abilities=None, client_id=None):
         self.set_client_id(client_id)
         self.set_abilities(abilities)
 
@@ -94,17 +99,24 @@ class GearmanWorkerCommandHandler(GearmanCommandHandler):
 
         return True
 
+    def _wait_for_job_slot(self):
+        return self.connection_manager.wait_for_job_slot(self)
+
     def recv_noop(self):
-        """Transition from being SLEEP --> AWAITING_JOB / SLEEP
+        """Transition from being SLEEP --> AWAITING_JOB / AWAKE / SLEEP
 
           AWAITING_JOB -> AWAITING_JOB :: Noop transition, we're already awaiting a job
         SLEEP -> AWAKE -> AWAITING_JOB :: Transition if we can acquire the worker job lock
+        SLEEP -> AWAKE                 :: Transition if we can NOT acquire a worker job lock but our worker will wake us up once it frees up
         SLEEP -> AWAKE -> SLEEP        :: Transition if we can NOT acquire a worker job lock
         """
         if self._check_job_lock():
             pass
         elif self._acquire_job_lock():
             self._grab_job()
+        elif self._wait_for_job_slot():
+            # Going back to sleep would only get us another NOOP while the server has jobs queued up for us
+            pass
         else:
             self._sleep()
 
@@ -121,9 +133,10 @@ class GearmanWorkerCommandHandler(GearmanCommandHandler):
         return True
 
     def recv_job_assign_uniq(self, job_handle, task, unique, data):
-        """Transition from being AWAITING_JOB --> EXECUTE_JOB --> SLEEP
+        """Transition from being AWAITING_JOB --> EXECUTE_JOB --> SLEEP / AWAITING_JOB
 
-        AWAITING_JOB -> EXECUTE_JOB -> SLEEP :: Always transition once we're given a job
+        AWAITING_JOB -> EXECUTE_JOB -> SLEEP        :: Always transition once we're given a job
+        AWAITING_JOB -> EXECUTE_JOB -> AWAITING_JOB :: Transition if we're pipelining grabs and can acquire the worker job lock
         """
         assert task in self._handler_abilities, '%s not found in %r' % (task, self._handler_abilities)
 
@@ -138,7 +151,12 @@ class GearmanWorkerCommandHandler(GearmanCommandHandler):
 
         # Release the job lock once we're doing and go back to sleep
         self._release_job_lock()
-        self._sleep()
+        if self._pipeline_grab_job:
+            # Our last grab got us a job, chances are there's more where that came from.  Ask right away,
+            # our GRAB_JOB_UNIQ goes out in the same write as our job's result
+            self.recv_noop()
+        else:
+            self._sleep()
 
         return True
 
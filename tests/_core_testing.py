@@ -1,4 +1,6 @@
+import asyncio
 import collections
+import itertools
 import random
 import unittest
 
@@ -10,6 +12,7 @@ from gearman.connection_manager import GearmanConnectionManager, NoopEncoder
 from gearman.constants import PRIORITY_NONE, PRIORITY_HIGH, PRIORITY_LOW, DEFAULT_GEARMAN_PORT, JOB_UNKNOWN, JOB_CREATED
 from gearman.errors import ConnectionError
 from gearman.job import GearmanJob, GearmanJobRequest
+from gearman import protocol
 from gearman.protocol import get_command_name
 
 class MockGearmanConnection(GearmanConnection):
@@ -37,11 +40,148 @@ class MockGearmanConnection(GearmanConnection):
         return ('<GearmanConnection %s:%d connected=%s> (%s)' %
             (self.gearman_host, self.gearman_port, self.connected, id(self)))
 
+class MockGearmanPoller(gearman.util.GearmanPoller):
+    """Poller that only keeps track of connections, our mock connections have no sockets to poll"""
+    def __init__(self):
+        self.connection_to_fd = {}
+        self.connection_to_events = {}
+
+    def register(self, current_connection, writable=False):
+        self.connection_to_fd[current_connection] = None
+        self.connection_to_events[current_connection] = self._events_for(writable)
+
+    def modify(self, current_connection, writable):
+        if current_connection in self.connection_to_events:
+            self.connection_to_events[current_connection] = self._events_for(writable)
+
+    def unregister(self, current_connection):
+        self.connection_to_fd.pop(current_connection, None)
+        self.connection_to_events.pop(current_connection, None)
+
+    def poll(self, timeout=None):
+        return [], []
+
+    def enable_wakeup(self):
+        pass
+
+    def wakeup(self):
+        pass
+
+    def close(self):
+        self.connection_to_fd.clear()
+        self.connection_to_events.clear()
+
 class MockGearmanConnectionManager(GearmanConnectionManager):
     """Handy mock client base to test Worker/Client/Abstract ClientBases"""
+    poller_class = MockGearmanPoller
+
     def poll_connections_once(self, connections, timeout=None):
         return set(), set(), set()
 
+class MockGearmanServerProtocol(asyncio.Protocol):
+    def __init__(self, gearman_server):
+        self.gearman_server = gearman_server
+        self.transport = None
+        self.incoming_buffer = b''
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.gearman_server.connections.add(self)
+
+    def data_received(self, data):
+        self.incoming_buffer += data
+        while True:
+            cmd_type, cmd_args, cmd_len = protocol.parse_binary_command(self.incoming_buffer, is_response=False)
+            if not cmd_len:
+                break
+
+            self.incoming_buffer = self.incoming_buffer[cmd_len:]
+            self.gearman_server.handle_command(self, cmd_type, cmd_args)
+
+    def connection_lost(self, exc):
+        self.gearman_server.connections.discard(self)
+        self.gearman_server.sleeping_workers.discard(self)
+
+    def send_command(self, cmd_type, **cmd_args):
+        self.transport.write(protocol.pack_binary_command(cmd_type, cmd_args, is_response=True))
+
+class MockGearmanServer(object):
+    """In-process asyncio gearmand, queues submitted jobs and relays WORK_* updates back to clients
+
+    Tests can play the worker themselves by pulling handles off of submitted_jobs and calling send_to_client
+    """
+    def __init__(self):
+        self.server = None
+        self.port = None
+
+        self.connections = set()
+        self.sleeping_workers = set()
+        self.handle_counter = itertools.count(1)
+
+        # Foreground job handles -> the client waiting on them
+        self.handle_to_client = {}
+        self.handle_to_job = {}
+        self.job_queue = collections.deque()
+
+        self.submitted_jobs = asyncio.Queue()
+
+    async def start(self):
+        event_loop = asyncio.get_running_loop()
+        self.server = await event_loop.create_server(lambda: MockGearmanServerProtocol(self), '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for server_connection in list(self.connections):
+            server_connection.transport.close()
+
+        self.server.close()
+        await self.server.wait_closed()
+
+    def send_to_client(self, cmd_type, **cmd_args):
+        job_handle = cmd_args['job_handle']
+        client_connection = self.handle_to_client.get(job_handle)
+        if client_connection is None:
+            return
+
+        if cmd_type in (protocol.GEARMAN_COMMAND_WORK_COMPLETE, protocol.GEARMAN_COMMAND_WORK_FAIL):
+            self.handle_to_client.pop(job_handle, None)
+
+        client_connection.send_command(cmd_type, **cmd_args)
+
+    def handle_command(self, server_connection, cmd_type, cmd_args):
+        if cmd_type in protocol.GEARMAN_COMMAND_TO_NAME and get_command_name(cmd_type).startswith('GEARMAN_COMMAND_SUBMIT_JOB'):
+            job_handle = b'H:mock:%d' % next(self.handle_counter)
+            server_connection.send_command(protocol.GEARMAN_COMMAND_JOB_CREATED, job_handle=job_handle)
+
+            if not get_command_name(cmd_type).endswith('_BG'):
+                self.handle_to_client[job_handle] = server_connection
+
+            self.handle_to_job[job_handle] = cmd_args
+            self.job_queue.append(job_handle)
+            self.submitted_jobs.put_nowait(job_handle)
+
+            for sleeping_worker in self.sleeping_workers:
+                sleeping_worker.send_command(protocol.GEARMAN_COMMAND_NOOP)
+
+            self.sleeping_workers.clear()
+        elif cmd_type == protocol.GEARMAN_COMMAND_PRE_SLEEP:
+            if self.job_queue:
+                server_connection.send_command(protocol.GEARMAN_COMMAND_NOOP)
+            else:
+                self.sleeping_workers.add(server_connection)
+        elif cmd_type in (protocol.GEARMAN_COMMAND_GRAB_JOB, protocol.GEARMAN_COMMAND_GRAB_JOB_UNIQ):
+            if not self.job_queue:
+                server_connection.send_command(protocol.GEARMAN_COMMAND_NO_JOB)
+                return
+
+            job_handle = self.job_queue.popleft()
+            job_args = self.handle_to_job.pop(job_handle)
+            server_connection.send_command(protocol.GEARMAN_COMMAND_JOB_ASSIGN_UNIQ, job_handle=job_handle, task=job_args['task'], unique=job_args['unique'], data=job_args['data'])
+        elif cmd_type in protocol.GEARMAN_COMMAND_TO_NAME and get_command_name(cmd_type).startswith('GEARMAN_COMMAND_WORK_'):
+            self.send_to_client(cmd_type, **cmd_args)
+        elif cmd_type == protocol.GEARMAN_COMMAND_ECHO_REQ:
+            server_connection.send_command(protocol.GEARMAN_COMMAND_ECHO_RES, data=cmd_args['data'])
+
 class _GearmanAbstractTest(unittest.TestCase):
     connection_class = MockGearmanConnection
     connection_manager_class = MockGearmanConnectionManager
@@ -0,0 +1,132 @@
+import asyncio
+import unittest
+
+from gearman.async_client import AsyncGearmanClient
+from gearman.constants import JOB_UNKNOWN, JOB_CREATED, JOB_FAILED, JOB_COMPLETE
+from gearman.errors import ServerUnavailable
+from gearman.protocol import GEARMAN_COMMAND_WORK_COMPLETE, GEARMAN_COMMAND_WORK_DATA, GEARMAN_COMMAND_WORK_FAIL, GEARMAN_COMMAND_WORK_STATUS
+
+from tests._core_testing import MockGearmanServer
+
+class AsyncClientTest(unittest.IsolatedAsyncioTestCase):
+    """Test the asyncio client against an in-process server, playing the part of the worker ourselves"""
+    async def asyncSetUp(self):
+        self.gearman_server = MockGearmanServer()
+        await self.gearman_server.start()
+
+        self.client = AsyncGearmanClient(['127.0.0.1:%d' % self.gearman_server.port])
+
+    async def asyncTearDown(self):
+        self.client.shutdown()
+        await self.gearman_server.stop()
+
+    async def next_submitted_job(self):
+        return await asyncio.wait_for(self.gearman_server.submitted_jobs.get(), 5.0)
+
+    async def test_submit_job(self):
+        current_request = self.client.submit_job(b'reverse', b'hello')
+
+        job_handle = await self.next_submitted_job()
+        self.gearman_server.send_to_client(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=job_handle, data=b'olleh')
+
+        completed_request = await asyncio.wait_for(current_request, 5.0)
+        self.assertTrue(completed_request is current_request)
+        self.assertEqual(current_request.state, JOB_COMPLETE)
+        self.assertEqual(current_request.result, b'olleh')
+        self.assertEqual(current_request.job.handle, job_handle)
+
+    async def test_submit_job_fail(self):
+        current_request = self.client.submit_job(b'reverse', b'hello')
+
+        job_handle = await self.next_submitted_job()
+        self.gearman_server.send_to_client(GEARMAN_COMMAND_WORK_FAIL, job_handle=job_handle)
+
+        await asyncio.wait_for(current_request, 5.0)
+        self.assertEqual(current_request.state, JOB_FAILED)
+        self.assertEqual(current_request.result, None)
+
+    async def test_submit_background_job(self):
+        current_request = self.client.submit_job(b'reverse', b'hello', background=True)
+
+        await asyncio.wait_for(current_request, 5.0)
+        self.assertEqual(current_request.state, JOB_CREATED)
+        self.assertTrue(current_request.complete)
+
+    async def test_data_and_status_updates(self):
+        current_request = self.client.submit_job(b'reverse', b'hello')
+
+        async def collect(update_iterator):
+            return [current_update async for current_update in update_iterator]
+
+        data_collector = asyncio.ensure_future(collect(current_request.iter_data_updates()))
+        status_collector = asyncio.ensure_future(collect(current_request.iter_status_updates()))
+
+        job_handle = await self.next_submitted_job()
+        expected_data_updates = [b'o', b'll', b'eh']
+        for update_index, current_data in enumerate(expected_data_updates):
+            self.gearman_server.send_to_client(GEARMAN_COMMAND_WORK_DATA, job_handle=job_handle, data=current_data)
+            self.gearman_server.send_to_client(GEARMAN_COMMAND_WORK_STATUS, job_handle=job_handle, numerator=b'%d' % (update_index + 1), denominator=b'3')
+
+            # Give our iterators a chance to see each update on its own
+            await asyncio.sleep(0.05)
+
+        self.gearman_server.send_to_client(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=job_handle, data=b'')
+
+        self.assertEqual(await asyncio.wait_for(data_collector, 5.0), expected_data_updates)
+
+        status_updates = await asyncio.wait_for(status_collector, 5.0)
+        self.assertEqual([(current_status['numerator'], current_status['denominator']) for current_status in status_updates], [(1, 3), (2, 3), (3, 3)])
+        self.assertEqual(current_request.state, JOB_COMPLETE)
+
+    async def test_many_concurrent_jobs(self):
+        job_count = 1000
+        submitted_requests = self.client.submit_multiple_jobs([dict(task=b'reverse', data=b'%d' % job_number) for job_number in range(job_count)])
+
+        for _ in range(job_count):
+            job_handle = await self.next_submitted_job()
+            job_data = self.gearman_server.handle_to_job[job_handle]['data']
+            self.gearman_server.send_to_client(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=job_handle, data=job_data[::-1])
+
+        completed_requests = await asyncio.wait_for(asyncio.gather(*submitted_requests), 10.0)
+        self.assertEqual([current_request.result for current_request in completed_requests], [(b'%d' % job_number)[::-1] for job_number in range(job_count)])
+
+        # Every request shared a single connection
+        self.assertEqual(len(self.client.connection_to_handler_map), 1)
+
+    async def test_connection_lost(self):
+        current_request = self.client.submit_job(b'reverse', b'hello')
+        await self.next_submitted_job()
+
+        # Our job was accepted, we should not retry it when we lose our connection
+        for server_connection in list(self.gearman_server.connections):
+            server_connection.transport.close()
+
+        await asyncio.wait_for(current_request, 5.0)
+        self.assertEqual(current_request.state, JOB_UNKNOWN)
+        self.assertFalse(current_request.complete)
+
+    async def test_server_unavailable(self):
+        await self.gearman_server.stop()
+
+        current_request = self.client.submit_job(b'reverse', b'hello')
+        with self.assertRaises(ServerUnavailable):
+            await asyncio.wait_for(current_request, 5.0)
+
+    async def test_connect_failure(self):
+        async def fail_to_connect(current_connection):
+            raise OSError('no route to host')
+
+        self.client.establish_connection = fail_to_connect
+
+        # We hold onto our connect task until it's done, its failure goes to our request
+        current_request = self.client.submit_job(b'reverse', b'hello')
+        self.assertEqual(len(self.client._connect_tasks), 1)
+
+        with self.assertRaises(OSError):
+            await asyncio.wait_for(current_request, 5.0)
+
+        await asyncio.sleep(0)
+        self.assertEqual(self.client._connect_tasks, set())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import asyncio
+import unittest
+
+from gearman.async_client import AsyncGearmanClient
+from gearman.async_worker import AsyncGearmanWorker
+from gearman.constants import JOB_FAILED, JOB_COMPLETE
+
+from tests._core_testing import MockGearmanServer
+
+class AsyncWorkerTest(unittest.IsolatedAsyncioTestCase):
+    """Test the asyncio worker against an in-process server, submitting jobs with an AsyncGearmanClient"""
+    max_concurrent_jobs = 4
+
+    async def asyncSetUp(self):
+        self.gearman_server = MockGearmanServer()
+        await self.gearman_server.start()
+
+        host_list = ['127.0.0.1:%d' % self.gearman_server.port]
+        self.client = AsyncGearmanClient(host_list)
+        self.worker = AsyncGearmanWorker(host_list, max_concurrent_jobs=self.max_concurrent_jobs)
+        self.work_task = None
+
+    async def asyncTearDown(self):
+        if self.work_task is not None:
+            self.worker.stop()
+            await asyncio.wait_for(self.work_task, 5.0)
+
+        self.client.shutdown()
+        await self.gearman_server.stop()
+
+    def start_working(self):
+        self.work_task = asyncio.ensure_future(self.worker.work())
+
+    async def test_coroutine_task(self):
+        async def reverse(gearman_worker, gearman_job):
+            await asyncio.sleep(0)
+            return gearman_job.data[::-1]
+
+        self.worker.register_task(b'reverse', reverse)
+        self.start_working()
+
+        submitted_requests = self.client.submit_multiple_jobs([dict(task=b'reverse', data=b'job %d' % job_number) for job_number in range(10)])
+        completed_requests = await asyncio.wait_for(asyncio.gather(*submitted_requests), 5.0)
+
+        self.assertEqual([current_request.state for current_request in completed_requests], [JOB_COMPLETE] * 10)
+        self.assertEqual([current_request.result for current_request in completed_requests], [(b'job %d' % job_number)[::-1] for job_number in range(10)])
+
+    async def test_plain_function_task(self):
+        self.worker.register_task(b'reverse', lambda gearman_worker, gearman_job: gearman_job.data[::-1])
+        self.start_working()
+
+        current_request = await asyncio.wait_for(self.client.submit_job(b'reverse', b'hello'), 5.0)
+        self.assertEqual(current_request.result, b'olleh')
+
+    async def test_generator_task(self):
+        async def stream_words(gearman_worker, gearman_job):
+            for current_word in gearman_job.data.split(b' '):
+                await asyncio.sleep(0)
+                yield current_word
+
+        def stream_letters(gearman_worker, gearman_job):
+            yield from (gearman_job.data[letter_index:letter_index + 1] for letter_index in range(len(gearman_job.data)))
+            return b'done'
+
+        self.worker.register_task(b'words', stream_words)
+        self.worker.register_task(b'letters', stream_letters)
+        self.start_working()
+
+        words_request = self.client.submit_job(b'words', b'hello there world')
+        received_words = [current_word async for current_word in words_request.iter_data_updates()]
+        self.assertEqual(received_words, [b'hello', b'there', b'world'])
+        self.assertEqual((await asyncio.wait_for(words_request, 5.0)).result, b'')
+
+        letters_request = await asyncio.wait_for(self.client.submit_job(b'letters', b'abc'), 5.0)
+        self.assertEqual(list(letters_request.data_updates), [b'a', b'b', b'c'])
+        self.assertEqual(letters_request.result, b'done')
+
+    async def test_task_exception(self):
+        async def explode(gearman_worker, gearman_job):
+            raise ValueError('explode')
+
+        self.worker.register_task(b'explode', explode)
+        self.start_working()
+
+        current_request = await asyncio.wait_for(self.client.submit_job(b'explode', b'hello'), 5.0)
+        self.assertEqual(current_request.state, JOB_FAILED)
+
+    async def test_concurrent_jobs(self):
+        running_job_counts = []
+        release_jobs = asyncio.Event()
+
+        async def block(gearman_worker, gearman_job):
+            running_job_counts.append(len(gearman_worker.running_jobs))
+            await release_jobs.wait()
+            return gearman_job.data
+
+        self.worker.register_task(b'block', block)
+        self.start_working()
+
+        job_count = self.max_concurrent_jobs * 3
+        submitted_requests = self.client.submit_multiple_jobs([dict(task=b'block', data=b'%d' % job_number) for job_number in range(job_count)])
+
+        # We should fill up every slot we have, and no more
+        for _ in range(100):
+            if len(running_job_counts) >= self.max_concurrent_jobs:
+                break
+
+            await asyncio.sleep(0.01)
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(running_job_counts), self.max_concurrent_jobs)
+        self.assertEqual(len(self.worker.running_jobs), self.max_concurrent_jobs)
+
+        # Finishing jobs should free up slots for the rest of our jobs
+        release_jobs.set()
+        completed_requests = await asyncio.wait_for(asyncio.gather(*submitted_requests), 5.0)
+
+        self.assertEqual([current_request.result for current_request in completed_requests], [b'%d' % job_number for job_number in range(job_count)])
+        self.assertEqual(max(running_job_counts), self.max_concurrent_jobs)
+
+    async def test_stop_waits_for_running_jobs(self):
+        job_started = asyncio.Event()
+
+        async def slow(gearman_worker, gearman_job):
+            job_started.set()
+            await asyncio.sleep(0.1)
+            return gearman_job.data
+
+        self.worker.register_task(b'slow', slow)
+        self.start_working()
+
+        current_request = self.client.submit_job(b'slow', b'hello')
+        await asyncio.wait_for(job_started.wait(), 5.0)
+
+        self.worker.stop()
+        await asyncio.wait_for(self.work_task, 5.0)
+        self.work_task = None
+
+        await asyncio.wait_for(current_request, 5.0)
+        self.assertEqual(current_request.result, b'hello')
+
+    async def test_stop_waits_for_jobs_assigned_while_stopping(self):
+        async def slow(gearman_worker, gearman_job):
+            await asyncio.sleep(0.1)
+            return gearman_job.data
+
+        self.worker.register_task(b'slow', slow)
+        self.start_working()
+        await asyncio.sleep(0.1)
+
+        # Stop right as our handler grabs our job, the server assigns it to us while we're stopping
+        set_job_lock = self.worker.set_job_lock
+        def stop_on_grab(command_handler, lock):
+            locked = set_job_lock(command_handler, lock)
+            if lock and locked:
+                self.worker.stop()
+
+            return locked
+
+        self.worker.set_job_lock = stop_on_grab
+
+        current_request = self.client.submit_job(b'slow', b'hello')
+        await asyncio.wait_for(self.work_task, 5.0)
+        self.work_task = None
+
+        await asyncio.wait_for(current_request, 5.0)
+        self.assertEqual(current_request.result, b'hello')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+
+from gearman.circuit_breaker import CircuitBreaker
+from gearman.constants import CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+from gearman.errors import ConnectionError
+
+from tests._core_testing import MockGearmanConnection
+
+class CountingMockGearmanConnection(MockGearmanConnection):
+    def __init__(self, *largs, **kwargs):
+        super(CountingMockGearmanConnection, self).__init__(*largs, **kwargs)
+        self.connect_attempts = 0
+
+    def _create_client_socket(self):
+        self.connect_attempts += 1
+        super(CountingMockGearmanConnection, self)._create_client_socket()
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.circuit_breaker = CircuitBreaker()
+        self.circuit_breaker.backoff_jitter = 0.0
+
+    def fail_until_open(self, current_time=0.0):
+        for _ in range(self.circuit_breaker.minimum_attempts):
+            self.assertTrue(self.circuit_breaker.allow_attempt(current_time))
+            self.circuit_breaker.record_failure(current_time)
+
+        self.assertEqual(self.circuit_breaker.state, CIRCUIT_OPEN)
+
+    def test_failure_rate(self):
+        # Mostly successful connects keep our circuit closed
+        for _ in range(3):
+            self.circuit_breaker.record_success()
+            self.circuit_breaker.record_success()
+            self.circuit_breaker.record_failure(0.0)
+
+        self.assertEqual(self.circuit_breaker.state, CIRCUIT_CLOSED)
+
+        # Until half our window failed
+        self.circuit_breaker.record_failure(0.0)
+        self.circuit_breaker.record_failure(0.0)
+        self.assertEqual(self.circuit_breaker.state, CIRCUIT_OPEN)
+
+    def test_open_then_half_open(self):
+        self.fail_until_open()
+        self.assertFalse(self.circuit_breaker.allow_attempt(0.5))
+
+        # Our probe window opens after our backoff
+        self.assertTrue(self.circuit_breaker.allow_attempt(1.0))
+        self.assertEqual(self.circuit_breaker.state, CIRCUIT_HALF_OPEN)
+
+        self.circuit_breaker.record_success()
+        self.assertEqual(self.circuit_breaker.state, CIRCUIT_CLOSED)
+        self.assertTrue(self.circuit_breaker.allow_attempt(1.0))
+
+    def test_single_probe(self):
+        self.fail_until_open()
+
+        # Only our first caller past our backoff gets to probe
+        self.assertTrue(self.circuit_breaker.allow_attempt(1.0))
+        self.assertFalse(self.circuit_breaker.allow_attempt(1.0))
+        self.assertFalse(self.circuit_breaker.allow_attempt(1.5))
+        self.assertEqual(self.circuit_breaker.state, CIRCUIT_HALF_OPEN)
+
+        # A failed probe opens our circuit again, the next probe waits out our doubled backoff
+        self.circuit_breaker.record_failure(1.5)
+        self.assertFalse(self.circuit_breaker.allow_attempt(3.0))
+        self.assertTrue(self.circuit_breaker.allow_attempt(3.5))
+        self.assertFalse(self.circuit_breaker.allow_attempt(3.5))
+
+        # A successful probe lets everyone through
+        self.circuit_breaker.record_success()
+        self.assertTrue(self.circuit_breaker.allow_attempt(3.5))
+        self.assertTrue(self.circuit_breaker.allow_attempt(3.5))
+
+    def test_lost_probe(self):
+        self.fail_until_open()
+        self.assertTrue(self.circuit_breaker.allow_attempt(1.0))
+
+        # Our probe never reported back, we eventually send another one
+        probe_deadline = 1.0 + self.circuit_breaker.probe_timeout_seconds
+        self.assertFalse(self.circuit_breaker.allow_attempt(probe_deadline - 0.5))
+        self.assertTrue(self.circuit_breaker.allow_attempt(probe_deadline))
+        self.assertFalse(self.circuit_breaker.allow_attempt(probe_deadline))
+
+    def test_exponential_backoff(self):
+        self.fail_until_open()
+
+        probe_time = 0.0
+        for expected_backoff in (1.0, 2.0, 4.0, 8.0):
+            self.assertEqual(self.circuit_breaker.retry_time, probe_time + expected_backoff)
+
+            # Every failed probe doubles our backoff
+            probe_time = self.circuit_breaker.retry_time
+            self.assertTrue(self.circuit_breaker.allow_attempt(probe_time))
+            self.circuit_breaker.record_failure(probe_time)
+
+        self.circuit_breaker.open_count = 100
+        self.assertEqual(self.circuit_breaker.get_backoff(), self.circuit_breaker.max_backoff_seconds)
+
+    def test_jitter(self):
+        retry_times = set()
+        for _ in range(20):
+            self.circuit_breaker = CircuitBreaker()
+            self.fail_until_open()
+            self.assertTrue(0.5 <= self.circuit_breaker.retry_time <= 1.0)
+            retry_times.add(self.circuit_breaker.retry_time)
+
+        self.assertTrue(len(retry_times) > 1)
+
+class ConnectionCircuitBreakerTest(unittest.TestCase):
+    def test_skip_dead_server(self):
+        dead_connection = CountingMockGearmanConnection()
+        dead_connection._fail_on_bind = True
+
+        for _ in range(10):
+            self.assertRaises(ConnectionError, dead_connection.connect)
+
+        # Once our circuit opens we stop trying to connect at all
+        self.assertEqual(dead_connection.connect_attempts, dead_connection.circuit_breaker.minimum_attempts)
+        self.assertEqual(dead_connection.circuit_breaker.state, CIRCUIT_OPEN)
+
+        # Our probe gets through once our backoff ran out
+        dead_connection._fail_on_bind = False
+        dead_connection.circuit_breaker.retry_time = 0.0
+        dead_connection.connect()
+
+        self.assertTrue(dead_connection.connected)
+        self.assertEqual(dead_connection.circuit_breaker.state, CIRCUIT_CLOSED)
+
+if __name__ == '__main__':
+    unittest.main()
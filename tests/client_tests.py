@@ -1,13 +1,16 @@
 import collections
+import concurrent.futures
+import json
 import random
 import unittest
 
 from gearman.client import GearmanClient
 from gearman.client_handler import GearmanClientCommandHandler
+from gearman.connection_manager import DataEncoder
 
 from gearman.constants import PRIORITY_NONE, PRIORITY_HIGH, PRIORITY_LOW, JOB_UNKNOWN, JOB_PENDING, JOB_CREATED, JOB_FAILED, JOB_COMPLETE
 from gearman.errors import ExceededConnectionAttempts, ServerUnavailable, InvalidClientState
-from gearman.protocol import submit_cmd_for_background_priority, GEARMAN_COMMAND_STATUS_RES, GEARMAN_COMMAND_GET_STATUS, GEARMAN_COMMAND_JOB_CREATED, \
+from gearman.protocol import pack_binary_command, submit_cmd_for_background_priority, GEARMAN_COMMAND_STATUS_RES, GEARMAN_COMMAND_GET_STATUS, GEARMAN_COMMAND_JOB_CREATED, \
     GEARMAN_COMMAND_WORK_STATUS, GEARMAN_COMMAND_WORK_FAIL, GEARMAN_COMMAND_WORK_COMPLETE, GEARMAN_COMMAND_WORK_DATA, GEARMAN_COMMAND_WORK_WARNING
 
 from tests._core_testing import _GearmanAbstractTest, MockGearmanConnectionManager, MockGearmanConnection
@@ -15,6 +18,15 @@ from tests._core_testing import _GearmanAbstractTest, MockGearmanConnectionManag
 class MockGearmanClient(GearmanClient, MockGearmanConnectionManager):
     pass
 
+class JSONDataEncoder(DataEncoder):
+    @classmethod
+    def encode(cls, encodable_object):
+        return json.dumps(encodable_object).encode('utf-8')
+
+    @classmethod
+    def decode(cls, decodable_string):
+        return json.loads(decodable_string)
+
 class ClientTest(_GearmanAbstractTest):
     """Test the public client interface"""
     connection_manager_class = MockGearmanClient
@@ -101,6 +113,39 @@ class ClientTest(_GearmanAbstractTest):
         # All failed connections == death
         self.assertRaises(ServerUnavailable, self.connection_manager.establish_request_connection, current_request)
 
+    def test_interleaved_reads_on_multiple_connections(self):
+        # Regression test: a large partial command on one connection must not hold up small commands on another
+        large_request = self.generate_job_request()
+
+        other_connection = MockGearmanConnection()
+        self.connection_manager.connection_list.append(other_connection)
+        self.connection_manager.establish_connection(other_connection)
+        other_handler = self.connection_manager.connection_to_handler_map[other_connection]
+
+        small_request = super(ClientTest, self).generate_job_request()
+        small_request.job.connection = other_connection
+        other_handler.send_job_request(small_request)
+
+        large_result = b'x' * 100000
+        large_command = pack_binary_command(GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=large_request.job.handle, data=large_result), is_response=True)
+        small_command = pack_binary_command(GEARMAN_COMMAND_JOB_CREATED, dict(job_handle=small_request.job.handle), is_response=True)
+
+        # First chunk of our large command shows up
+        self.connection._add_incoming_data(large_command[:4096])
+        self.connection_manager.handle_read(self.connection)
+        self.assertEqual(large_request.state, JOB_CREATED)
+
+        # Our small command should be handled right away
+        other_connection._add_incoming_data(small_command)
+        self.connection_manager.handle_read(other_connection)
+        self.assertEqual(small_request.state, JOB_CREATED)
+
+        # Then the rest of our large command trickles in
+        self.connection._add_incoming_data(large_command[4096:])
+        self.connection_manager.handle_read(self.connection)
+        self.assertEqual(large_request.state, JOB_COMPLETE)
+        self.assertEqual(large_request.result, large_result)
+
     def test_auto_retry_behavior(self):
         current_request = self.generate_job_request(submitted=False, accepted=False)
 
@@ -221,6 +266,7 @@ class ClientTest(_GearmanAbstractTest):
 
         finished_requests = self.connection_manager.wait_until_jobs_completed([completed_request, failed_request, timeout_request], poll_timeout=0.01)
         del self.update_requests
+        self.assertEqual(self.connection_manager._request_trackers, [])
 
         finished_completed_request, finished_failed_request, finished_timeout_request = finished_requests
 
@@ -241,6 +287,211 @@ class ClientTest(_GearmanAbstractTest):
         self.assertTrue(finished_timeout_request.timed_out)
         self.assert_(finished_timeout_request.job.handle in self.command_handler.handle_to_request_map)
 
+    def test_request_tracking(self):
+        job_requests = [self.generate_job_request() for _ in range(3)]
+        other_request = self.generate_job_request()
+
+        running_tracker = self.connection_manager._track_requests(job_requests, lambda current_request: not current_request.complete)
+        self.assertEqual(len(running_tracker), 3)
+
+        # Our command handlers keep our tracker up to date, requests we don't track are ignored
+        self.command_handler.recv_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=job_requests[1].job.handle, data=b'done')
+        self.command_handler.recv_command(GEARMAN_COMMAND_WORK_FAIL, job_handle=other_request.job.handle)
+        self.assertEqual(list(running_tracker.tracked_requests), [job_requests[0], job_requests[2]])
+
+        self.connection_manager.handle_error(self.connection)
+        self.assertEqual(list(running_tracker.tracked_requests), [job_requests[0], job_requests[2]])
+
+        self.connection_manager._untrack_requests(running_tracker)
+        self.assertEqual(self.connection_manager._request_trackers, [])
+
+    def setup_windowed_server(self, max_in_flight, result_data=None):
+        """Every time we poll, accept every job we were sent and complete the oldest one, echoing its handle unless result_data is given"""
+        self.observed_in_flight = []
+        self.job_number = 0
+        self.created_handles = collections.deque()
+
+        def accept_and_complete_job(rx_conns, wr_conns, ex_conns):
+            in_flight_count = len(self.command_handler.requests_awaiting_handles) + len(self.command_handler.handle_to_request_map)
+            self.assertTrue(in_flight_count <= max_in_flight)
+            self.observed_in_flight.append(in_flight_count)
+
+            for _ in range(len(self.command_handler.requests_awaiting_handles)):
+                self.job_number += 1
+                self.created_handles.append(b'H:localhost:%d' % self.job_number)
+                self.command_handler.recv_command(GEARMAN_COMMAND_JOB_CREATED, job_handle=self.created_handles[-1])
+
+            if self.created_handles:
+                current_handle = self.created_handles.popleft()
+                self.command_handler.recv_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=current_handle, data=current_handle if result_data is None else result_data)
+
+            return rx_conns, wr_conns, ex_conns
+
+        self.connection_manager.handle_connection_activity = accept_and_complete_job
+
+    def test_submit_multiple_jobs_in_flight(self):
+        self.setup_windowed_server(max_in_flight=2)
+
+        jobs_to_submit = [dict(task=b'task', data=b'job %d' % job_number) for job_number in range(5)]
+        job_requests = self.connection_manager.submit_multiple_jobs(jobs_to_submit, max_in_flight=2)
+
+        # Every completion freed up a spot for our next job
+        self.assertEqual(self.observed_in_flight, [2, 2, 2, 2, 1])
+        self.assertEqual([current_request.state for current_request in job_requests], [JOB_COMPLETE] * 5)
+        self.assertEqual([current_request.result for current_request in job_requests], [b'H:localhost:%d' % job_number for job_number in range(1, 6)])
+        self.assertFalse(any(current_request.timed_out for current_request in job_requests))
+        self.assertEqual(self.connection_manager._request_trackers, [])
+
+    def test_submit_multiple_jobs_bytes_in_flight(self):
+        self.setup_windowed_server(max_in_flight=2)
+
+        # A job that doesn't fit in our window on its own still goes out once our window is empty
+        jobs_to_submit = [dict(task=b'task', data=b'x' * job_size) for job_size in (10, 10, 10, 100, 10)]
+        job_requests = self.connection_manager.submit_multiple_jobs(jobs_to_submit, max_bytes_in_flight=25)
+
+        self.assertEqual(self.observed_in_flight, [2, 2, 1, 1, 1])
+        self.assertEqual([current_request.state for current_request in job_requests], [JOB_COMPLETE] * 5)
+
+    def test_submit_multiple_jobs_encoded_in_flight(self):
+        self.connection_manager.data_encoder = JSONDataEncoder
+        self.setup_windowed_server(max_in_flight=2, result_data=b'"done"')
+
+        # Data without a len() of its own, we only ever size it once it's encoded
+        jobs_to_submit = [dict(task=b'task', data=job_data) for job_data in (5, dict(key='x' * 10), 7)]
+        job_requests = self.connection_manager.submit_multiple_jobs(jobs_to_submit, max_in_flight=2)
+        self.assertEqual([current_request.result for current_request in job_requests], ['done'] * 3)
+
+        # {"key": "xxxxxxxxxx"} encodes to 21 bytes, too big to share our window with anything
+        self.setup_windowed_server(max_in_flight=2, result_data=b'"done"')
+        finished_requests = list(self.connection_manager.submit_iter(jobs_to_submit, max_bytes_in_flight=21))
+        self.assertEqual(self.observed_in_flight, [1, 1, 1])
+        self.assertEqual([current_request.result for current_request in finished_requests], ['done'] * 3)
+
+    def test_submit_multiple_jobs_in_flight_timeout(self):
+        def accept_nothing(rx_conns, wr_conns, ex_conns):
+            return rx_conns, wr_conns, ex_conns
+
+        self.connection_manager.handle_connection_activity = accept_nothing
+
+        jobs_to_submit = [dict(task=b'task', data=b'job %d' % job_number) for job_number in range(4)]
+        job_requests = self.connection_manager.submit_multiple_jobs(jobs_to_submit, max_in_flight=2, poll_timeout=0.01)
+
+        # Jobs we never got around to are left alone
+        self.assertEqual([current_request.state for current_request in job_requests], [JOB_PENDING, JOB_PENDING, JOB_UNKNOWN, JOB_UNKNOWN])
+        self.assertTrue(all(current_request.timed_out for current_request in job_requests))
+
+    def test_submit_iter(self):
+        self.setup_windowed_server(max_in_flight=3)
+
+        self.pulled_jobs = 0
+        def generate_jobs():
+            for job_number in range(10):
+                self.pulled_jobs += 1
+                yield dict(task=b'task', data=b'job %d' % job_number)
+
+        finished_requests = []
+        for current_request in self.connection_manager.submit_iter(generate_jobs(), max_in_flight=3):
+            # We only pull a job once it has a spot in our window (or is about to)
+            self.assertTrue(self.pulled_jobs <= len(finished_requests) + 4)
+            finished_requests.append(current_request)
+
+        self.assertEqual(self.pulled_jobs, 10)
+        self.assertEqual([current_request.result for current_request in finished_requests], [b'H:localhost:%d' % job_number for job_number in range(1, 11)])
+        self.assertEqual(self.connection_manager._request_trackers, [])
+
+    def test_submit_job_async(self):
+        job_futures = [self.connection_manager.submit_job_async(b'task', b'job %d' % job_number) for job_number in range(3)]
+        job_requests = [job_future.job_request for job_future in job_futures]
+        self.assertEqual([current_request.state for current_request in job_requests], [JOB_PENDING] * 3)
+
+        # Jobs finish out of order and our last one never does, hand over a single update every time we poll
+        job_handles = [b'H:localhost:%d' % job_number for job_number in range(3)]
+        server_updates = collections.deque([(GEARMAN_COMMAND_JOB_CREATED, dict(job_handle=current_handle)) for current_handle in job_handles])
+        server_updates.append((GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=job_handles[1], data=b'second')))
+        server_updates.append((GEARMAN_COMMAND_WORK_FAIL, dict(job_handle=job_handles[0])))
+
+        def stream_updates(rx_conns, wr_conns, ex_conns):
+            if server_updates:
+                cmd_type, cmd_args = server_updates.popleft()
+                self.command_handler.recv_command(cmd_type, **cmd_args)
+
+            return rx_conns, wr_conns, ex_conns
+
+        self.connection_manager.handle_connection_activity = stream_updates
+
+        completed_requests = []
+        for current_request in self.connection_manager.as_completed(job_requests, timeout=0.05):
+            completed_requests.append((current_request, len(server_updates)))
+
+        self.assertEqual(completed_requests, [(job_requests[1], 1), (job_requests[0], 0)])
+        self.assertEqual(job_futures[1].result(), job_requests[1])
+        self.assertEqual(job_requests[1].state, JOB_COMPLETE)
+        self.assertEqual(job_requests[1].result, b'second')
+        self.assertEqual(job_futures[0].result().state, JOB_FAILED)
+
+        # Our tail job holds up nobody, it just times out
+        self.assertFalse(job_futures[2].done())
+        self.assertTrue(job_requests[2].timed_out)
+        self.assertRaises(concurrent.futures.TimeoutError, job_futures[2].result, timeout=0.01)
+        self.assertFalse(job_futures[2].cancel())
+
+    def test_submit_job_async_connection_failure(self):
+        job_future = self.connection_manager.submit_job_async(b'task', b'data', max_retries=0)
+
+        def fail_connection(rx_conns, wr_conns, ex_conns):
+            self.connection_manager.handle_error(self.connection)
+            self.connection_manager.establish_connection(self.connection)
+            return rx_conns, wr_conns, ex_conns
+
+        self.connection_manager.handle_connection_activity = fail_connection
+
+        # We're out of retries, our future gets the error instead of as_completed raising it
+        self.assertTrue(isinstance(job_future.exception(timeout=1.0), ExceededConnectionAttempts))
+        self.assertEqual(job_future.job_request.state, JOB_UNKNOWN)
+        self.assertFalse(job_future.job_request.timed_out)
+
+    def test_stream_job_data(self):
+        streaming_request = self.generate_job_request()
+        server_updates = collections.deque([
+            (GEARMAN_COMMAND_WORK_DATA, dict(job_handle=streaming_request.job.handle, data=b'first')),
+            (GEARMAN_COMMAND_WORK_DATA, dict(job_handle=streaming_request.job.handle, data=b'second')),
+            (GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=streaming_request.job.handle, data=b'done')),
+        ])
+
+        # Hand over a single update every time we poll
+        def stream_updates(rx_conns, wr_conns, ex_conns):
+            cmd_type, cmd_args = server_updates.popleft()
+            self.command_handler.recv_command(cmd_type, **cmd_args)
+            return rx_conns, wr_conns, ex_conns
+
+        self.connection_manager.handle_connection_activity = stream_updates
+
+        # We only read our next update once our caller got to the one before it
+        received_data = []
+        for current_data in self.connection_manager.stream_job_data(streaming_request):
+            self.assertEqual(len(streaming_request.data_updates), 0)
+            received_data.append((current_data, len(server_updates)))
+
+        self.assertEqual(received_data, [(b'first', 2), (b'second', 1)])
+        self.assertEqual(streaming_request.state, JOB_COMPLETE)
+        self.assertEqual(streaming_request.result, b'done')
+        self.assertFalse(streaming_request.timed_out)
+
+    def test_stream_job_data_timeout(self):
+        streaming_request = self.generate_job_request()
+
+        def stream_single_update(rx_conns, wr_conns, ex_conns):
+            if not streaming_request.data_updates:
+                self.command_handler.recv_command(GEARMAN_COMMAND_WORK_DATA, job_handle=streaming_request.job.handle, data=b'first')
+            return rx_conns, wr_conns, ex_conns
+
+        self.connection_manager.handle_connection_activity = stream_single_update
+
+        received_data = list(self.connection_manager.stream_job_data(streaming_request, poll_timeout=0.01))
+        self.assertTrue(received_data)
+        self.assertEqual(set(received_data), set([b'first']))
+        self.assertTrue(streaming_request.timed_out)
+
     def test_get_job_status(self):
         single_request = self.generate_job_request()
 
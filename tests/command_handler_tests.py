@@ -0,0 +1,58 @@
+import unittest
+
+from gearman.command_handler import GearmanCommandHandler
+from gearman.errors import UnknownCommandError
+from gearman.protocol import GEARMAN_COMMAND_NOOP, GEARMAN_COMMAND_JOB_CREATED, GEARMAN_COMMAND_ERROR
+
+class NoopCommandHandler(GearmanCommandHandler):
+    def __init__(self, *largs, **kwargs):
+        super(NoopCommandHandler, self).__init__(*largs, **kwargs)
+        self.received_noops = 0
+
+    def recv_noop(self):
+        self.received_noops += 1
+        return True
+
+class CommandDispatchTest(unittest.TestCase):
+    def test_subclass_callback(self):
+        command_handler = NoopCommandHandler()
+        self.assertTrue(command_handler.recv_command(GEARMAN_COMMAND_NOOP))
+        self.assertEqual(command_handler.received_noops, 1)
+
+    def test_override_callback(self):
+        received_errors = []
+
+        class ErrorCommandHandler(NoopCommandHandler):
+            def recv_error(self, error_code, error_text):
+                received_errors.append((error_code, error_text))
+                return False
+
+        command_handler = ErrorCommandHandler()
+        self.assertFalse(command_handler.recv_command(GEARMAN_COMMAND_ERROR, error_code=b'1', error_text=b'oops'))
+        self.assertEqual(received_errors, [(b'1', b'oops')])
+
+        # Patches to our class reach handlers we create afterwards, instance overrides reach that instance
+        NoopCommandHandler.recv_job_created = lambda command_handler, job_handle: job_handle
+        try:
+            patched_handler = NoopCommandHandler()
+            self.assertEqual(patched_handler.recv_command(GEARMAN_COMMAND_JOB_CREATED, job_handle=b'H:1'), b'H:1')
+        finally:
+            del NoopCommandHandler.recv_job_created
+
+        class InstanceOverrideHandler(NoopCommandHandler):
+            def __init__(self):
+                self.recv_noop = lambda: 'overridden'
+                super(InstanceOverrideHandler, self).__init__()
+
+        self.assertEqual(InstanceOverrideHandler().recv_command(GEARMAN_COMMAND_NOOP), 'overridden')
+
+    def test_unknown_command(self):
+        command_handler = NoopCommandHandler()
+        self.assertRaises(ValueError, command_handler.recv_command, 4242)
+
+    def test_missing_callback(self):
+        command_handler = NoopCommandHandler()
+        self.assertRaises(UnknownCommandError, command_handler.recv_command, GEARMAN_COMMAND_JOB_CREATED, job_handle=b'H:1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,316 @@
+import os
+import select
+import socket
+import tempfile
+import time
+import unittest
+
+from gearman.client import GearmanClient
+from gearman.connection import GearmanConnection
+from gearman.connection_manager import GearmanConnectionManager
+from gearman.command_handler import GearmanCommandHandler
+from gearman.errors import ConnectionError
+from gearman.protocol import GEARMAN_COMMAND_ECHO_REQ, pack_binary_command
+from gearman.routing import GearmanRouter
+
+CONNECT_TIMEOUT = 0.3
+
+class FastTimeoutGearmanConnection(GearmanConnection):
+    connect_timeout = CONNECT_TIMEOUT
+
+class FastTimeoutConnectionManager(GearmanConnectionManager):
+    command_handler_class = GearmanCommandHandler
+    connection_class = FastTimeoutGearmanConnection
+
+class InOrderRouter(GearmanRouter):
+    def get_connection_order(self, current_request, connection_list):
+        return list(connection_list)
+
+class FastTimeoutGearmanClient(GearmanClient):
+    connection_class = FastTimeoutGearmanConnection
+    router_class = InOrderRouter
+
+def create_listener(backlog=128):
+    listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening_socket.bind(('127.0.0.1', 0))
+    listening_socket.listen(backlog)
+    return listening_socket
+
+class BlackholeTestCase(unittest.TestCase):
+    """Sets up a listener that never answers our connects"""
+    def setUp(self):
+        self.open_sockets = []
+
+        # Nobody ever accepts on our blackhole, once its accept queue is full the kernel drops our SYNs
+        self.blackhole = create_listener(backlog=0)
+        self.open_sockets.append(self.blackhole)
+        for _ in range(8):
+            filler_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler_socket.setblocking(0)
+            filler_socket.connect_ex(self.blackhole.getsockname())
+            self.open_sockets.append(filler_socket)
+
+        probe_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        probe_socket.setblocking(0)
+        probe_socket.connect_ex(self.blackhole.getsockname())
+        self.open_sockets.append(probe_socket)
+        if select.select([], [probe_socket], [], 0.1)[1]:
+            self.skipTest('could not fill our blackhole accept queue')
+
+        self.blackhole_port = self.blackhole.getsockname()[1]
+
+    def tearDown(self):
+        for open_socket in self.open_sockets:
+            open_socket.close()
+
+class NonBlockingConnectTest(BlackholeTestCase):
+    def test_connect_timeout(self):
+        current_connection = FastTimeoutGearmanConnection('127.0.0.1', self.blackhole_port)
+
+        start_time = time.time()
+        self.assertRaises(ConnectionError, current_connection.connect)
+        self.assertTrue(time.time() - start_time < CONNECT_TIMEOUT * 3)
+
+        self.assertFalse(current_connection.connected)
+        self.assertFalse(current_connection.connecting)
+        self.assertEqual(current_connection.gearman_socket, None)
+
+    def test_establish_connections(self):
+        live_listener = create_listener()
+        self.open_sockets.append(live_listener)
+        live_port = live_listener.getsockname()[1]
+
+        connection_manager = FastTimeoutConnectionManager(['127.0.0.1:%d' % self.blackhole_port] * 3 + ['127.0.0.1:%d' % live_port])
+
+        # Our blackholed connects time out together instead of one after another
+        start_time = time.time()
+        alive_connections = connection_manager.establish_connections()
+        self.assertTrue(time.time() - start_time < CONNECT_TIMEOUT * 2)
+
+        live_connection = connection_manager.connection_list[-1]
+        self.assertEqual(alive_connections, [live_connection])
+        self.assertTrue(live_connection in connection_manager.connection_to_handler_map)
+        self.assertTrue(live_connection in connection_manager.poller)
+
+        for dead_connection in connection_manager.connection_list[:-1]:
+            self.assertFalse(dead_connection.connected or dead_connection.connecting)
+            self.assertFalse(dead_connection in connection_manager.connection_to_handler_map)
+
+        connection_manager.shutdown()
+
+    def test_establish_connections_services_live_connections(self):
+        live_listener = create_listener()
+        self.open_sockets.append(live_listener)
+
+        connection_manager = FastTimeoutConnectionManager(['127.0.0.1:%d' % live_listener.getsockname()[1], '127.0.0.1:%d' % self.blackhole_port])
+        live_connection, blackholed_connection = connection_manager.connection_list
+        connection_manager.establish_connections([live_connection])
+
+        server_socket = live_listener.accept()[0]
+        self.open_sockets.append(server_socket)
+
+        # Queue up a command on our live connection, then wait on our blackholed connect
+        live_handler = connection_manager.connection_to_handler_map[live_connection]
+        connection_manager.send_command(live_handler, GEARMAN_COMMAND_ECHO_REQ, dict(data=b'ping'))
+        self.assertEqual(connection_manager.establish_connections([blackholed_connection]), [])
+
+        # Our live connection got its command out while we waited
+        self.assertTrue(select.select([server_socket], [], [], 0)[0])
+        self.assertFalse(blackholed_connection in connection_manager.poller)
+        connection_manager.shutdown()
+
+    def test_establish_request_connection(self):
+        live_listener = create_listener()
+        self.open_sockets.append(live_listener)
+
+        gearman_client = FastTimeoutGearmanClient(['127.0.0.1:%d' % self.blackhole_port, '127.0.0.1:%d' % live_listener.getsockname()[1]])
+        blackholed_connection, live_connection = gearman_client.connection_list
+        current_request = gearman_client._create_request_from_dictionary(dict(task=b'task', data=b'data'))
+
+        # Our live server answers first, we don't wait on our blackholed one
+        start_time = time.time()
+        self.assertEqual(gearman_client.establish_request_connection(current_request), live_connection)
+        self.assertTrue(time.time() - start_time < CONNECT_TIMEOUT)
+        self.assertEqual(list(gearman_client.request_to_rotating_connection_queue[current_request]), [live_connection, blackholed_connection])
+
+        # Our blackholed connect times out in the background
+        self.assertTrue(blackholed_connection.connecting)
+        gearman_client.handle_connection_activity(*gearman_client.poll_connections_once([live_connection], timeout=CONNECT_TIMEOUT * 2))
+        self.assertFalse(blackholed_connection.connecting or blackholed_connection.connected)
+        self.assertFalse(blackholed_connection in gearman_client.poller)
+        gearman_client.shutdown()
+
+class RefusedConnectTest(unittest.TestCase):
+    def test_connect_refused(self):
+        # Grab a port nobody listens on
+        unused_listener = create_listener()
+        unused_port = unused_listener.getsockname()[1]
+        unused_listener.close()
+
+        current_connection = FastTimeoutGearmanConnection('127.0.0.1', unused_port)
+        self.assertRaises(ConnectionError, current_connection.connect)
+        self.assertFalse(current_connection.connected)
+        self.assertEqual(list(current_connection.circuit_breaker._attempt_failures), [True])
+
+class FallbackGearmanConnection(FastTimeoutGearmanConnection):
+    """Connects to every address in socket_addresses in turn, as if our host resolved to them"""
+    def __init__(self, socket_addresses):
+        super(FallbackGearmanConnection, self).__init__('fallback.invalid')
+        self.socket_addresses = socket_addresses
+
+    def _get_socket_addresses(self):
+        return list(self.socket_addresses)
+
+class FallbackConnectTest(BlackholeTestCase):
+    def test_fallback_after_refused(self):
+        live_listener = create_listener()
+        self.open_sockets.append(live_listener)
+
+        unused_listener = create_listener()
+        unused_address = unused_listener.getsockname()
+        unused_listener.close()
+
+        # 'localhost' resolving to ::1 first against a gearmand that only listens on 127.0.0.1
+        current_connection = FallbackGearmanConnection([(socket.AF_INET, unused_address), (socket.AF_INET, live_listener.getsockname())])
+        current_connection.connect()
+
+        self.assertTrue(current_connection.connected)
+        self.assertEqual(current_connection.gearman_socket.getpeername(), live_listener.getsockname())
+        self.assertEqual(list(current_connection.circuit_breaker._attempt_failures), [False])
+        current_connection.close()
+
+    def test_fallback_after_timeout(self):
+        live_listener = create_listener()
+        self.open_sockets.append(live_listener)
+
+        current_connection = FallbackGearmanConnection([(socket.AF_INET, self.blackhole.getsockname()), (socket.AF_INET, live_listener.getsockname())])
+        connection_manager = FastTimeoutConnectionManager()
+        connection_manager.connection_list.append(current_connection)
+
+        self.assertEqual(connection_manager.establish_connections(), [current_connection])
+        self.assertEqual(current_connection.gearman_socket.getpeername(), live_listener.getsockname())
+        self.assertTrue(current_connection in connection_manager.poller)
+        connection_manager.shutdown()
+
+    def test_all_addresses_fail(self):
+        unused_listener = create_listener()
+        unused_address = unused_listener.getsockname()
+        unused_listener.close()
+
+        current_connection = FallbackGearmanConnection([(socket.AF_INET, self.blackhole.getsockname()), (socket.AF_INET, unused_address)])
+        self.assertRaises(ConnectionError, current_connection.connect)
+        self.assertFalse(current_connection.connected or current_connection.connecting)
+
+        # All our addresses failing is a single failed attempt
+        self.assertEqual(list(current_connection.circuit_breaker._attempt_failures), [True])
+
+    def test_literal_addresses(self):
+        self.assertEqual(GearmanConnection('127.0.0.1', 4730)._get_socket_addresses(), [(socket.AF_INET, ('127.0.0.1', 4730))])
+        self.assertEqual(GearmanConnection('::1', 4730)._get_socket_addresses()[0][0], socket.AF_INET6)
+
+class PollSubsetTest(unittest.TestCase):
+    def setUp(self):
+        self.live_listener = create_listener()
+        live_address = '127.0.0.1:%d' % self.live_listener.getsockname()[1]
+
+        self.connection_manager = FastTimeoutConnectionManager([live_address, live_address])
+        self.connection_manager.establish_connections()
+        self.quiet_connection, self.busy_connection = self.connection_manager.connection_list
+
+        self.server_sockets = [self.live_listener.accept()[0] for _ in range(2)]
+
+        # Only our busy connection has something for us to read
+        self.server_sockets[1].sendall(pack_binary_command(GEARMAN_COMMAND_ECHO_REQ, dict(data=b'ping')))
+        select.select([self.busy_connection], [], [], 1.0)
+
+    def tearDown(self):
+        self.connection_manager.shutdown()
+        for server_socket in self.server_sockets:
+            server_socket.close()
+
+        self.live_listener.close()
+
+    def test_poll_subset(self):
+        # Our persistent poller sees everything, we only hear about the connections we asked for
+        self.assertEqual(self.connection_manager.poll_connections_once([self.quiet_connection], timeout=0.0), (set(), set(), set()))
+        self.assertEqual(self.connection_manager.poll_connections_once([self.busy_connection], timeout=0.0), (set([self.busy_connection]), set(), set()))
+
+        quiet_handler = self.connection_manager.connection_to_handler_map[self.quiet_connection]
+        self.connection_manager.send_command(quiet_handler, GEARMAN_COMMAND_ECHO_REQ, dict(data=b'ping'))
+        self.assertEqual(self.connection_manager.poll_connections_once([self.quiet_connection], timeout=1.0), (set(), set([self.quiet_connection]), set()))
+
+    def test_poll_subset_keeps_other_readiness(self):
+        # Our busy connection wakes us up, we only hear about it once we ask about it
+        self.assertEqual(self.connection_manager.poll_connections_once([self.quiet_connection], timeout=1.0), (set(), set(), set()))
+        self.assertEqual(self.connection_manager.poll_connections_once(self.connection_manager.connection_list, timeout=1.0), (set([self.busy_connection]), set(), set()))
+
+        self.server_sockets[0].sendall(pack_binary_command(GEARMAN_COMMAND_ECHO_REQ, dict(data=b'ping')))
+        select.select([self.quiet_connection], [], [], 1.0)
+        self.assertEqual(self.connection_manager.poll_connections_once(self.connection_manager.connection_list, timeout=1.0), (set([self.quiet_connection, self.busy_connection]), set(), set()))
+
+class UntunedGearmanConnection(GearmanConnection):
+    tcp_nodelay = None
+    tcp_keepalive = None
+
+class SocketOptionsTest(unittest.TestCase):
+    def test_default_options(self):
+        live_listener = create_listener()
+        current_connection = GearmanConnection(*live_listener.getsockname())
+        current_connection.connect()
+
+        current_socket = current_connection.gearman_socket
+        self.assertTrue(current_socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        self.assertTrue(current_socket.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+
+        current_connection.close()
+        live_listener.close()
+
+    def test_untuned_options(self):
+        current_connection = UntunedGearmanConnection('127.0.0.1')
+        self.assertEqual(current_connection.get_socket_options(), [])
+
+        current_connection.socket_recv_buffer_size = 256 * 1024
+        self.assertEqual(current_connection.get_socket_options(), [(socket.SOL_SOCKET, socket.SO_RCVBUF, 256 * 1024)])
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'unix domain sockets not supported')
+class UnixSocketTest(unittest.TestCase):
+    def setUp(self):
+        self.socket_directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.socket_directory.name, 'gearmand.sock')
+
+        self.listening_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listening_socket.bind(self.socket_path)
+        self.listening_socket.listen(1)
+
+    def tearDown(self):
+        self.listening_socket.close()
+        self.socket_directory.cleanup()
+
+    def test_connect(self):
+        connection_manager = FastTimeoutConnectionManager(['unix://' + self.socket_path])
+        current_connection = connection_manager.connection_list[0]
+        self.assertEqual(current_connection.get_address(), ('unix://' + self.socket_path, None))
+        self.assertEqual(current_connection.unix_socket_path, self.socket_path)
+
+        # TCP options make no sense on a unix domain socket
+        self.assertEqual(current_connection.get_socket_options(), [])
+
+        self.assertEqual(connection_manager.establish_connections(), [current_connection])
+        self.assertEqual(current_connection.gearman_socket.family, socket.AF_UNIX)
+
+        # Commands make it across
+        server_socket, _ = self.listening_socket.accept()
+        connection_manager.send_command(connection_manager.connection_to_handler_map[current_connection], GEARMAN_COMMAND_ECHO_REQ, dict(data=b'ping'))
+        connection_manager.handle_write(current_connection)
+        self.assertEqual(server_socket.recv(1024), pack_binary_command(GEARMAN_COMMAND_ECHO_REQ, dict(data=b'ping')))
+
+        server_socket.close()
+        connection_manager.shutdown()
+
+    def test_connect_missing_socket(self):
+        current_connection = GearmanConnection('unix://' + self.socket_path + '.missing')
+        self.assertRaises(ConnectionError, current_connection.connect)
+        self.assertTrue(repr(current_connection).startswith('<GearmanConnection unix://'))
+
+if __name__ == '__main__':
+    unittest.main()
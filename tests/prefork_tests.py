@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+import unittest
+
+from gearman.prefork import PreforkWorker, PreforkChildWorker
+
+class StopRecordingWorker(PreforkChildWorker):
+    def __init__(self, *largs, **kwargs):
+        super(StopRecordingWorker, self).__init__(*largs, **kwargs)
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+        super(StopRecordingWorker, self).stop()
+
+class ExitingWorker(StopRecordingWorker):
+    """Pretends to have finished its max_jobs jobs as soon as it starts working"""
+    def work(self, poll_timeout=None):
+        pass
+
+class CrashingWorker(StopRecordingWorker):
+    def work(self, poll_timeout=None):
+        raise ValueError('crash')
+
+class WaitingWorker(StopRecordingWorker):
+    """Works until it's stopped, which only ever happens through a SIGTERM from our supervisor"""
+    def work(self, poll_timeout=None):
+        while not self.stopped:
+            time.sleep(0.01)
+
+class RecordingPreforkWorker(PreforkWorker):
+    respawn_delay = 0.01
+
+    def __init__(self, *largs, **kwargs):
+        self.stop_after_exits = kwargs.pop('stop_after_exits', None)
+        super(RecordingPreforkWorker, self).__init__(*largs, **kwargs)
+        self.exit_codes = []
+
+    def after_child_exit(self, child_pid, exit_code):
+        self.exit_codes.append(exit_code)
+        if self.stop_after_exits is not None and len(self.exit_codes) >= self.stop_after_exits:
+            self.stop()
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'PreforkWorker needs os.fork')
+class PreforkWorkerTest(unittest.TestCase):
+    def test_child_worker_max_jobs(self):
+        gearman_worker = StopRecordingWorker(max_jobs=2)
+        self.assertTrue(gearman_worker.after_job())
+        self.assertFalse(gearman_worker.stopped)
+
+        self.assertTrue(gearman_worker.after_job())
+        self.assertTrue(gearman_worker.stopped)
+
+    def test_child_worker_max_rss(self):
+        gearman_worker = StopRecordingWorker(max_rss=1)
+        self.assertTrue(gearman_worker.after_job())
+        self.assertTrue(gearman_worker.stopped)
+
+    def test_create_worker(self):
+        prefork_worker = PreforkWorker(max_jobs=10, max_rss=1 << 30, worker_kwargs=dict(max_concurrent_jobs=2))
+        prefork_worker.register_task(b'echo', lambda gearman_worker, gearman_job: gearman_job.data)
+
+        gearman_worker = prefork_worker.create_worker()
+        self.assertTrue(isinstance(gearman_worker, PreforkChildWorker))
+        self.assertEqual(list(gearman_worker.worker_abilities.keys()), [b'echo'])
+        self.assertEqual((gearman_worker.max_jobs, gearman_worker.max_rss, gearman_worker.max_concurrent_jobs), (10, 1 << 30, 2))
+        gearman_worker.shutdown()
+
+    def test_replace_exited_children(self):
+        prefork_worker = RecordingPreforkWorker(num_workers=2, stop_after_exits=6)
+        prefork_worker.worker_class = ExitingWorker
+        prefork_worker.work()
+
+        self.assertTrue(len(prefork_worker.exit_codes) >= 6)
+        self.assertEqual(set(prefork_worker.exit_codes), set([0]))
+        self.assertEqual(prefork_worker.children, {})
+
+    def test_replace_crashed_children(self):
+        prefork_worker = RecordingPreforkWorker(num_workers=2, stop_after_exits=4)
+        prefork_worker.worker_class = CrashingWorker
+        prefork_worker.work()
+
+        self.assertTrue(len(prefork_worker.exit_codes) >= 4)
+        self.assertEqual(set(prefork_worker.exit_codes), set([1]))
+        self.assertEqual(prefork_worker.children, {})
+
+    def test_stop_drains_children(self):
+        prefork_worker = RecordingPreforkWorker(num_workers=3)
+        prefork_worker.worker_class = WaitingWorker
+
+        stop_timer = threading.Timer(0.2, prefork_worker.stop)
+        stop_timer.start()
+        prefork_worker.work(graceful_timeout=5.0)
+        stop_timer.join()
+
+        # Our children exit cleanly once our SIGTERM gets them to stop
+        self.assertEqual(prefork_worker.exit_codes, [0, 0, 0])
+        self.assertEqual(prefork_worker.children, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
+import select
+import socket
 import struct
+import threading
 import unittest
 
 from gearman import protocol
@@ -94,6 +97,40 @@ class ProtocolBinaryCommandsTest(unittest.TestCase):
         self.assertEquals(cmd_args, dict(job_handle=b'test', task=b'function', unique=b'identifier', data=expected_data))
         self.assertEquals(cmd_len, len(uniq_command_buffer))
 
+    def test_parsing_view(self):
+        expected_data = protocol.NULL_CHAR * 4 + b'abcd'
+        uniq_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_JOB_ASSIGN_UNIQ, dict(job_handle=b'test', task=b'function', unique=b'identifier', data=b'abcd'), is_response=True)
+        uniq_command_buffer = uniq_command_buffer.replace(b'abcd', expected_data)
+        uniq_command_buffer = uniq_command_buffer[:8] + struct.pack('!I', len(uniq_command_buffer) - protocol.COMMAND_HEADER_SIZE) + uniq_command_buffer[12:]
+
+        # Parse a command sitting in the middle of our buffer
+        in_buffer = bytearray(b'junk' + uniq_command_buffer + b'more')
+        cmd_type, cmd_args, cmd_len = protocol.parse_binary_command_view(in_buffer, offset=4)
+        self.assertEquals(cmd_type, protocol.GEARMAN_COMMAND_JOB_ASSIGN_UNIQ)
+        self.assertEquals(cmd_len, len(uniq_command_buffer))
+        self.assertEquals(cmd_args['job_handle'], b'test')
+        self.assertEquals(cmd_args['task'], b'function')
+        self.assertEquals(cmd_args['unique'], b'identifier')
+
+        # Our data should be a view into the buffer we were given, not a copy
+        self.assertEquals(type(cmd_args['data']), memoryview)
+        self.assertEquals(cmd_args['data'], expected_data)
+        self.assertRaises(BufferError, in_buffer.extend, b'x')
+
+        cmd_args['data'].release()
+        in_buffer.extend(b'x')
+
+    def test_parsing_view_errors(self):
+        # Missing argument separators
+        missing_args_command_buffer = struct.pack('!4sII4s', protocol.MAGIC_RES_STRING, protocol.GEARMAN_COMMAND_WORK_COMPLETE, 4, b'ABCD')
+        self.assertRaises(ProtocolError, protocol.parse_binary_command_view, bytearray(missing_args_command_buffer))
+
+        # Incomplete command
+        self.assertRaises(ProtocolError, protocol.parse_binary_command_view, bytearray(missing_args_command_buffer[:-1]))
+
+        # Bad magic
+        self.assertRaises(ProtocolError, protocol.parse_binary_command_view, bytearray(missing_args_command_buffer), is_response=False)
+
     #######################
     # Begin packing tests #
     #######################
@@ -161,6 +198,28 @@ class ProtocolBinaryCommandsTest(unittest.TestCase):
         packed_command_buffer = protocol.pack_binary_command(cmd_type, cmd_args)
         self.assertEquals(packed_command_buffer, expected_command_buffer)
 
+    def test_packing_multiple_commands(self):
+        cmd_list = [
+            (protocol.GEARMAN_COMMAND_SUBMIT_JOB_BG, dict(task=b'function', unique=b'12345', data=b'abcd')),
+            (protocol.GEARMAN_COMMAND_NOOP, dict()),
+            (protocol.GEARMAN_COMMAND_ECHO_REQ, dict(data=b'')),
+            (protocol.GEARMAN_COMMAND_SUBMIT_JOB_BG, dict(task=b'function', unique=b'', data=b'')),
+        ]
+
+        expected_command_buffer = b''.join(protocol.pack_binary_command(cmd_type, cmd_args) for cmd_type, cmd_args in cmd_list)
+        packed_command_buffer = protocol.pack_binary_commands(cmd_list)
+        self.assertEquals(packed_command_buffer, expected_command_buffer)
+
+        expected_command_buffer = b''.join(protocol.pack_binary_command(cmd_type, cmd_args, is_response=True) for cmd_type, cmd_args in cmd_list)
+        packed_command_buffer = protocol.pack_binary_commands(cmd_list, is_response=True)
+        self.assertEquals(packed_command_buffer, expected_command_buffer)
+
+        self.assertEquals(protocol.pack_binary_commands([]), b'')
+
+        # A single bad command should fail the whole batch
+        cmd_list.append((protocol.GEARMAN_COMMAND_SUBMIT_JOB_BG, dict(task=b'function', unique=b'12\x0045', data=b'abcd')))
+        self.assertRaises(ProtocolError, protocol.pack_binary_commands, cmd_list)
+
     def test_packing_encodable_unicode(self):
         cmd_type = protocol.GEARMAN_COMMAND_ECHO_REQ
         string = b'abcde'
@@ -246,11 +305,209 @@ class ProtocolTextCommandsTest(unittest.TestCase):
         packed_command = protocol.pack_text_command(cmd_type, cmd_args)
         self.assertEquals(packed_command, expected_string)
 
+class PartialSendSocket(object):
+    """Fake socket that only ever accepts a few bytes per send"""
+    def __init__(self, max_send_size):
+        self.max_send_size = max_send_size
+        self.sent_data = b''
+
+    def sendmsg(self, buffers):
+        sent_data = b''.join(bytes(current_buffer) for current_buffer in buffers)[:self.max_send_size]
+        self.sent_data += sent_data
+        return len(sent_data)
+
+    def send(self, data):
+        return self.sendmsg([data])
+
 class GearmanConnectionTest(unittest.TestCase):
     """Tests the base CommandHandler class that underpins all other CommandHandlerTests"""
+    def setUp(self):
+        self.connection = GearmanConnection(host='__testing_host__')
+        self.connection._is_client_side = True
+        self.connection._is_server_side = False
+
     def test_recv_command(self):
         pass
 
+    def test_read_multiple_commands_from_buffer(self):
+        noop_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_NOOP, dict(), is_response=True)
+        echo_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_ECHO_RES, dict(data=b'abcd'), is_response=True)
+
+        self.connection._add_incoming_data(noop_command_buffer * 3 + echo_command_buffer)
+        self.assertEqual(self.connection.read_commands_from_buffer(), 4)
+
+        for _ in range(3):
+            self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_NOOP, dict()))
+        self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_ECHO_RES, dict(data=b'abcd')))
+        self.assertEqual(self.connection.read_command(), None)
+
+        # Everything we received was parsed, so our buffer should be empty
+        self.assertEqual(self.connection.incoming_buffer_size(), 0)
+        self.assertEqual(self.connection._incoming_offset, 0)
+
+    def test_read_partial_command_from_buffer(self):
+        echo_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_ECHO_RES, dict(data=b'x' * 1000), is_response=True)
+        noop_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_NOOP, dict(), is_response=True)
+        received_data = noop_command_buffer + echo_command_buffer
+
+        # Trickle our data in, we should only see our commands once they're complete
+        for chunk_start in range(0, len(received_data) - 10, 10):
+            self.connection._add_incoming_data(received_data[chunk_start:chunk_start + 10])
+            self.connection.read_commands_from_buffer()
+
+        self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_NOOP, dict()))
+        self.assertEqual(self.connection.read_command(), None)
+        self.assertEqual(self.connection.next_command_size(), len(echo_command_buffer))
+
+        self.connection._add_incoming_data(received_data[chunk_start + 10:])
+        self.assertEqual(self.connection.read_commands_from_buffer(), 1)
+        self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_ECHO_RES, dict(data=b'x' * 1000)))
+        self.assertEqual(self.connection.incoming_buffer_size(), 0)
+
+    def test_send_partial_commands_to_socket(self):
+        self.connection.connected = True
+        self.connection.gearman_socket = PartialSendSocket(max_send_size=7)
+
+        self.connection._is_client_side = False
+        self.connection._is_server_side = True
+        self.connection.send_command(protocol.GEARMAN_COMMAND_NOOP, dict())
+        self.connection.send_command(protocol.GEARMAN_COMMAND_ECHO_RES, dict(data=b'abcdefghij'))
+
+        expected_data = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_NOOP, dict(), is_response=True)
+        expected_data += protocol.pack_binary_command(protocol.GEARMAN_COMMAND_ECHO_RES, dict(data=b'abcdefghij'), is_response=True)
+
+        self.assertTrue(self.connection.writable())
+        self.connection.send_commands_to_buffer()
+
+        remaining_size = len(expected_data)
+        while remaining_size:
+            new_remaining_size = self.connection.send_data_to_socket()
+            self.assertEqual(new_remaining_size, max(remaining_size - 7, 0))
+            remaining_size = new_remaining_size
+
+        self.assertEqual(self.connection.gearman_socket.sent_data, expected_data)
+        self.assertFalse(self.connection.writable())
+
+    def test_send_batched_commands_to_buffer(self):
+        submit_command_args = [dict(task=b'function', unique=b'%d' % job_number, data=b'abcd') for job_number in range(5)]
+        for cmd_args in submit_command_args[:3]:
+            self.connection.send_command(protocol.GEARMAN_COMMAND_SUBMIT_JOB_BG, cmd_args)
+        self.connection.send_command(protocol.GEARMAN_COMMAND_TEXT_COMMAND, dict(raw_text=b'status\n'))
+        for cmd_args in submit_command_args[3:]:
+            self.connection.send_command(protocol.GEARMAN_COMMAND_SUBMIT_JOB_BG, cmd_args)
+
+        self.connection.send_commands_to_buffer()
+
+        # Runs of binary commands get packed into a single write, text commands sit in between
+        self.assertEqual(len(self.connection._outgoing_buffer), 3)
+
+        expected_data = b''.join(protocol.pack_binary_command(protocol.GEARMAN_COMMAND_SUBMIT_JOB_BG, cmd_args) for cmd_args in submit_command_args[:3])
+        expected_data += b'status\n'
+        expected_data += b''.join(protocol.pack_binary_command(protocol.GEARMAN_COMMAND_SUBMIT_JOB_BG, cmd_args) for cmd_args in submit_command_args[3:])
+
+        self.assertEqual(b''.join(self.connection._outgoing_buffer), expected_data)
+        self.assertEqual(self.connection._outgoing_buffer_size, len(expected_data))
+
+    def test_outgoing_buffer_size(self):
+        self.assertEqual(self.connection.outgoing_buffer_size(), 0)
+
+        cmd_args = dict(job_handle=b'H:localhost:1', data=b'abcd')
+        self.connection.send_command(protocol.GEARMAN_COMMAND_WORK_DATA, cmd_args)
+        self.connection.send_command(protocol.GEARMAN_COMMAND_WORK_DATA, cmd_args)
+
+        # Queued commands get packed before we count them
+        expected_size = 2 * len(protocol.pack_binary_command(protocol.GEARMAN_COMMAND_WORK_DATA, cmd_args))
+        self.assertEqual(self.connection.outgoing_buffer_size(), expected_size)
+        self.assertFalse(self.connection._outgoing_commands)
+
+    def test_read_large_command_from_socket(self):
+        local_socket, remote_socket = socket.socketpair()
+        self.addCleanup(local_socket.close)
+        self.addCleanup(remote_socket.close)
+
+        self.connection.set_socket(local_socket)
+        self.connection.connected = True
+
+        expected_data = b'x' * (3 * 1024 * 1024)
+        complete_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=b'H:localhost:1', data=expected_data), is_response=True)
+
+        sending_thread = threading.Thread(target=remote_socket.sendall, args=(complete_command_buffer, ))
+        sending_thread.start()
+        self.addCleanup(sending_thread.join)
+
+        # We should pick up the announced command size and ask for much more than 4096 bytes at a time
+        socket_reads = 0
+        while not self.connection.read_commands_from_buffer():
+            select.select([local_socket], [], [], 5.0)
+            self.connection.read_data_from_socket()
+            socket_reads += 1
+
+        self.assertTrue(socket_reads < len(complete_command_buffer) // GearmanConnection.recv_buffer_size)
+        self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=b'H:localhost:1', data=expected_data)))
+
+    def test_read_data_into_incoming_buffer(self):
+        local_socket, remote_socket = socket.socketpair()
+        self.addCleanup(local_socket.close)
+        self.addCleanup(remote_socket.close)
+
+        self.connection.set_socket(local_socket)
+        self.connection.connected = True
+
+        noop_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_NOOP, dict(), is_response=True)
+        remote_socket.sendall(noop_command_buffer[:4])
+        self.assertEqual(self.connection.read_data_from_socket(), 4)
+
+        # We receive straight into the free tail of our incoming buffer
+        incoming_buffer = self.connection._incoming_buffer
+        self.assertEqual(bytes(incoming_buffer[:self.connection._incoming_size]), noop_command_buffer[:4])
+
+        # It still has room, we keep receiving into the same buffer
+        remote_socket.sendall(noop_command_buffer[4:8])
+        self.assertEqual(self.connection.read_data_from_socket(), 8)
+        self.assertTrue(self.connection._incoming_buffer is incoming_buffer)
+
+        # Our incoming buffer can't grow while a zero copy view points into it, we move on to a new one
+        exported_view = memoryview(incoming_buffer)
+        self.connection._incoming_buffer_exported = True
+
+        remote_socket.sendall(noop_command_buffer[8:])
+        self.assertEqual(self.connection.read_data_from_socket(), len(noop_command_buffer))
+        self.assertEqual(bytes(exported_view[:8]), noop_command_buffer[:8])
+        self.assertFalse(self.connection._incoming_buffer_exported)
+        exported_view.release()
+
+        self.assertEqual(self.connection.read_commands_from_buffer(), 1)
+        self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_NOOP, dict()))
+
+    def test_read_zero_copy_commands_from_buffer(self):
+        self.connection.zero_copy_data = True
+
+        large_data = b'x' * GearmanConnection.zero_copy_threshold
+        complete_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=b'H:localhost:1', data=large_data), is_response=True)
+        noop_command_buffer = protocol.pack_binary_command(protocol.GEARMAN_COMMAND_NOOP, dict(), is_response=True)
+
+        self.connection._add_incoming_data(complete_command_buffer + noop_command_buffer + noop_command_buffer[:4])
+        self.assertEqual(self.connection.read_commands_from_buffer(), 2)
+
+        cmd_type, cmd_args = self.connection.read_command()
+        self.assertEqual(cmd_type, protocol.GEARMAN_COMMAND_WORK_COMPLETE)
+        self.assertEqual(cmd_args['job_handle'], b'H:localhost:1')
+        self.assertEqual(type(cmd_args['data']), memoryview)
+        self.assertEqual(cmd_args['data'], large_data)
+        self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_NOOP, dict()))
+
+        # We should be able to keep receiving data while our view is alive
+        self.connection._add_incoming_data(noop_command_buffer[4:])
+        self.assertEqual(self.connection.read_commands_from_buffer(), 1)
+        self.assertEqual(cmd_args['data'], large_data)
+
+    def test_read_text_commands_from_buffer(self):
+        self.connection._add_incoming_data(b'status\nversion\npartial')
+        self.assertEqual(self.connection.read_commands_from_buffer(), 2)
+        self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_TEXT_COMMAND, dict(raw_text=b'status')))
+        self.assertEqual(self.connection.read_command(), (protocol.GEARMAN_COMMAND_TEXT_COMMAND, dict(raw_text=b'version')))
+        self.assertEqual(bytes(self.connection._incoming_buffer[self.connection._incoming_offset:self.connection._incoming_size]), b'partial')
+
 class GearmanCommandHandlerTest(_GearmanAbstractTest):
     """Tests the base CommandHandler class that underpins all other CommandHandlerTests"""
     def _test_recv_command(self):
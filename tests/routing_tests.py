@@ -0,0 +1,198 @@
+import time
+import unittest
+
+from gearman.client import GearmanClient
+from gearman.constants import JOB_CREATED, JOB_UNKNOWN
+from gearman.job import GearmanJob, GearmanJobRequest
+from gearman.protocol import GEARMAN_COMMAND_JOB_CREATED, GEARMAN_COMMAND_WORK_COMPLETE
+from gearman.routing import ConsistentHashRouter, EwmaRouter, RandomRouter
+
+from tests._core_testing import MockGearmanConnection, MockGearmanConnectionManager
+
+KEY_COUNT = 2000
+
+class MockGearmanClient(GearmanClient, MockGearmanConnectionManager):
+    connection_class = MockGearmanConnection
+
+def create_request(task=b'task', unique=b'unique', data=b'data'):
+    return GearmanJobRequest(GearmanJob(connection=None, handle=None, task=task, unique=unique, data=data))
+
+def create_connections(server_count):
+    return [MockGearmanConnection(host='gearman%d.example.com' % server_number) for server_number in range(server_count)]
+
+class ConsistentHashRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.router = ConsistentHashRouter()
+        self.job_requests = [create_request(unique=b'%d' % key_number) for key_number in range(KEY_COUNT)]
+
+    def route_requests(self, connection_list):
+        return [self.router.get_connection_order(current_request, connection_list)[0].get_address() for current_request in self.job_requests]
+
+    def test_same_key_same_server(self):
+        connection_list = create_connections(4)
+        first_order = self.router.get_connection_order(create_request(), connection_list)
+
+        # Every client builds the same ring, even with its servers listed in another order
+        other_router = ConsistentHashRouter()
+        other_order = other_router.get_connection_order(create_request(), list(reversed(create_connections(4))))
+
+        self.assertEqual([current_connection.get_address() for current_connection in first_order], [current_connection.get_address() for current_connection in other_order])
+        self.assertEqual(self.router.get_connection_order(create_request(), connection_list), first_order)
+
+        # We fail over through every other server
+        self.assertEqual(sorted(first_order, key=id), sorted(connection_list, key=id))
+
+    def test_keyed_on_task_and_unique(self):
+        connection_list = create_connections(8)
+        routed_addresses = set(self.route_requests(connection_list))
+        self.assertEqual(len(routed_addresses), 8)
+
+        other_task_addresses = [self.router.get_connection_order(create_request(task=b'other', unique=current_request.job.unique), connection_list)[0].get_address() for current_request in self.job_requests]
+        self.assertNotEqual(other_task_addresses, self.route_requests(connection_list))
+
+    def test_unique_from_data(self):
+        connection_list = create_connections(8)
+        data_orders = set()
+        for _ in range(5):
+            current_request = create_request(unique=b'-', data=b'same data')
+            data_orders.add(tuple(self.router.get_connection_order(current_request, connection_list)))
+
+        self.assertEqual(len(data_orders), 1)
+
+    def test_server_joins(self):
+        connection_list = create_connections(4)
+        routed_addresses = self.route_requests(connection_list)
+
+        # Only keys that now belong to our new server move, about 1/5 of them
+        new_connection_list = connection_list + create_connections(5)[4:]
+        new_routed_addresses = self.route_requests(new_connection_list)
+
+        moved_keys = [(old_address, new_address) for old_address, new_address in zip(routed_addresses, new_routed_addresses) if old_address != new_address]
+        self.assertEqual(set(new_address for _, new_address in moved_keys), set([new_connection_list[-1].get_address()]))
+        self.assertTrue(0.1 < len(moved_keys) / float(KEY_COUNT) < 0.3)
+
+    def test_server_leaves(self):
+        connection_list = create_connections(5)
+        routed_addresses = self.route_requests(connection_list)
+
+        removed_address = connection_list[2].get_address()
+        new_routed_addresses = self.route_requests(connection_list[:2] + connection_list[3:])
+
+        # Only keys on the server that left move
+        for old_address, new_address in zip(routed_addresses, new_routed_addresses):
+            if old_address != removed_address:
+                self.assertEqual(old_address, new_address)
+
+class EwmaRouterTest(unittest.TestCase):
+    def setUp(self):
+        self.router = EwmaRouter()
+        self.connection_list = create_connections(2)
+
+        # Our router only holds weak references to the requests we send
+        self.sent_requests = []
+
+    def send_requests(self, current_connection, request_count):
+        for _ in range(request_count):
+            current_request = create_request()
+            self.router.request_sent(current_request, current_connection)
+            self.sent_requests.append(current_request)
+
+    def record_latency(self, current_connection, created_latency, completed_latency, outstanding_requests=0):
+        self.send_requests(current_connection, outstanding_requests)
+        self.router.request_sent(create_request(), current_connection)
+
+        server_latency = self.router.server_latencies[current_connection]
+        server_latency.created_ewma = created_latency
+        server_latency.completed_ewma = completed_latency
+        server_latency.last_sample_time = time.time()
+        self.assertEqual(len(server_latency.outstanding_requests), outstanding_requests)
+
+    def test_prefers_fast_server(self):
+        slow_connection, fast_connection = self.connection_list
+        self.record_latency(slow_connection, 0.5, 2.0)
+        self.record_latency(fast_connection, 0.001, 0.01)
+
+        # With 2 servers, both of them are always our choices
+        for _ in range(20):
+            self.assertEqual(self.router.get_connection_order(create_request(), self.connection_list), [fast_connection, slow_connection])
+
+    def test_outstanding_requests(self):
+        busy_connection, idle_connection = self.connection_list
+        self.record_latency(busy_connection, 0.01, 0.1, outstanding_requests=50)
+        self.record_latency(idle_connection, 0.01, 0.5)
+
+        self.assertTrue(self.router.get_cost(busy_connection) > self.router.get_cost(idle_connection))
+        self.assertEqual(self.router.get_connection_order(create_request(), self.connection_list)[0], idle_connection)
+
+    def test_cost_decays(self):
+        current_connection = self.connection_list[0]
+        self.record_latency(current_connection, 0.5, 0.5)
+        sample_time = self.router.server_latencies[current_connection].last_sample_time
+
+        self.assertAlmostEqual(self.router.get_cost(current_connection, sample_time), 1.0)
+        self.assertAlmostEqual(self.router.get_cost(current_connection, sample_time + self.router.decay_time), 1.0 / 2.718281828, places=5)
+        self.assertEqual(self.router.get_cost(self.connection_list[1]), 0.0)
+
+    def test_silent_server(self):
+        silent_connection, healthy_connection = self.connection_list
+        self.record_latency(silent_connection, 0.001, 0.01)
+        self.record_latency(healthy_connection, 0.01, 0.1)
+
+        # Our fast server stops answering, no samples come in while its requests pile up
+        self.send_requests(silent_connection, 20)
+        sample_time = self.router.server_latencies[silent_connection].last_sample_time
+        for idle_time in (0.0, self.router.decay_time * 10):
+            self.assertTrue(self.router.get_cost(silent_connection, sample_time + idle_time) >= 20 * self.router.outstanding_request_cost)
+
+        self.assertEqual(self.router.get_connection_order(create_request(), self.connection_list)[0], healthy_connection)
+
+        # A server we never heard back from at all pays for its outstanding requests too
+        unsampled_connection = create_connections(3)[2]
+        self.send_requests(unsampled_connection, 3)
+        self.assertAlmostEqual(self.router.get_cost(unsampled_connection), 3 * self.router.outstanding_request_cost)
+
+    def test_client_samples(self):
+        gearman_client = MockGearmanClient(['gearman%d.example.com' % server_number for server_number in range(2)], router=EwmaRouter())
+
+        completed_request = gearman_client._create_request_from_dictionary(dict(task=b'task', data=b'data', unique=b'1'))
+        lost_request = gearman_client._create_request_from_dictionary(dict(task=b'task', data=b'data', unique=b'2'))
+        for current_request in (completed_request, lost_request):
+            gearman_client.send_job_request(current_request)
+
+        current_connection = completed_request.job.connection
+        server_latency = gearman_client.router.server_latencies[current_connection]
+        self.assertEqual(sum(len(current_latency.outstanding_requests) for current_latency in gearman_client.router.server_latencies.values()), 2)
+        self.assertEqual(server_latency.last_sample_time, None)
+
+        current_command_handler = gearman_client.connection_to_handler_map[current_connection]
+        current_command_handler.recv_command(GEARMAN_COMMAND_JOB_CREATED, job_handle=b'H:1')
+        self.assertEqual(completed_request.state, JOB_CREATED)
+        self.assertTrue(server_latency.last_sample_time is not None)
+
+        current_command_handler.recv_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=b'H:1', data=b'done')
+        self.assertTrue(completed_request.complete)
+
+        # A request that never got an answer doesn't count against its server once its connection is gone
+        lost_request.state = JOB_UNKNOWN
+        gearman_client.on_request_updated(lost_request)
+        self.assertEqual(sum(len(current_latency.outstanding_requests) for current_latency in gearman_client.router.server_latencies.values()), 0)
+
+class ClientRoutingTest(unittest.TestCase):
+    def test_default_router(self):
+        gearman_client = MockGearmanClient()
+        self.assertTrue(isinstance(gearman_client.router, RandomRouter))
+
+    def test_establish_request_connection(self):
+        gearman_client = MockGearmanClient(['gearman%d.example.com' % server_number for server_number in range(4)], router=ConsistentHashRouter())
+        expected_connection = gearman_client.router.get_connection_order(create_request(), gearman_client.connection_list)[0]
+
+        self.assertEqual(gearman_client.establish_request_connection(create_request()), expected_connection)
+
+        # Identical jobs go to the same server, failing over along our ring when it's down
+        expected_connection._fail_on_bind = True
+        expected_connection._reset_connection()
+        failover_connection = gearman_client.router.get_connection_order(create_request(), gearman_client.connection_list)[1]
+        self.assertEqual(gearman_client.establish_request_connection(create_request()), failover_connection)
+
+if __name__ == '__main__':
+    unittest.main()
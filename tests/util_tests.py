@@ -0,0 +1,131 @@
+import socket
+import threading
+import time
+import unittest
+
+import gearman.util
+
+class SocketPairConnection(object):
+    """Bare minimum connection that a GearmanPoller can work with"""
+    def __init__(self):
+        self.local_socket, self.remote_socket = socket.socketpair()
+
+    def fileno(self):
+        return self.local_socket.fileno()
+
+    def close(self):
+        self.local_socket.close()
+        self.remote_socket.close()
+
+class GearmanPollerTest(unittest.TestCase):
+    def setUp(self):
+        self.poller = gearman.util.GearmanPoller()
+        self.connections = [SocketPairConnection() for _ in range(3)]
+
+    def tearDown(self):
+        self.poller.close()
+        for current_connection in self.connections:
+            current_connection.close()
+
+    def test_poll_readable_and_writable(self):
+        idle_connection, readable_connection, writable_connection = self.connections
+        for current_connection in self.connections:
+            self.poller.register(current_connection)
+
+        self.assertEqual(len(self.poller), 3)
+        self.assertEqual(self.poller.poll(timeout=0), ([], []))
+
+        readable_connection.remote_socket.send(b'ping')
+        self.poller.modify(writable_connection, writable=True)
+
+        rd_list, wr_list = self.poller.poll(timeout=1.0)
+        self.assertEqual(rd_list, [readable_connection])
+        self.assertEqual(wr_list, [writable_connection])
+
+        # Once we no longer have anything to write, we should stop hearing about it
+        self.poller.modify(writable_connection, writable=False)
+        rd_list, wr_list = self.poller.poll(timeout=0)
+        self.assertEqual(rd_list, [readable_connection])
+        self.assertEqual(wr_list, [])
+
+    def test_unregister(self):
+        current_connection = self.connections[0]
+        self.poller.register(current_connection)
+        current_connection.remote_socket.send(b'ping')
+
+        self.poller.unregister(current_connection)
+        self.assertFalse(current_connection in self.poller)
+        self.assertEqual(self.poller.poll(timeout=0), ([], []))
+
+        # Unknown connections should be ignored
+        self.poller.unregister(current_connection)
+        self.poller.modify(current_connection, writable=True)
+        self.assertEqual(len(self.poller), 0)
+
+    def test_register_replaces_stale_connection(self):
+        current_connection = self.connections[0]
+        self.poller.register(current_connection)
+
+        # Pretend a new connection was handed the same file descriptor after we forgot to unregister
+        reused_connection = SocketPairConnection()
+        self.addCleanup(reused_connection.close)
+        reused_connection.fileno = current_connection.fileno
+
+        self.poller.register(reused_connection, writable=True)
+        self.assertFalse(current_connection in self.poller)
+        self.assertTrue(reused_connection in self.poller)
+
+    def test_wakeup(self):
+        current_connection = self.connections[0]
+        self.poller.register(current_connection)
+
+        # Without wakeups enabled, this is a no-op
+        self.poller.wakeup()
+        self.assertEqual(self.poller.poll(timeout=0), ([], []))
+
+        self.poller.enable_wakeup()
+        wakeup_timer = threading.Timer(0.05, self.poller.wakeup)
+        wakeup_timer.start()
+        self.addCleanup(wakeup_timer.cancel)
+
+        start_time = time.time()
+        self.assertEqual(self.poller.poll(timeout=10.0), ([], []))
+        self.assertTrue(time.time() - start_time < 5.0)
+
+        # Wakeups shouldn't linger around once we've seen them
+        for _ in range(100):
+            self.poller.wakeup()
+
+        self.assertEqual(self.poller.poll(timeout=0), ([], []))
+        self.assertEqual(self.poller.poll(timeout=0), ([], []))
+        self.assertEqual(len(self.poller), 1)
+
+class ServerParameterTest(unittest.TestCase):
+    def test_disambiguate_server_parameter(self):
+        expected_addresses = [
+            ('localhost', ('localhost', 4730)),
+            ('localhost:4731', ('localhost', 4731)),
+            (('localhost', 4731), ('localhost', 4731)),
+            ('10.0.0.1:4731', ('10.0.0.1', 4731)),
+            ('::1', ('::1', 4730)),
+            ('[::1]', ('::1', 4730)),
+            ('[2001:db8::1]:4731', ('2001:db8::1', 4731)),
+            ('unix:///var/run/gearmand.sock', ('unix:///var/run/gearmand.sock', None)),
+        ]
+
+        for server_parameter, expected_address in expected_addresses:
+            self.assertEqual(gearman.util.disambiguate_server_parameter(server_parameter), expected_address)
+
+        self.assertRaises(ValueError, gearman.util.disambiguate_server_parameter, '[::1')
+        self.assertRaises(ValueError, gearman.util.disambiguate_server_parameter, '[::1]4731')
+        self.assertRaises(ValueError, gearman.util.disambiguate_server_parameter, 'localhost:port')
+
+    def test_format_server_parameter(self):
+        for server_parameter in ('localhost:4730', '[2001:db8::1]:4731', 'unix:///var/run/gearmand.sock'):
+            server_address = gearman.util.disambiguate_server_parameter(server_parameter)
+            self.assertEqual(gearman.util.format_server_parameter(*server_address), server_parameter)
+
+        self.assertEqual(gearman.util.format_server_parameter('localhost', '4730'), 'localhost:4730')
+
+if __name__ == '__main__':
+    unittest.main()
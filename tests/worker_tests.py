@@ -1,8 +1,11 @@
 import collections
+import concurrent.futures
+import threading
 import unittest
 
 from gearman.worker import GearmanWorker
 from gearman.worker_handler import GearmanWorkerCommandHandler
+from gearman import protocol
 
 from gearman.errors import ServerUnavailable, InvalidWorkerState
 from gearman.protocol import get_command_name, GEARMAN_COMMAND_RESET_ABILITIES, GEARMAN_COMMAND_CAN_DO, GEARMAN_COMMAND_SET_CLIENT_ID, \
@@ -130,6 +133,368 @@ class WorkerTest(_GearmanAbstractWorkerTest):
         self.assertRaises(ServerUnavailable, self.connection_manager.work)
 
 
+class _GearmanTaskWorkerTest(_GearmanAbstractWorkerTest):
+    """Runs jobs through a real GearmanWorker on top of our mock connections
+
+    Subclasses register their task as '__test_ability__' in register_test_task and pick our worker's
+    constructor arguments in get_worker_kwargs.  Class level worker settings go in worker_attributes
+    """
+    connection_manager_class = GearmanWorker
+    max_concurrent_jobs = 1
+    executor = None
+    worker_attributes = {}
+
+    def setup_connection_manager(self):
+        # Our mock connections never get written out, only remember which jobs we would have waited on
+        self.waited_on_jobs = []
+        def wait_until_updates_sent(gearman_worker, multiple_gearman_jobs, poll_timeout=None):
+            self.waited_on_jobs.append([current_job.handle for current_job in multiple_gearman_jobs])
+
+        testing_attributes = dict(self.worker_attributes, command_handler_class=self.command_handler_class, connection_class=self.connection_class, wait_until_updates_sent=wait_until_updates_sent)
+        testing_client_class = type('MockGearmanTestingWorker', (MockGearmanConnectionManager, self.connection_manager_class), testing_attributes)
+
+        self.connection_manager = testing_client_class(**self.get_worker_kwargs())
+        self.addCleanup(self.connection_manager.shutdown)
+
+        self.register_test_task()
+
+    def get_worker_kwargs(self):
+        return dict(max_concurrent_jobs=self.max_concurrent_jobs, executor=self.executor)
+
+    def register_test_task(self):
+        raise NotImplementedError
+
+    def setup_command_handler(self):
+        super(_GearmanAbstractWorkerTest, self).setup_command_handler()
+        self.assert_sent_abilities(['__test_ability__'])
+        self.assert_sent_command(GEARMAN_COMMAND_PRE_SLEEP)
+
+    def assign_job(self, data=None):
+        self.command_handler.recv_command(GEARMAN_COMMAND_NOOP)
+        self.assert_sent_command(GEARMAN_COMMAND_GRAB_JOB_UNIQ)
+
+        fake_job = self.generate_job_dict()
+        if data is not None:
+            fake_job['data'] = data
+
+        self.command_handler.recv_command(GEARMAN_COMMAND_JOB_ASSIGN_UNIQ, **fake_job)
+        return fake_job
+
+    def assert_back_to_sleep(self):
+        self.assert_sent_command(GEARMAN_COMMAND_PRE_SLEEP)
+        self.assert_no_pending_commands()
+
+class ConcurrentWorkerTest(_GearmanTaskWorkerTest):
+    """Test running jobs on an executor with multiple job slots"""
+    max_concurrent_jobs = 2
+    executor = concurrent.futures.ThreadPoolExecutor
+
+    def register_test_task(self):
+        self.release_jobs = threading.Event()
+        self.addCleanup(self.release_jobs.set)
+
+        def blocking_task(gearman_worker, gearman_job):
+            gearman_worker.send_job_data(gearman_job, b'started ' + gearman_job.data)
+            self.release_jobs.wait(5.0)
+            if gearman_job.data == b'explode':
+                raise ValueError(gearman_job.data)
+
+            return gearman_job.data
+
+        self.connection_manager.register_task('__test_ability__', blocking_task)
+
+    def assign_job(self, data=None):
+        fake_job = super(ConcurrentWorkerTest, self).assign_job(data)
+
+        # We should hand the job off and go right back to asking for more
+        self.assert_back_to_sleep()
+        return fake_job
+
+    def finish_jobs(self):
+        self.release_jobs.set()
+        concurrent.futures.wait(list(self.connection_manager.running_jobs.keys()), timeout=5.0)
+        self.assertTrue(self.connection_manager._process_job_events())
+
+    def test_fill_job_slots(self):
+        first_job = self.assign_job(b'first')
+        second_job = self.assign_job(b'second')
+        self.assertEqual(len(self.connection_manager.running_jobs), 2)
+
+        # Every slot is taken, stay awake without grabbing or going back to sleep
+        self.command_handler.recv_command(GEARMAN_COMMAND_NOOP)
+        self.assert_no_pending_commands()
+        self.assertFalse(self.connection_manager.check_job_lock(self.command_handler))
+
+        # Our jobs only hand their updates over, our poll thread sends them out in order
+        self.finish_jobs()
+        sent_commands = list(self.connection._outgoing_commands)
+        self.connection._outgoing_commands.clear()
+
+        for current_job in (first_job, second_job):
+            data_index = sent_commands.index((GEARMAN_COMMAND_WORK_DATA, dict(job_handle=current_job['job_handle'], data=b'started ' + current_job['data'])))
+            complete_index = sent_commands.index((GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=current_job['job_handle'], data=current_job['data'])))
+            self.assertTrue(data_index < complete_index)
+
+        # Once a slot freed up, we should've woken our handler back up to grab another job
+        self.assertEqual(sent_commands.count((GEARMAN_COMMAND_GRAB_JOB_UNIQ, dict())), 1)
+        self.assertEqual(len(sent_commands), 5)
+        self.assertTrue(self.connection_manager.check_job_lock(self.command_handler))
+        self.assertEqual(len(self.connection_manager.running_jobs), 0)
+
+    def test_job_exception(self):
+        current_job = self.assign_job(b'explode')
+
+        self.finish_jobs()
+        self.assert_sent_command(GEARMAN_COMMAND_WORK_DATA, job_handle=current_job['job_handle'], data=b'started explode')
+        self.assert_sent_command(GEARMAN_COMMAND_WORK_FAIL, job_handle=current_job['job_handle'])
+        self.assert_no_pending_commands()
+
+    def test_dead_connection(self):
+        self.assign_job(b'first')
+
+        self.connection_manager.handle_error(self.connection)
+        self.assertFalse(self.connection_manager.has_job_lock() and not self.connection_manager.running_jobs)
+
+        # Results for jobs on dead connections get dropped
+        self.finish_jobs()
+        self.assertEqual(len(self.connection_manager.running_jobs), 0)
+        self.assertFalse(self.connection_manager.has_job_lock())
+
+class BatchWorkerTest(_GearmanTaskWorkerTest):
+    """Test handing jobs to batch tasks, a batch at a time"""
+    def register_test_task(self):
+        self.batch_sizes = []
+        def reverse_batch(gearman_worker, gearman_jobs):
+            self.batch_sizes.append(len(gearman_jobs))
+            if any(gearman_job.data == b'explode' for gearman_job in gearman_jobs):
+                raise ValueError('explode')
+
+            return [gearman_job.data[::-1] for gearman_job in gearman_jobs]
+
+        self.connection_manager.register_batch_task('__test_ability__', reverse_batch, max_batch=3, max_wait_ms=60000)
+
+    def finish_batches(self):
+        return self.connection_manager._after_finished_jobs()
+
+    def assign_waiting_jobs(self, *job_data):
+        fake_jobs = []
+        for current_data in job_data:
+            fake_jobs.append(self.assign_job(current_data))
+            self.assert_sent_command(GEARMAN_COMMAND_PRE_SLEEP)
+
+        return fake_jobs
+
+    def test_full_batch(self):
+        # We hold onto our jobs until our batch fills up
+        fake_jobs = self.assign_waiting_jobs(b'first', b'second')
+        self.assert_no_pending_commands()
+        self.assertEqual(self.batch_sizes, [])
+
+        fake_jobs.append(self.assign_job(b'third'))
+        self.assertTrue(self.finish_batches())
+        self.assertEqual(self.batch_sizes, [3])
+
+        for current_job in fake_jobs:
+            self.assert_sent_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=current_job['job_handle'], data=current_job['data'][::-1])
+
+        self.assert_sent_command(GEARMAN_COMMAND_PRE_SLEEP)
+        self.assert_no_pending_commands()
+
+    def test_batch_wait(self):
+        fake_job, = self.assign_waiting_jobs(b'first')
+
+        # Nothing to run until our batch has waited long enough
+        self.connection_manager._flush_batches()
+        self.assertEqual(self.batch_sizes, [])
+
+        self.connection_manager._batch_deadlines['__test_ability__'] = 0.0
+        self.connection_manager._flush_batches()
+        self.assertTrue(self.finish_batches())
+        self.assertEqual(self.batch_sizes, [1])
+
+        self.assert_sent_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=fake_job['job_handle'], data=b'tsrif')
+        self.assert_no_pending_commands()
+
+    def test_batch_exception(self):
+        fake_jobs = self.assign_waiting_jobs(b'first', b'second')
+
+        fake_jobs.append(self.assign_job(b'explode'))
+        self.finish_batches()
+
+        # Every job in a batch fails together
+        for current_job in fake_jobs:
+            self.assert_sent_command(GEARMAN_COMMAND_WORK_FAIL, job_handle=current_job['job_handle'])
+
+        self.assert_sent_command(GEARMAN_COMMAND_PRE_SLEEP)
+        self.assert_no_pending_commands()
+
+    def test_dead_connection(self):
+        self.assign_job(b'first')
+        self.connection_manager.handle_error(self.connection)
+
+        # The server gives jobs we've yet to run on a dead connection to someone else
+        self.assertEqual(self.connection_manager._pending_batches, {})
+        self.assertEqual(self.connection_manager._batch_deadlines, {})
+
+class ExecutorBatchWorkerTest(BatchWorkerTest):
+    """Test running batches on an executor, a running batch takes up a single job slot"""
+    max_concurrent_jobs = 2
+    executor = concurrent.futures.ThreadPoolExecutor
+
+    def finish_batches(self):
+        self.assertEqual(len(self.connection_manager.running_jobs), 1)
+        concurrent.futures.wait(list(self.connection_manager.running_jobs.keys()), timeout=5.0)
+        return self.connection_manager._process_job_events()
+
+    def test_full_batch(self):
+        fake_jobs = self.assign_waiting_jobs(b'first', b'second', b'third')
+
+        self.assertTrue(self.finish_batches())
+        self.assertEqual(self.batch_sizes, [3])
+
+        for current_job in fake_jobs:
+            self.assert_sent_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=current_job['job_handle'], data=current_job['data'][::-1])
+
+        self.assert_no_pending_commands()
+        self.assertEqual(self.connection_manager.running_jobs, {})
+
+    def test_batch_exception(self):
+        fake_jobs = self.assign_waiting_jobs(b'first', b'second', b'explode')
+
+        self.finish_batches()
+        for current_job in fake_jobs:
+            self.assert_sent_command(GEARMAN_COMMAND_WORK_FAIL, job_handle=current_job['job_handle'])
+
+        self.assert_no_pending_commands()
+
+class StreamingWorkerTest(_GearmanTaskWorkerTest):
+    """Test generator tasks streaming their results as JOB_DATA updates"""
+    def register_test_task(self):
+        def streaming_task(gearman_worker, gearman_job):
+            for current_data in gearman_job.data.split(b' '):
+                if current_data == b'explode':
+                    raise ValueError(current_data)
+
+                yield current_data
+
+            if gearman_job.data.startswith(b'return'):
+                return b'done'
+
+        self.connection_manager.register_task('__test_ability__', streaming_task)
+
+    def assert_job_finished(self):
+        self.assert_back_to_sleep()
+
+    def test_stream_job_data(self):
+        fake_job = self.assign_job(b'first second third')
+
+        # Every chunk goes out on its own, a generator that returns nothing completes with an empty result
+        for current_data in (b'first', b'second', b'third'):
+            self.assert_sent_command(GEARMAN_COMMAND_WORK_DATA, job_handle=fake_job['job_handle'], data=current_data)
+
+        self.assert_sent_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=fake_job['job_handle'], data=b'')
+        self.assert_job_finished()
+
+    def test_stream_job_result(self):
+        fake_job = self.assign_job(b'return')
+
+        self.assert_sent_command(GEARMAN_COMMAND_WORK_DATA, job_handle=fake_job['job_handle'], data=b'return')
+        self.assert_sent_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=fake_job['job_handle'], data=b'done')
+        self.assert_job_finished()
+
+    def test_stream_job_exception(self):
+        fake_job = self.assign_job(b'first explode')
+
+        # Chunks we already streamed stay sent
+        self.assert_sent_command(GEARMAN_COMMAND_WORK_DATA, job_handle=fake_job['job_handle'], data=b'first')
+        self.assert_sent_command(GEARMAN_COMMAND_WORK_FAIL, job_handle=fake_job['job_handle'])
+        self.assert_job_finished()
+
+class ExecutorStreamingWorkerTest(StreamingWorkerTest):
+    """Test generator tasks running on an executor, our poll thread sends out their chunks in order"""
+    max_concurrent_jobs = 2
+    executor = concurrent.futures.ThreadPoolExecutor
+
+    def assign_job(self, data=None):
+        fake_job = super(ExecutorStreamingWorkerTest, self).assign_job(data)
+        self.assert_sent_command(GEARMAN_COMMAND_PRE_SLEEP)
+
+        concurrent.futures.wait(list(self.connection_manager.running_jobs.keys()), timeout=5.0)
+        self.assertTrue(self.connection_manager._process_job_events())
+        return fake_job
+
+    def assert_job_finished(self):
+        self.assert_no_pending_commands()
+        self.assertEqual(self.connection_manager.running_jobs, {})
+
+class BufferedUpdatesWorkerTest(_GearmanTaskWorkerTest):
+    """Test queueing job updates, only blocking at the end of a job or past our high water mark"""
+    worker_attributes = dict(buffer_job_updates=True, update_flush_interval=3600.0)
+
+    def register_test_task(self):
+        def streaming_task(gearman_worker, gearman_job):
+            for chunk_number in range(3):
+                gearman_worker.send_job_data(gearman_job, b'chunk %d' % chunk_number)
+
+            gearman_worker.send_job_warning(gearman_job, b'almost done')
+            return b'done'
+
+        self.connection_manager.register_task('__test_ability__', streaming_task)
+
+    def assign_job(self, data=None):
+        fake_job = super(BufferedUpdatesWorkerTest, self).assign_job(data)
+
+        # Our updates were packed up to be sent, we went right back to sleep
+        self.assert_back_to_sleep()
+        return fake_job
+
+    def test_wait_once_per_job(self):
+        fake_job = self.assign_job()
+        self.assertEqual(self.waited_on_jobs, [[fake_job['job_handle']]])
+
+        expected_updates = [(GEARMAN_COMMAND_WORK_DATA, dict(job_handle=fake_job['job_handle'], data=b'chunk %d' % chunk_number)) for chunk_number in range(3)]
+        expected_updates.append((GEARMAN_COMMAND_WORK_WARNING, dict(job_handle=fake_job['job_handle'], data=b'almost done')))
+        expected_updates.append((GEARMAN_COMMAND_WORK_COMPLETE, dict(job_handle=fake_job['job_handle'], data=b'done')))
+
+        expected_size = sum(len(protocol.pack_binary_command(cmd_type, cmd_args)) for cmd_type, cmd_args in expected_updates)
+        self.assertEqual(self.connection._outgoing_buffer_size, expected_size)
+
+    def test_high_water_mark(self):
+        self.connection_manager.update_high_water_mark = 0
+
+        # Every update pushes us past our high water mark
+        fake_job = self.assign_job()
+        self.assertEqual(self.waited_on_jobs, [[fake_job['job_handle']]] * 6)
+
+class PipelinedGrabWorkerTest(_GearmanTaskWorkerTest):
+    """Test asking for our next job as soon as we're handed one"""
+    worker_attributes = dict(pipeline_grab_job=True)
+
+    def register_test_task(self):
+        self.connection_manager.register_task('__test_ability__', lambda gearman_worker, gearman_job: gearman_job.data[::-1])
+
+    def test_pipeline_grab_job(self):
+        self.command_handler.recv_command(GEARMAN_COMMAND_NOOP)
+        self.assert_sent_command(GEARMAN_COMMAND_GRAB_JOB_UNIQ)
+
+        for _ in range(3):
+            fake_job = self.generate_job_dict()
+            self.command_handler.recv_command(GEARMAN_COMMAND_JOB_ASSIGN_UNIQ, **fake_job)
+
+            # Our result and our next grab go out together, no sleeping and waiting on a NOOP in between
+            self.assert_sent_command(GEARMAN_COMMAND_WORK_COMPLETE, job_handle=fake_job['job_handle'], data=fake_job['data'][::-1])
+            self.assert_sent_command(GEARMAN_COMMAND_GRAB_JOB_UNIQ)
+            self.assert_no_pending_commands()
+            self.assertTrue(self.connection_manager.check_job_lock(self.command_handler))
+
+        # Our poll loop writes our results, we never block on them
+        self.assertEqual(self.waited_on_jobs, [])
+
+        # We only go back to sleep once the server runs out of jobs
+        self.command_handler.recv_command(GEARMAN_COMMAND_NO_JOB)
+        self.assert_back_to_sleep()
+        self.assertFalse(self.connection_manager.check_job_lock(self.command_handler))
+
 class WorkerCommandHandlerInterfaceTest(_GearmanAbstractWorkerTest):
     """Test the public interface a GearmanWorker may need to call in order to update state on a GearmanWorkerCommandHandler"""
 
@@ -308,6 +673,19 @@ class WorkerCommandHandlerStateMachineTest(_GearmanAbstractWorkerTest):
 
         self.move_to_state_no_job()
 
+    def test_stop_finishes_grabbed_job(self):
+        self.move_to_state_wakeup()
+
+        # Once stopped, we still take the job our outstanding GRAB_JOB_UNIQ gets us...
+        self.connection_manager.stop()
+        self.move_to_state_job_assign_uniq(self.generate_job_dict())
+
+        # ...but we won't grab another one
+        self.command_handler.recv_command(GEARMAN_COMMAND_NOOP)
+        self.assert_sent_command(GEARMAN_COMMAND_PRE_SLEEP)
+        self.assert_no_pending_commands()
+        self.assert_job_lock(is_locked=False)
+
     def move_to_state_wakeup(self):
         self.assert_no_pending_commands()
         self.assert_job_lock(is_locked=False)